@@ -12,6 +12,9 @@ from strategies.macd import MACD
 from strategies.stoch_rsi import STOCH_RSI
 from strategies.stoch_rsi_double import STOCH_RSI_DOUBLE
 from strategies.macd_double import MACD_DOUBLE
+from modules.fetcher import BatchFetcher
+from modules.portfolio import PortfolioBacktest
+from modules.strategy import BACKTEST_OFFSET
 import pandas_ta as ta
 
 strategy_map = {
@@ -36,11 +39,12 @@ def get_strategy_class(strategy_name):
 
 def run_backtest(args):
     strategy, duration = args
-    return strategy.backtest(duration)
+    # Data is fetched before the strategies are sent to the workers
+    return strategy.backtest(duration, update=False)
 
 def run_step(args):
-    strategy = args
-    return strategy.run_step()
+    strategy, update = args
+    return strategy.run_step(update=update)
 
 def show_dashboard():
     st.sidebar.title("Menu")
@@ -132,11 +136,16 @@ def show_scanning_dashboard():
         # Run live simulation for each strategy
         for strategy in strategies:
             strategy.put_live_simulation()
+
+        # Fetch all coins concurrently over one connection pool
+        with st.status("Veriler indiriliyor...") as status:
+            errors = BatchFetcher().fetch([strategy.data_manager for strategy in strategies])
+            status.update(label=f"Veriler indirildi ({len(errors)} hata)", state="complete")
         
         # Run step run in parallel
         with st.status("Tarama yapılıyor...") as status:
             with Pool() as pool:
-                run_args = [(strategy) for strategy in strategies]
+                run_args = [(strategy, strategy.data_manager.data.empty) for strategy in strategies]
                 results = []
                 
                 try:
@@ -357,7 +366,7 @@ def show_backtesting_dashboard():
     # Duration selection
     duration = st.select_slider(
         "Select Duration(Bars)",
-        options=[100, 200, 300, 400, 500],
+        options=[100, 200, 300, 400, 500, 1000, 2000, 5000, 10000],
         value=300
     )
     
@@ -389,6 +398,15 @@ def show_backtesting_dashboard():
             value=0.0,
             step=0.5
         )
+
+    # Portfolio mode trades all pairs from one balance
+    portfolio = st.checkbox("Portfolio Backtest (shared balance)", value=False)
+    if portfolio:
+        col1, col2 = st.columns(2)
+        with col1:
+            max_positions = st.number_input("Max Open Positions", min_value=1, value=5, step=1)
+        with col2:
+            max_exposure = st.slider("Max Exposure Percentage", min_value=5.0, max_value=100.0, value=100.0, step=5.0)
     
     # Start button
     if st.button("Start Backtesting"):
@@ -413,6 +431,31 @@ def show_backtesting_dashboard():
             )
             strategies.append(strategy_instance)
         
+        if portfolio:
+            with st.status("Running portfolio backtest...") as status:
+                try:
+                    result = PortfolioBacktest(strategies, balance=balance, max_positions=int(max_positions), max_exposure_percentage=max_exposure).run(duration)
+                except Exception as e:
+                    status.update(label=f"Error: {str(e)}", state="error")
+                    st.error(f"An error occurred during backtesting: {str(e)}")
+                    return None
+                status.update(label="Completed!", state="complete")
+
+            if result is None:
+                st.warning("No results")
+                return None
+
+            st.write(result['summary'])
+            st.line_chart(result['equity'])
+            st.dataframe(result['symbols'])
+            st.dataframe(result['trades'])
+            return result
+
+        # Fetch in this process so all requests share its rate limiter, workers only backtest
+        with st.status("Downloading data...") as status:
+            errors = BatchFetcher().update([strategy.data_manager for strategy in strategies], limit=duration + BACKTEST_OFFSET)
+            status.update(label=f"Data downloaded ({len(errors)} errors)", state="complete")
+
         # Run backtests in parallel
         with st.status("Running backtests...") as status:
             with Pool() as pool:
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+class TimeframeAlignment:
+    """
+    Maps every base candle to a parent candle with one searchsorted pass over the whole history.
+    A base candle maps either to the parent candle enclosing it, which may still be forming,
+    or to the last parent candle that was closed by the time the base candle closed.
+    When candles are appended only the base candles that can map to a new parent are recomputed.
+    """
+    def __init__(self, base_minutes, parent_minutes):
+        self.base_length = base_minutes * 60 * 10**9
+        self.parent_length = parent_minutes * 60 * 10**9
+        self._cache = {}
+
+    # Get parent positions of base candles
+    def positions(self, base_index, parent_index, closed=True):
+        """
+        :param base_index: DatetimeIndex of base candle open times
+        :param parent_index: DatetimeIndex of parent candle open times
+        :param closed: Map to the last closed parent instead of the enclosing one
+        :return: Parent position per base candle, -1 where there is none
+        """
+        base = base_index.as_unit('ns').asi8
+        parent = parent_index.as_unit('ns').asi8
+        if len(base) == 0 or len(parent) == 0:
+            return np.full(len(base), -1, dtype=np.int64)
+
+        # The closed parent is the last one opened at least a parent length before the base candle closes
+        targets = base + self.base_length - self.parent_length if closed else base
+        start = self._reusable(closed, base, parent)
+
+        if start is None:
+            positions = np.searchsorted(parent, targets, side='right') - 1
+        else:
+            positions = np.empty(len(base), dtype=np.int64)
+            cached = self._cache[closed][2]
+            positions[:start] = cached[:start]
+            positions[start:] = np.searchsorted(parent, targets[start:], side='right') - 1
+
+        if not closed:
+            # A parent that already ended before the base candle opened doesn't enclose it
+            ended = (positions >= 0) & (parent[np.maximum(positions, 0)] + self.parent_length <= base)
+            positions[ended] = -1
+
+        self._cache[closed] = (base, parent, positions)
+        return positions
+
+    # First base position that needs recomputing, None to recompute everything
+    def _reusable(self, closed, base, parent):
+        if closed not in self._cache:
+            return None
+
+        cached_base, cached_parent, _ = self._cache[closed]
+        if (len(base) < len(cached_base) or len(parent) < len(cached_parent)
+                or base[0] != cached_base[0] or base[len(cached_base) - 1] != cached_base[-1]
+                or parent[0] != cached_parent[0] or parent[len(cached_parent) - 1] != cached_parent[-1]):
+            return None
+
+        # Only base candles reaching past the previously last parent can map to an appended one
+        targets = cached_base + self.base_length - self.parent_length if closed else cached_base
+        return int(np.searchsorted(targets, cached_parent[-1], side='left'))
+
+    # Reindex parent values onto the base timeline
+    def align(self, base_index, parent_index, values, closed=True):
+        """
+        Get parent values, e.g. indicator outputs, for every base candle.
+
+        :param values: Series or DataFrame indexed by parent candles
+        :return: Same type indexed by base_index, NaN where no parent maps
+        """
+        if len(values) != len(parent_index):
+            values = values.reindex(parent_index)
+
+        positions = self.positions(base_index, parent_index, closed=closed)
+        valid = positions >= 0
+
+        def take(column):
+            aligned = np.full(len(positions), np.nan)
+            aligned[valid] = column.to_numpy(dtype=float)[positions[valid]]
+            return aligned
+
+        if isinstance(values, pd.Series):
+            return pd.Series(take(values), index=base_index, name=values.name)
+        return pd.DataFrame({column: take(values[column]) for column in values.columns}, index=base_index)
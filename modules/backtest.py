@@ -0,0 +1,143 @@
+import numpy as np
+
+# Simulate positions and PnL over signal arrays
+def simulate_signals(close, entry_signals, exit_signals, balance=1000, risk_percentage=100, slippage_percentage=0.1, start=0):
+    """
+    Walk entry and exit signal arrays in one pass and replay the trades the bar by bar backtest would take.
+    Only bars carrying a signal are visited, everything else is skipped by NumPy.
+
+    :param close: Close prices as a NumPy array
+    :param entry_signals: Entry signal per bar, 1 for long, -1 for short and 0 for none
+    :param exit_signals: Exit signal per bar as a boolean array
+    :param balance: Starting balance
+    :param risk_percentage: Percentage of the balance put into each position
+    :param slippage_percentage: Slippage applied to every execution
+    :param start: First bar that is allowed to trade
+    :return: The list of executed trades and the final balance
+    """
+    close = np.asarray(close, dtype=float)
+    entry_signals = np.asarray(entry_signals)
+    exit_signals = np.asarray(exit_signals, dtype=bool)
+
+    trades = []
+    position = None
+    entry_price = 0
+    position_size = 0
+
+    candidates = np.flatnonzero((entry_signals != 0) | exit_signals)
+    candidates = candidates[candidates >= start]
+
+    for i in candidates:
+        current_price = close[i]
+
+        if position is None:
+            if entry_signals[i] == 0:
+                continue
+
+            position = "long" if entry_signals[i] > 0 else "short"
+            position_size = (balance * (risk_percentage / 100)) / current_price
+            if position == "long":
+                entry_price = current_price * (1 + slippage_percentage / 100)
+            else:
+                entry_price = current_price * (1 - slippage_percentage / 100)
+
+            trades.append({
+                'position': int(i),
+                'action': position,
+                'price': entry_price,
+                'size': position_size,
+                'amount': position_size * entry_price
+            })
+
+        elif exit_signals[i]:
+            if position == "long":
+                execution_price = current_price * (1 - slippage_percentage / 100)
+                profit_loss = (execution_price - entry_price) * position_size
+                percentage_gain_loss = ((execution_price / entry_price) - 1) * 100
+            else:
+                execution_price = current_price * (1 + slippage_percentage / 100)
+                profit_loss = (entry_price - execution_price) * position_size
+                percentage_gain_loss = ((entry_price / execution_price) - 1) * 100
+
+            balance += profit_loss
+            trades.append({
+                'position': int(i),
+                'action': "close",
+                'price': execution_price,
+                'size': position_size,
+                'amount': position_size * execution_price,
+                'profit_loss': profit_loss,
+                'percentage_gain_loss': percentage_gain_loss,
+                'result': "win" if profit_loss > 0 else "loss"
+            })
+            position = None
+            position_size = 0
+
+    return trades, balance
+
+# Maximum drawdown of the balance over closed trades
+def max_drawdown(profit_losses, final_balance):
+    """
+    :param profit_losses: Profit or loss of every closed trade in order
+    :param final_balance: Balance after the last trade
+    :return: Largest drop from a balance peak as a percentage of that peak
+    """
+    profit_losses = np.asarray(profit_losses, dtype=float)
+    if len(profit_losses) == 0:
+        return 0.0
+
+    balances = final_balance - profit_losses.sum() + np.concatenate(([0.0], np.cumsum(profit_losses)))
+    peaks = np.maximum.accumulate(balances)
+    return float(((peaks - balances) / peaks).max() * 100)
+
+# Summarize simulated trades
+def summarize_trades(trades, final_balance):
+    """
+    Performance of the trades simulate_signals returned, computed like the strategy's own metrics.
+
+    :return: Dict of trade counts, win rate, profit factor, total profit/loss and maximum drawdown
+    """
+    profit_losses = np.array([trade['profit_loss'] for trade in trades if trade['action'] == "close"], dtype=float)
+    total_profit = profit_losses[profit_losses > 0].sum()
+    total_loss = abs(profit_losses[profit_losses <= 0].sum())
+
+    if total_loss == 0:
+        profit_factor = float('inf') if total_profit > 0 else 0
+    else:
+        profit_factor = total_profit / total_loss
+
+    return {
+        'total_trades': len(profit_losses),
+        'win_trades': int((profit_losses > 0).sum()),
+        'loss_trades': int((profit_losses <= 0).sum()),
+        'win_rate': float((profit_losses > 0).mean()) if len(profit_losses) else 0,
+        'profit_factor': profit_factor,
+        'total_profit_loss': float(total_profit - total_loss),
+        'total_profit_loss_percentage': float((total_profit - total_loss) / final_balance * 100),
+        'max_drawdown_percentage': max_drawdown(profit_losses, final_balance)
+    }
+
+# Balance marked to market on every bar
+def equity_curve(close, trades, balance=1000, start=0, end=None):
+    """
+    :param close: Close prices as a NumPy array
+    :param trades: Trades simulate_signals returned
+    :param balance: Balance before the first trade
+    :param start: First bar of the curve
+    :param end: Bar after the last one of the curve, the end of close if None
+    :return: Balance plus the open position's unrealized profit/loss per bar from start to end
+    """
+    close = np.asarray(close, dtype=float)
+    end = len(close) if end is None else end
+    equity = np.full(end - start, float(balance))
+
+    # Trades come in order, each one rewrites the curve from its bar on
+    for trade in trades:
+        i = trade['position']
+        if trade['action'] == "close":
+            balance += trade['profit_loss']
+            equity[i - start:] = balance
+        else:
+            direction = 1 if trade['action'] == "long" else -1
+            equity[i - start:] = balance + direction * (close[i:end] - trade['price']) * trade['size']
+    return equity
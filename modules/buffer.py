@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+class CandleBuffer:
+    """
+    Fixed-capacity candle storage of one symbol and interval.
+    Columns live in NumPy arrays twice the capacity long. Appends write after the last row and once
+    the end is reached the latest rows are copied to the front of fresh arrays, so appends are amortized O(1),
+    the kept rows are always contiguous and frames handed out before keep their values.
+    """
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.columns = {}
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.tz = None
+        self.attrs = {}
+        self.start = 0
+        self.size = 0
+        self._frame = None
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def empty(self):
+        return self.size == 0
+
+    # First stored timestamp
+    @property
+    def first_timestamp(self):
+        if self.size == 0:
+            return None
+        return self._to_index(self.timestamps[self.start:self.start + 1])[0]
+
+    # Last stored timestamp
+    @property
+    def last_timestamp(self):
+        if self.size == 0:
+            return None
+        return self._to_index(self.timestamps[self.start + self.size - 1:self.start + self.size])[0]
+
+    # Drop all candles
+    def clear(self):
+        self.columns = {}
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.tz = None
+        self.attrs = {}
+        self.start = 0
+        self.size = 0
+        self._frame = None
+
+    # Change capacity
+    def set_capacity(self, capacity):
+        """
+        Change the number of kept candles, the oldest ones are dropped when shrinking.
+        """
+        if capacity == self.capacity:
+            return
+
+        keep = min(self.size, capacity)
+        rows = slice(self.start + self.size - keep, self.start + self.size)
+        self.timestamps = self._resize(self.timestamps[rows], 2 * capacity)
+        self.columns = {name: self._resize(values[rows], 2 * capacity) for name, values in self.columns.items()}
+        self.capacity = capacity
+        self.start = 0
+        self.size = keep
+        self._frame = None
+
+    # Append candles
+    def append(self, frame, refresh_last=False):
+        """
+        Append the candles of frame that are newer than the last stored one.
+
+        :param frame: Candle frame with a DatetimeIndex
+        :param refresh_last: Also overwrite the last stored candle if frame has it, e.g. a forming candle
+        :return: Number of appended or overwritten candles
+        """
+        if frame is None or frame.empty:
+            return 0
+
+        if self.size == 0:
+            self.clear()
+            self.tz = frame.index.tz
+            self.attrs = dict(frame.attrs)
+            self.timestamps = np.empty(2 * self.capacity, dtype=np.int64)
+        else:
+            last_timestamp = self.last_timestamp
+            if refresh_last and last_timestamp in frame.index:
+                # Drop the stored last candle so the fresh one is appended in its place
+                self.size -= 1
+                frame = frame[frame.index >= last_timestamp]
+            else:
+                frame = frame[frame.index > last_timestamp]
+            if frame.empty:
+                return 0
+
+        if len(frame) > self.capacity:
+            frame = frame.iloc[-self.capacity:]
+        count = len(frame)
+
+        for column in frame.columns:
+            if column not in self.columns:
+                self.columns[column] = self._allocate(frame[column].dtype)
+
+        # Copy the latest rows to fresh arrays when the new ones don't fit after them,
+        # moving them within the arrays would change frames still viewing them
+        if self.start + self.size + count > len(self.timestamps):
+            keep = min(self.size, self.capacity - count)
+            rows = slice(self.start + self.size - keep, self.start + self.size)
+            self.timestamps = self._resize(self.timestamps[rows], len(self.timestamps))
+            self.columns = {name: self._resize(values[rows], len(values)) for name, values in self.columns.items()}
+            self.start = 0
+            self.size = keep
+
+        rows = slice(self.start + self.size, self.start + self.size + count)
+        self.timestamps[rows] = frame.index.as_unit("ns").asi8
+        for name, values in self.columns.items():
+            if name in frame.columns:
+                values[rows] = frame[name].to_numpy()
+            else:
+                values[rows] = self._missing(values.dtype)
+
+        self.size += count
+        if self.size > self.capacity:
+            self.start += self.size - self.capacity
+            self.size = self.capacity
+
+        self._frame = None
+        return count
+
+    # Overwrite stored candles
+    def refresh(self, frame):
+        """
+        Overwrite the stored candles that frame has in place, e.g. a late update of a closed candle.
+        Candles of frame that aren't stored are ignored.
+
+        :return: Number of overwritten candles
+        """
+        if self.size == 0 or frame is None or frame.empty:
+            return 0
+
+        stored = self.timestamps[self.start:self.start + self.size]
+        timestamps = frame.index.as_unit("ns").asi8
+        positions = np.minimum(np.searchsorted(stored, timestamps), self.size - 1)
+        found = stored[positions] == timestamps
+        if not found.any():
+            return 0
+
+        rows = self.start + positions[found]
+        for name, values in self.columns.items():
+            if name in frame.columns:
+                values[rows] = frame[name].to_numpy()[found]
+
+        self._frame = None
+        return int(found.sum())
+
+    # Contiguous DataFrame of the stored candles
+    def frame(self):
+        """
+        Get the stored candles as a DataFrame sharing memory with the buffer.
+        The buffer may be shared by several data managers, so its values are read-only,
+        columns can still be added or replaced. Appends never move the rows the frame views,
+        only a refreshed forming or late candle is overwritten in place.
+        """
+        if self.size == 0:
+            return pd.DataFrame()
+
+        if self._frame is None:
+            rows = slice(self.start, self.start + self.size)
+            self._frame = pd.DataFrame(
+                {name: self._read_only(values[rows]) for name, values in self.columns.items()},
+                index=self._to_index(self.timestamps[rows]),
+                copy=False
+            )
+            self._frame.index.name = 'timestamp'
+            self._frame.attrs = dict(self.attrs)
+
+        return self._frame
+
+    # Convert stored timestamps to an index
+    def _to_index(self, timestamps):
+        index = pd.DatetimeIndex(timestamps.view('datetime64[ns]'))
+        if self.tz is not None:
+            index = index.tz_localize('UTC').tz_convert(self.tz)
+        return index
+
+    # Read-only view of values
+    @staticmethod
+    def _read_only(values):
+        values.flags.writeable = False
+        return values
+
+    # Allocate a column, numeric columns keep their dtype
+    def _allocate(self, dtype):
+        if dtype.kind not in 'fiub':
+            dtype = np.dtype(object)
+        return np.full(len(self.timestamps), self._missing(dtype), dtype=dtype)
+
+    # Value of missing rows
+    @staticmethod
+    def _missing(dtype):
+        if dtype.kind == 'f':
+            return np.nan
+        if dtype.kind in 'iub':
+            return 0
+        return None
+
+    # Copy values into a new array of length
+    @classmethod
+    def _resize(cls, values, length):
+        resized = np.full(length, cls._missing(values.dtype), dtype=values.dtype)
+        resized[:len(values)] = values
+        return resized
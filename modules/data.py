@@ -1,19 +1,58 @@
+import time
+import weakref
 import requests     
+import numpy as np
 import pandas as pd
 from modules.logger import logger
+from modules.indicators import Indicator, IndicatorEngine, indicator_registry, is_indicator_spec, parse_indicator
+from modules.store import candle_store
+from modules.trades import TradeLog
+from modules.alignment import TimeframeAlignment
+from modules.hub import MarketFeed, market_data_hub
+from modules.history import HistoryLoader
+from modules.kraken import kraken_client, get_kraken_client, PRIORITY_LIVE
+
+# Kraken returns at most this many candles per OHLC request
+KRAKEN_OHLC_LIMIT = 720
+
+# Candles before a streamed one that support and resistance are recalculated over
+STREAM_CONTEXT = 64
 
 class DataManager:
-    def __init__(self, symbol, interval, parent_interval):
+    def __init__(self, symbol, interval, parent_interval, store=candle_store, store_max_age=60, client=kraken_client, retention=1000, resample_parent=True, hub=market_data_hub, api_url=None, registry=indicator_registry):
         self.symbol = symbol
         self.interval = interval
         self.parent_interval = parent_interval
-        self.data = pd.DataFrame()
-        self.data_parent = pd.DataFrame()
+        self._replay_data = None
+        self._replay_parent = None
+        self._replay_cursor = -1
+        self._replay_parent_positions = None
+        self._replay_view = None
+        self._replay_parent_view = None
+        self.indicator_cache = {}
+        self.indicator_cache_hits = 0
+        self.indicator_cache_misses = 0
+        self.retention = retention
         self.latest_parent_data = None
-        self.data_update_counter = 0
         self.parent_interval_supported = True
         self.logger = logger
         self.parent_update_period = 0
+        self.store = store
+        # A different API root, e.g. a local stand-in, gets its own client
+        self.client = get_kraken_client(api_url) if api_url is not None else client
+        self.store_max_age = store_max_age
+        # Engines are shared per symbol and intervals through the registry, None gives private ones
+        if registry is not None:
+            self.indicators, self.parent_indicators = registry.subscribe(symbol, interval, parent_interval)
+            self._indicator_subscription = weakref.finalize(self, registry.unsubscribe, symbol, interval, parent_interval)
+        else:
+            self.indicators, self.parent_indicators = IndicatorEngine(), IndicatorEngine()
+            self._indicator_subscription = None
+        self._shared_indicators = None
+        self.trades = TradeLog()
+        self.resample_parent = resample_parent
+        self._stream = None
+        self._on_close = None
 
         # Validate that parent interval is larger than base interval
         if self.parent_interval_supported:
@@ -25,6 +64,59 @@ class DataManager:
 
         # Validate timeframe relationship
         self._validate_timeframe_relationship()
+
+        self.alignment = None
+        if self.parent_interval_supported:
+            self.alignment = TimeframeAlignment(self.interval_in_minutes(self.interval), self.interval_in_minutes(self.parent_interval))
+
+        # Candles and levels live in a feed shared by all data managers of the symbol and intervals
+        self.hub = hub
+        self._subscribe()
+
+    # Subscribe to the market feed, a private one without a hub
+    def _subscribe(self):
+        if self.hub is None:
+            self._feed = MarketFeed(self.symbol, self.interval, self.parent_interval, retention=self.retention)
+            self._subscription = None
+        else:
+            self._feed = self.hub.subscribe(self.symbol, self.interval, self.parent_interval, retention=self.retention)
+            self._subscription = weakref.finalize(self, self.hub.unsubscribe, self._feed)
+
+        self._buffer = self._feed.buffer
+        self._parent_buffer = self._feed.parent_buffer
+        self.levels = self._feed.levels
+        self.parent_levels = self._feed.parent_levels
+        self._feed_version = self._feed.version
+        self._overlays = {}
+
+    # Unsubscribe from the market feed and the indicator engines
+    def close(self):
+        if self._subscription is not None:
+            self._subscription()
+            self._subscription = None
+        if self._indicator_subscription is not None:
+            self._indicator_subscription()
+            self._indicator_subscription = None
+
+    # A pickled data manager, e.g. one sent to a worker process, keeps a private copy of the feed
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_subscription'] = None
+        state['_indicator_subscription'] = None
+        state['hub'] = None
+        state['_overlays'] = {}
+        state['_stream'] = None
+        state['_on_close'] = None
+        return state
+
+    # Parent update counter, kept by the feed so subscribers don't each count
+    @property
+    def data_update_counter(self):
+        return self._feed.update_counter
+
+    @data_update_counter.setter
+    def data_update_counter(self, value):
+        self._feed.update_counter = value
     
     # Interval in minutes
     @staticmethod
@@ -44,12 +136,308 @@ class DataManager:
             raise ValueError(f"Invalid interval: {interval}")
         return interval_in_minutes[interval]
     
+    # Data, a view ending at the replay cursor while replaying
+    @property
+    def data(self):
+        if self._replay_data is None:
+            return self._get_overlay('base', self._buffer)
+        if self._replay_view is None:
+            # Wrapping the slice keeps appended indicator columns from warning about chained assignment
+            self._replay_view = pd.DataFrame(self._replay_data.iloc[:self._replay_cursor + 1], copy=False)
+            self._replay_view.attrs = self._replay_data.attrs
+        return self._replay_view
+
+    @data.setter
+    def data(self, value):
+        self._buffer.clear()
+        self._buffer.set_capacity(max(self._buffer.capacity, len(value)))
+        self._buffer.append(value)
+        self._feed.touch()
+        self.invalidate_indicator_cache()
+
+    # Parent data, a view ending at the replay cursor while replaying
+    @property
+    def data_parent(self):
+        if self._replay_parent is None:
+            return self._get_overlay('parent', self._parent_buffer)
+        if self._replay_parent_view is None:
+            position = self._replay_parent_positions[self._replay_cursor] if self._replay_cursor >= 0 else 0
+            self._replay_parent_view = pd.DataFrame(self._replay_parent.iloc[:position], copy=False)
+            self._replay_parent_view.attrs = self._replay_parent.attrs
+        return self._replay_parent_view
+
+    @data_parent.setter
+    def data_parent(self, value):
+        self._parent_buffer.clear()
+        self._parent_buffer.set_capacity(max(self._parent_buffer.capacity, len(value)))
+        self._parent_buffer.append(value)
+        self._feed.touch()
+        self.invalidate_indicator_cache()
+
+    # Frame of this data manager on top of the shared candles
+    def _get_overlay(self, scope, buffer):
+        """
+        Get a shallow copy of the shared candle frame, rebuilt once the feed appends candles.
+        Columns added to it, e.g. by attach_indicators, stay with this data manager.
+        """
+        frame = buffer.frame()
+        source, overlay = self._overlays.get(scope, (None, None))
+        if source is not frame:
+            overlay = frame.copy(deep=False)
+            self._overlays[scope] = (frame, overlay)
+        return overlay
+
+    # Start replay
+    def start_replay(self, start=0):
+        """
+        Replay the loaded data bar by bar without copying it.
+        data and data_parent become views that end at the cursor, call advance_replay to move it.
+
+        :param start: Index of the first bar the cursor moves to
+        """
+        if self._buffer.empty:
+            raise ValueError("No data loaded to replay")
+
+        self._replay_data = self.data
+        self._replay_cursor = start - 1
+        self._replay_view = None
+
+        # Replayed history would keep rewinding the shared engines, use private ones meanwhile
+        self._shared_indicators = (self.indicators, self.parent_indicators)
+        self.indicators = self.indicators.fork()
+        self.parent_indicators = self.parent_indicators.fork()
+
+        if self.parent_interval_supported and not self._parent_buffer.empty:
+            self._replay_parent = self.data_parent
+            self._replay_parent_positions = np.searchsorted(self._replay_parent.index, self._replay_data.index, side='right')
+            self._replay_parent_view = None
+
+    # Advance replay
+    def advance_replay(self):
+        if self._replay_data is None:
+            raise ValueError("Replay is not started")
+        if self._replay_cursor + 1 >= len(self._replay_data):
+            return False
+
+        self._replay_cursor += 1
+        self._replay_view = None
+        self._replay_parent_view = None
+        self.invalidate_indicator_cache()
+
+        if self._replay_parent is not None:
+            position = self._replay_parent_positions[self._replay_cursor]
+            self.latest_parent_data = self._replay_parent.iloc[position - 1] if position > 0 else None
+
+        return True
+
+    # Stop replay
+    def stop_replay(self):
+        """
+        Stop replaying and restore the full data.
+        Indicator columns appended to the last views are carried over for graphing.
+        """
+        if self._replay_data is None:
+            return
+
+        for view, full in ((self._replay_view, self._replay_data), (self._replay_parent_view, self._replay_parent)):
+            if view is None or full is None:
+                continue
+            for column in view.columns.difference(full.columns):
+                full[column] = view[column]
+
+        self.indicators, self.parent_indicators = self._shared_indicators
+        self._shared_indicators = None
+        self.invalidate_indicator_cache()
+
+        self._replay_data = None
+        self._replay_parent = None
+        self._replay_parent_positions = None
+        self._replay_cursor = -1
+        self._replay_view = None
+        self._replay_parent_view = None
+
+    # Record trade data on the latest bar
+    def record_trade(self, event, trade_info, index=None):
+        """
+        Record a trade event on a bar, the latest one if index is None.
+        While replaying the latest bar is the one at the cursor.
+
+        :param event: entry_data, exit_data or partial_close_data
+        """
+        if index is None:
+            index = self.data.index[-1]
+        self.trades.record(event, index, trade_info)
+
+    # Get data with trade events for charting
+    def get_chart_data(self):
+        return self.trades.join(self.data)
+
     # Update data
-    def update_data(self, limit=180):
-        self._get_data(limit=limit)
-        self._get_parent_data(limit=int(limit/2))
+    def update_data(self, limit=180, priority=PRIORITY_LIVE):
+        last_timestamps = self._get_last_timestamps()
+
+        # Other subscribers of the feed may have fetched this candle already
+        self._feed.update(lambda: self._fetch_data(limit, priority), limit, self.get_sleep_duration())
+        self._synchronize_data()
+
+        # Cached indicators are only stale once a new bar comes in
+        if self._get_last_timestamps() != last_timestamps:
+            self.invalidate_indicator_cache()
+
+    # Fetch data and parent data into the feed
+    def _fetch_data(self, limit, priority):
+        # Keep at least the requested window, e.g. a backtest asking for more than the retention
+        self._reserve(limit, int(limit/2))
+        self._get_data(limit=limit, priority=priority)
+        self._get_parent_data(limit=int(limit/2), priority=priority)
+
+    # Grow buffer capacities to hold at least the given number of candles
+    def _reserve(self, size, parent_size):
+        self._buffer.set_capacity(max(self._buffer.capacity, self.retention, size))
+        self._parent_buffer.set_capacity(max(self._parent_buffer.capacity, self.retention, parent_size))
+
+    # Get last base and parent timestamps
+    def _get_last_timestamps(self):
+        return tuple(data.index[-1] if data is not None and not data.empty else None for data in (self.data, self.data_parent))
+
+    # Load already fetched data
+    def load_data(self, data, data_parent=None):
+        """
+        Prefill with candles fetched elsewhere (e.g. by BatchFetcher) instead of calling the API.
+        New candles are appended the same way update_data does.
+        """
+        last_timestamps = self._get_last_timestamps()
+
+        with self._feed.lock:
+            self._reserve(len(data), len(data_parent) if data_parent is not None else 0)
+            self._append_data(data)
+            if data_parent is not None:
+                self._append_parent_data(data_parent)
         self._synchronize_data()
 
+        if self._get_last_timestamps() != last_timestamps:
+            self.invalidate_indicator_cache()
+
+    # Follow a candle stream instead of polling
+    def follow(self, stream, on_close=None):
+        """
+        Push candles from a CandleStream into the feed as they form and close, no REST requests are made.
+        Load the history with update_data first, streamed candles extend it.
+
+        :param stream: CandleStream, e.g. KrakenStream or ReplayStream
+        :param on_close: Called with the timestamp of every closed base candle, data already ends
+                         with the next forming candle like a poll right after the close would
+        """
+        self.unfollow()
+        self._stream = stream
+        self._on_close = on_close
+        stream.subscribe(self.symbol, self.interval, self._on_candle)
+        if self.parent_interval_supported and not self._is_resampling_parent():
+            stream.subscribe(self.symbol, self.parent_interval, self._on_parent_candle)
+
+    # Stop following the candle stream
+    def unfollow(self):
+        if self._stream is None:
+            return
+        self._stream.unsubscribe(self.symbol, self.interval, self._on_candle)
+        self._stream.unsubscribe(self.symbol, self.parent_interval, self._on_parent_candle)
+        self._stream = None
+        self._on_close = None
+
+    # Handle a streamed base candle
+    def _on_candle(self, row, closed):
+        last_timestamps = self._get_last_timestamps()
+
+        with self._feed.lock:
+            # The candle was closed and the next one opened already, only its values are brought up to date
+            late = not closed and self._is_late(self._buffer, row)
+            if late:
+                self._refresh_candle(row)
+            else:
+                self._push_candle(row, parent=False)
+
+            # Open the next candle flat at the close, as Kraken shows it until its first trade
+            if closed or (late and self._is_flat_next(row)):
+                close = float(row[4])
+                self._push_candle([int(row[0]) + self.get_sleep_duration(), close, close, close, close, close, 0.0, 0], parent=False)
+
+            if self._is_resampling_parent():
+                self._resample_parent_tail(refresh=pd.Timestamp(int(row[0]), unit='s', tz='UTC') if late else None)
+        self._synchronize_data()
+
+        if self._get_last_timestamps() != last_timestamps:
+            self.invalidate_indicator_cache()
+
+        if closed and self._on_close is not None:
+            self._on_close(self.data.index[-2])
+
+    # Handle a streamed parent candle
+    def _on_parent_candle(self, row, closed):
+        with self._feed.lock:
+            if not closed and self._is_late(self._parent_buffer, row):
+                self._refresh_candle(row, parent=True)
+            else:
+                self._push_candle(row, parent=True)
+        self._synchronize_data()
+
+    # Check if a streamed candle is older than the last buffered one
+    @staticmethod
+    def _is_late(buffer, row):
+        return not buffer.empty and int(row[0]) < int(buffer.last_timestamp.timestamp())
+
+    # Check if the last buffered candle is the one opened flat at the close of row, without trades since
+    def _is_flat_next(self, row):
+        data = self._buffer.frame()
+        return int(data.index[-1].timestamp()) == int(row[0]) + self.get_sleep_duration() and data['count'].iloc[-1] == 0
+
+    # Write a late update of a closed candle in place
+    def _refresh_candle(self, row, parent=False):
+        buffer = self._parent_buffer if parent else self._buffer
+        interval = self.parent_interval if parent else self.interval
+        candle = self._rows_to_frame([row])
+
+        candle = self._with_context(buffer.frame(), candle)
+        candle = self._prepare_candles(candle, self.symbol, interval, len(candle))
+        if buffer.refresh(candle.iloc[-1:]):
+            self._feed.touch()
+            self.invalidate_indicator_cache()
+
+    # Append or refresh a streamed candle
+    def _push_candle(self, row, parent):
+        buffer = self._parent_buffer if parent else self._buffer
+        interval = self.parent_interval if parent else self.interval
+        candle = self._rows_to_frame([row])
+        if candle is None:
+            return
+
+        candle = self._with_context(buffer.frame(), candle)
+        candle = self._prepare_candles(candle, self.symbol, interval, len(candle))
+
+        # The forming candle is pushed again on every update, keep it up to date
+        if parent:
+            self._append_parent_data(candle, refresh_last=True)
+        else:
+            self._append_data(candle, refresh_last=True)
+
+    # Rebuild the latest parent candles from the buffered base candles
+    def _resample_parent_tail(self, refresh=None):
+        """
+        :param refresh: Timestamp of a late base candle, its parent candle is rewritten even once the next one has started
+        """
+        ratio = self.interval_in_minutes(self.parent_interval) // self.interval_in_minutes(self.interval)
+        base = self._buffer.frame()
+        base = base[['open', 'high', 'low', 'close', 'vwap', 'volume', 'count']].iloc[-ratio * STREAM_CONTEXT:]
+
+        parent = self._resample_candles(base, self.parent_interval)
+        if parent is None:
+            return
+
+        parent = self._prepare_candles(parent, self.symbol, self.parent_interval, len(parent))
+        self._append_parent_data(parent)
+        if refresh is not None and self._parent_buffer.refresh(parent[parent.index <= refresh].iloc[-1:]):
+            self._feed.touch()
+            self.invalidate_indicator_cache()
+
     # Get latest data
     def get_latest_data(self):
         return self.data.iloc[-1]
@@ -66,13 +454,162 @@ class DataManager:
     def get_latest_parent_data_index(self):
         return self.data_parent.index[-1]
 
+    # Register indicator specs
+    def register_indicators(self, indicators=(), parent_indicators=()):
+        for spec in indicators:
+            self.indicators.add(spec)
+        for spec in parent_indicators:
+            self.parent_indicators.add(spec)
+
+    # Get indicator values for every bar of data
+    def get_indicator(self, indicator):
+        return self._get_cached_indicator("base", self.indicators, self.data, indicator)
+
+    # Get indicator values for every bar of parent data
+    def get_parent_indicator(self, indicator):
+        return self._get_cached_indicator("parent", self.parent_indicators, self.data_parent, indicator)
+
+    # Get parent indicator values on the base timeline
+    def get_aligned_parent_indicator(self, indicator):
+        """
+        Get parent indicator values for every bar of data.
+        Each bar gets the value of the last parent candle closed by the time the bar closed,
+        so reading a bar never looks at a parent candle that was still forming.
+        """
+        if is_indicator_spec(indicator):
+            indicator = parse_indicator(indicator)
+        name = indicator.name if isinstance(indicator, Indicator) else indicator
+        self._check_feed_version()
+        key = ("aligned", name, self.data.index[-1] if not self.data.empty else None)
+
+        if key in self.indicator_cache:
+            self.indicator_cache_hits += 1
+            return self.indicator_cache[key]
+
+        values = self.get_parent_indicator(indicator)
+        self.indicator_cache_misses += 1
+        values = self.alignment.align(self.data.index, self.data_parent.index, values)
+        self.indicator_cache[key] = values
+        return values
+
+    # Get parent candle positions of data
+    def get_parent_positions(self, closed=True):
+        """
+        :param closed: Map to the last closed parent candle instead of the enclosing one
+        :return: Position in data_parent per bar of data, -1 where there is none
+        """
+        return self.alignment.positions(self.data.index, self.data_parent.index, closed=closed)
+
+    # Get nearest support below price
+    def get_nearest_support(self, price=None, parent=False):
+        """
+        Get the nearest support level below price, only levels confirmed by the current bar are considered.
+
+        :param price: Price to search from, the latest close if None
+        :param parent: Use parent interval levels
+        :return: Dict with price, strength, first_seen and last_seen, or None
+        """
+        levels, data = self._get_levels(parent)
+        if data.empty:
+            return None
+        return levels.nearest_support(self._get_level_price(data, price), as_of=data.index[-1])
+
+    # Get nearest resistance above price
+    def get_nearest_resistance(self, price=None, parent=False):
+        levels, data = self._get_levels(parent)
+        if data.empty:
+            return None
+        return levels.nearest_resistance(self._get_level_price(data, price), as_of=data.index[-1])
+
+    # Get support and resistance levels within a percentage of price
+    def get_levels_within(self, percentage, price=None, parent=False):
+        levels, data = self._get_levels(parent)
+        if data.empty:
+            return {'support': [], 'resistance': []}
+        return levels.within(self._get_level_price(data, price), percentage, as_of=data.index[-1])
+
+    # Get level index and data of the base or parent interval
+    def _get_levels(self, parent):
+        if parent:
+            return self.parent_levels, self.data_parent
+        return self.levels, self.data
+
+    # Get price for level queries
+    @staticmethod
+    def _get_level_price(data, price):
+        return data['close'].iloc[-1] if price is None else price
+
+    # Get indicator cache stats
+    def get_indicator_cache_stats(self):
+        lookups = self.indicator_cache_hits + self.indicator_cache_misses
+        return {
+            'hits': self.indicator_cache_hits,
+            'misses': self.indicator_cache_misses,
+            'hit_rate': self.indicator_cache_hits / lookups if lookups else 0,
+            'size': len(self.indicator_cache)
+        }
+
+    # Invalidate indicator cache
+    def invalidate_indicator_cache(self):
+        self.indicator_cache.clear()
+
+    # Drop cached indicators once another subscriber changed the feed
+    def _check_feed_version(self):
+        """
+        A refreshed forming parent candle keeps its timestamp, so the cache keys alone don't notice it.
+        """
+        if self._replay_data is None and self._feed_version != self._feed.version:
+            self._feed_version = self._feed.version
+            self.invalidate_indicator_cache()
+
+    # Get indicator values memoized per bar
+    def _get_cached_indicator(self, scope, engine, data, indicator):
+        """
+        Memoize indicator values by indicator spec and last candle timestamp,
+        so check_entry and check_exit on the same bar compute them once.
+        """
+        if is_indicator_spec(indicator):
+            indicator = parse_indicator(indicator)
+        name = indicator.name if isinstance(indicator, Indicator) else indicator
+        self._check_feed_version()
+        last_timestamp = data.index[-1] if not data.empty else None
+        key = (scope, name, last_timestamp)
+
+        if key in self.indicator_cache:
+            self.indicator_cache_hits += 1
+            return self.indicator_cache[key]
+
+        self.indicator_cache_misses += 1
+        values = engine.get(data, indicator)
+        self.indicator_cache[key] = values
+        return values
+
+    # Attach indicator columns to data for graphing
+    def attach_indicators(self, indicators=None, parent_indicators=None):
+        """
+        Copy indicator columns into the candle frames for graphing.
+
+        :param indicators: Specs or column names to attach, all registered ones if None
+        :param parent_indicators: Same for parent data
+        """
+        for engine, data, names in ((self.indicators, self.data, indicators), (self.parent_indicators, self.data_parent, parent_indicators)):
+            if data is None or data.empty:
+                continue
+            for name in (engine.names if names is None else names):
+                values = engine.get(data, name)
+                if isinstance(values, pd.Series):
+                    data[values.name] = values
+                else:
+                    for column in values.columns:
+                        data[column] = values[column]
+
     # Calculate sleep duration
     def get_sleep_duration(self):
         base_minutes = self.interval_in_minutes(self.interval)
         return base_minutes * 60
 
     # Kraken request
-    def _kraken_request(self, symbol, interval = "1h"):
+    def _kraken_request(self, symbol, interval = "1h", since=None, priority=PRIORITY_LIVE):
         # 1m = 1, 5m = 5, 15m = 15, 30m = 30, 1h = 60, 4h = 240, 1d = 1440, 1w = 10080, 15d = 21600
         multiplier = 60
 
@@ -95,66 +632,184 @@ class DataManager:
         elif interval == "15d":
             multiplier = 21600
 
-        url = "https://api.kraken.com/0/public/OHLC"
-
         payload = {
             "pair": symbol,
             "interval": multiplier
         }
-        headers = {
-            'Accept': 'application/json'
-        }
+        if since is not None:
+            payload["since"] = since
 
         try:
-            response = requests.get(url, params=payload, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'error' in data and data['error']:
-                raise ValueError(f"Kraken API error: {data['error']}")
-            
-            return next(iter(data['result'].values()))
+            result = self.client.get("/0/public/OHLC", params=payload, priority=priority)
+            return next(iter(result.values()))
         except requests.exceptions.RequestException as e:
             self.logger.error(f"API request failed: {str(e)}")
             raise
 
-    def _get_ohlc(self, symbol, interval, limit=180):
-        # Get the data from Kraken
-        data = self._kraken_request(symbol, interval)
+    # Get stored OHLC, fetching only candles newer than the store from Kraken
+    def _get_stored_ohlc(self, symbol, interval, limit=180, priority=PRIORITY_LIVE, since=None):
+        """
+        The store is refreshed once the last stored candle closed after it was fetched,
+        and at least every store_max_age seconds for the forming candle
+        """
+        now = time.time()
+        fetched_at = self.store.get_fetched_at(symbol, interval)
+        last_timestamp = self.store.get_last_timestamp(symbol, interval)
+        closed_at = last_timestamp + self.interval_in_minutes(interval) * 60 if last_timestamp is not None else None
+
+        if (
+            fetched_at is None
+            or now - fetched_at > self.store_max_age
+            or (closed_at is not None and fetched_at < closed_at <= now)
+        ):
+            # Kraken returns candles after cursor, step back one second to refresh the stored forming candle
+            cursor = last_timestamp - 1 if last_timestamp is not None else None
+            data = self._kraken_request(symbol, interval, since=cursor, priority=priority)
+
+            if last_timestamp is not None and data and int(data[0][0]) > last_timestamp:
+                self.logger.warning(f"Stored {symbol} {interval} candles are older than the API window, starting over")
+                self.store.delete(symbol, interval)
+
+            self.store.save(symbol, interval, data)
+
+        return self.store.load(symbol, interval, limit=limit, since=since)
+
+    def _get_ohlc(self, symbol, interval, limit=180, priority=PRIORITY_LIVE, history=False, context=None):
+        """
+        :param context: Buffered candles, only candles from their last one on are parsed
+        """
+        since = int(context.index[-1].timestamp()) if context is not None and not context.empty else None
+        df = self._get_candles(symbol, interval, limit=limit, priority=priority, history=history, since=since)
+
+        # If no data is returned, return None
+        if df is None:
+            return None
+
+        if since is not None:
+            df = self._with_context(context, df)
+            limit = len(df)
+
+        return self._prepare_candles(df, symbol, interval, limit)
+
+    # Get raw candles
+    def _get_candles(self, symbol, interval, limit=180, priority=PRIORITY_LIVE, history=False, since=None):
+        """
+        :param history: Rebuild candles older than the OHLC window from trades when limit needs them
+        :param since: Only return candles from this epoch second on
+        """
+        # Get the data from the candle store or Kraken
+        if self.store is not None:
+            data = self._get_stored_ohlc(symbol, interval, limit=limit, priority=priority, since=since)
+        else:
+            data = self._kraken_request(symbol, interval, priority=priority)
+            if data is not None and since is not None:
+                data = self._rows_since(data, since)
 
         # If no data is returned, return None
         if data is None:
             return None
-        
-        # Create DataFrame
-        df = pd.DataFrame(data, columns=['timestamp', 'open', 'high', 'low', 'close', 'vwap', 'volume', 'count'])
-        
-        # Convert data types
-        numeric_columns = ['open', 'high', 'low', 'close', 'vwap', 'volume', 'count']
-        df[numeric_columns] = df[numeric_columns].astype(float)
-    
-        # Convert timestamp to datetime with UTC+3 timezone
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s').dt.tz_localize('UTC').dt.tz_convert('Etc/GMT-3')
-        df.set_index('timestamp', inplace=True)
 
+        if history and len(data) < limit:
+            loader = HistoryLoader(self.client, self.store)
+            data = loader.extend(symbol, self.interval_in_minutes(interval), data, limit, interval=interval, priority=priority)
+
+        return self._rows_to_frame(data)
+
+    # Get rows from an epoch second on
+    @staticmethod
+    def _rows_since(data, since):
+        # Rows are ascending, only the new tail is looked at
+        start = len(data)
+        while start > 0 and int(data[start - 1][0]) >= since:
+            start -= 1
+        return data[start:]
+
+    # Convert rows in Kraken's OHLC layout to typed candles
+    @staticmethod
+    def _rows_to_frame(data):
+        """
+        Parse rows column by column straight into typed arrays, values may be strings as Kraken sends them.
+        The index is built from int64 epoch nanoseconds, the timezone is only metadata on top.
+        """
         # If no data is returned, return None
-        if df.empty:
+        if not data:
             return None
-        
+
+        columns = list(zip(*data))
+        timestamps = np.array(columns[0], dtype=np.int64) * 10**9
+        index = pd.DatetimeIndex(timestamps.view('datetime64[ns]'), name='timestamp').tz_localize('UTC').tz_convert('Etc/GMT-3')
+
+        candles = {name: np.array(values, dtype=float) for name, values in zip(('open', 'high', 'low', 'close', 'vwap', 'volume'), columns[1:7])}
+        candles['count'] = np.array(columns[7], dtype=float).astype(np.int32)
+        return pd.DataFrame(candles, index=index, copy=False)
+
+    # Prepend buffered candles to new ones
+    @staticmethod
+    def _with_context(context, df):
+        """
+        Support and resistance look at the bars around a candle, so new candles are prepared
+        together with the buffered ones before them.
+        """
+        if context is None or context.empty:
+            return df
+        context = context[context.index < df.index[0]].iloc[-STREAM_CONTEXT:]
+        return pd.concat([context[df.columns], df])
+
+    # Add derived columns and metadata to candles
+    def _prepare_candles(self, df, symbol, interval, limit):
         # Tail the data to get the last limit entries
         if len(df) > limit:
-            df = df.iloc[-limit:]
+            df = df.iloc[-limit:].copy()
 
         # Calculate support and resistance
         self._calculate_support_resistance(df)
 
-        # Add additional columns
-        df['symbol'] = symbol
-        df['interval'] = interval
-        df['percent_return'] = df['close'] / df['open'] - 1
-        df['entry_data'] = None  # This will be a dictionary
-        df['exit_data'] = None   # This will be a dictionary
-        df['partial_close_data'] = None  # This will be a dictionary
+        # Add additional columns, trades are kept in the trade log and joined when charting
+        df['percent_return'] = (df['close'] / df['open'] - 1).astype(np.float32)
+        df.attrs['symbol'] = symbol
+        df.attrs['interval'] = interval
+
+        return df
+
+    # Build candles of a larger interval from smaller ones
+    @classmethod
+    def _resample_candles(cls, data, interval):
+        """
+        Aggregate candles into epoch aligned buckets of interval, like Kraken does:
+        first open, max high, min low, last close, summed volume and count, volume weighted vwap.
+        The last bucket is kept even if it is still forming, a first bucket that started
+        before data did is dropped because its open is unknown.
+
+        :param data: Raw candles as returned by _get_candles
+        :param interval: Interval to resample to
+        :return: Candles of interval in the same layout
+        """
+        seconds = cls.interval_in_minutes(interval) * 60
+        timestamps = data.index.as_unit('s').asi8
+        buckets = timestamps - timestamps % seconds
+
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], len(buckets)] - 1
+        if buckets[0] != timestamps[0]:
+            starts, ends = starts[1:], ends[1:]
+        if len(starts) == 0:
+            return None
+
+        volume = data['volume'].to_numpy()
+        vwap_volume = np.add.reduceat(data['vwap'].to_numpy() * volume, starts)
+        bucket_volume = np.add.reduceat(volume, starts)
+        close = data['close'].to_numpy()[ends]
+
+        df = pd.DataFrame({
+            'open': data['open'].to_numpy()[starts],
+            'high': np.maximum.reduceat(data['high'].to_numpy(), starts),
+            'low': np.minimum.reduceat(data['low'].to_numpy(), starts),
+            'close': close,
+            'vwap': np.divide(vwap_volume, bucket_volume, out=close.copy(), where=bucket_volume > 0),
+            'volume': bucket_volume,
+            'count': np.add.reduceat(data['count'].to_numpy(), starts).astype(np.int32)
+        }, index=pd.to_datetime(buckets[starts], unit='s', utc=True).tz_convert(data.index.tz))
+        df.index.name = 'timestamp'
 
         return df
 
@@ -172,74 +827,125 @@ class DataManager:
         # Apply smoothing to reduce noise
         highs = data['high'].rolling(window=smoothing_periods).mean()
         lows = data['low'].rolling(window=smoothing_periods).mean()
-        volumes = data['volume']
-        
-        resistance_levels = []
-        support_levels = []
+        volumes = data['volume'].to_numpy(dtype=float)
         
         # Calculate average volume
         avg_volume = volumes.mean()
         
+        # Extrema only count inside the range where both sides have a full window
+        inside = np.zeros(len(data), dtype=bool)
+        inside[window:max(len(data) - window, window)] = True
+        volume_spike = volumes > avg_volume * volume_factor
+
+        # Compare each bar against the max/min of the window before and after it
+        is_resistance = inside & volume_spike & self._beyond_neighbours(highs, window, np.greater, "max")
+        is_support = inside & volume_spike & self._beyond_neighbours(lows, window, np.less, "min")
+
         # Initialize support and resistance columns
-        data['resistance'] = None
-        data['support'] = None
-        
-        for i in range(window, len(data) - window):
-            # Check for resistance
-            if highs.iloc[i] > highs.iloc[i-window:i].max() and highs.iloc[i] > highs.iloc[i+1:i+window+1].max():
-                # Check if this is a significant new level
-                if not resistance_levels or abs(highs.iloc[i] - resistance_levels[-1]) / resistance_levels[-1] > deviation_threshold:
-                    # Check for volume confirmation
-                    if volumes.iloc[i] > avg_volume * volume_factor:
-                        resistance_levels.append(highs.iloc[i])
-                        data.at[data.index[i], 'resistance'] = highs.iloc[i]
-            
-            # Check for support
-            if lows.iloc[i] < lows.iloc[i-window:i].min() and lows.iloc[i] < lows.iloc[i+1:i+window+1].min():
-                # Check if this is a significant new level
-                if not support_levels or abs(lows.iloc[i] - support_levels[-1]) / support_levels[-1] > deviation_threshold:
-                    # Check for volume confirmation
-                    if volumes.iloc[i] > avg_volume * volume_factor:
-                        support_levels.append(lows.iloc[i])
-                        data.at[data.index[i], 'support'] = lows.iloc[i]
+        data['resistance'] = self._select_levels(highs.to_numpy(), is_resistance, deviation_threshold)
+        data['support'] = self._select_levels(lows.to_numpy(), is_support, deviation_threshold)
         
         return data
 
+    # Check whether values are strictly beyond the neighbouring windows on both sides
+    @staticmethod
+    def _beyond_neighbours(values, window, compare, how):
+        before = getattr(values.rolling(window=window, min_periods=1), how)().shift(1)
+        after = getattr(values[::-1].rolling(window=window, min_periods=1), how)()[::-1].shift(-1)
+        values = values.to_numpy()
+
+        # NaN never compares true, like the slice max/min of the original loop
+        with np.errstate(invalid="ignore"):
+            return compare(values, before.to_numpy()) & compare(values, after.to_numpy())
+
+    # Keep candidate levels that deviate enough from the previously kept one
+    @staticmethod
+    def _select_levels(values, candidates, deviation_threshold):
+        levels = np.full(len(values), np.nan)
+        last_level = None
+
+        # Only the candidates are walked, each one depends on the last kept level
+        for i in np.flatnonzero(candidates):
+            level = values[i]
+            if last_level is None or abs(level - last_level) / last_level > deviation_threshold:
+                levels[i] = level
+                last_level = level
+
+        return levels
+
     # Get data
-    def _get_data(self, limit=180):       
+    def _get_data(self, limit=180, priority=PRIORITY_LIVE):
         try:
-            new_data = self._get_ohlc(self.symbol, interval=self.interval, limit=limit)
-
-            if self.data.empty:
-                self.data = new_data
-            else:
-                # Append only new data points
-                last_timestamp = self.data.index[-1]
-                new_data = new_data[new_data.index > last_timestamp]
-                self.data = pd.concat([self.data, new_data])
+            # Backtests may ask for more than the OHLC window holds
+            context = self._get_context(self._buffer, limit)
+            new_data = self._get_ohlc(self.symbol, interval=self.interval, limit=limit, priority=priority,
+                                      history=limit > KRAKEN_OHLC_LIMIT, context=context)
+            self._append_data(new_data, refresh_last=context is not None)
         except Exception as e:
             self.logger.error(f"Error getting data: {str(e)}")
             raise
     
+    # Get buffered candles to fetch only newer ones after, None to fetch all
+    @staticmethod
+    def _get_context(buffer, limit):
+        if len(buffer) < limit:
+            return None
+        return buffer.frame()
+
+    # Append data
+    def _append_data(self, new_data, refresh_last=False):
+        self.levels.update(new_data)
+
+        # Only newer candles are appended, a deeper history replaces the shorter one
+        if self._extends_history(self._buffer, new_data):
+            self._buffer.clear()
+
+        # Append only new data points, the oldest ones beyond the capacity are dropped
+        if self._buffer.append(new_data, refresh_last=refresh_last):
+            self._feed.touch()
+            self.invalidate_indicator_cache()
+
+    # Append parent data
+    def _append_parent_data(self, new_data_parent, refresh_last=False):
+        self.parent_levels.update(new_data_parent)
+
+        if self._extends_history(self._parent_buffer, new_data_parent):
+            self._parent_buffer.clear()
+
+        # Resampled parents carry the forming candle, keep it up to date
+        if self._parent_buffer.append(new_data_parent, refresh_last=refresh_last or self._is_resampling_parent()):
+            self._feed.touch()
+            self.invalidate_indicator_cache()
+
+    # Check if fetched candles reach further back than the buffered ones
+    @staticmethod
+    def _extends_history(buffer, new_data):
+        if buffer.empty or new_data is None or new_data.empty:
+            return False
+        return len(new_data) > len(buffer) and new_data.index[0] < buffer.first_timestamp
+
     # Get parent data
-    def _get_parent_data(self, limit=90): 
+    def _get_parent_data(self, limit=90, priority=PRIORITY_LIVE):
         if not self.parent_interval_supported:
             return
         
         try:
+            if self._is_resampling_parent():
+                # The base candles were just appended, only the latest parents need rebuilding
+                if self._get_context(self._parent_buffer, limit) is not None:
+                    self._resample_parent_tail()
+                else:
+                    self._append_parent_data(self._get_parent_ohlc(limit=limit, priority=priority))
+                return
+
             # Reset counter if it exceeds the update period
             if self.data_update_counter >= self.parent_update_period:
                 self.data_update_counter = 0
                 
             if self.data_update_counter == 0:
-                new_data_parent = self._get_ohlc(self.symbol, interval=self.parent_interval, limit=limit)
-                
-                if self.data_parent.empty:
-                    self.data_parent = new_data_parent
-                else:
-                    last_timestamp_parent = self.data_parent.index[-1]
-                    new_data_parent = new_data_parent[new_data_parent.index > last_timestamp_parent]
-                    self.data_parent = pd.concat([self.data_parent, new_data_parent])
+                context = self._get_context(self._parent_buffer, limit)
+                new_data_parent = self._get_ohlc(self.symbol, interval=self.parent_interval, limit=limit, priority=priority, context=context)
+                self._append_parent_data(new_data_parent, refresh_last=context is not None)
                     
                 self.logger.debug(f"Updated parent data at counter {self.data_update_counter}")
             
@@ -249,6 +955,48 @@ class DataManager:
             self.logger.error(f"Error getting parent data: {str(e)}")
             raise
 
+    # Check if parent candles are built from base candles
+    def _is_resampling_parent(self):
+        """
+        Parents are resampled when enabled and the parent is a multiple of the base of at most a day,
+        longer Kraken candles aren't aligned to the epoch so they are always fetched.
+        """
+        if not self.resample_parent or not self.parent_interval_supported:
+            return False
+        base_minutes = self.interval_in_minutes(self.interval)
+        parent_minutes = self.interval_in_minutes(self.parent_interval)
+        return parent_minutes % base_minutes == 0 and parent_minutes <= 1440
+
+    # Get parent candles
+    def _get_parent_ohlc(self, limit=90, priority=PRIORITY_LIVE, base=None):
+        """
+        Get parent candles, resampled from base candles when possible.
+        With the candle store the base candles were just fetched, so this costs no API call.
+        Falls back to requesting the parent interval when the base history is too short.
+
+        :param base: Raw base candles fetched already, e.g. by BatchFetcher, fetched if None
+        """
+        if self._is_resampling_parent():
+            base_limit = self._get_parent_base_limit(limit)
+
+            # Without the store only a single request worth of base candles is available
+            if base is None and (self.store is not None or base_limit <= KRAKEN_OHLC_LIMIT):
+                base = self._get_candles(self.symbol, self.interval, limit=base_limit, priority=priority)
+            if base is not None:
+                df = self._resample_candles(base, self.parent_interval)
+                if df is not None and len(df) >= limit:
+                    return self._prepare_candles(df, self.symbol, self.parent_interval, limit)
+
+            self.logger.debug(f"Not enough {self.interval} candles to build {limit} {self.parent_interval} candles, requesting them")
+
+        return self._get_ohlc(self.symbol, interval=self.parent_interval, limit=limit, priority=priority)
+
+    # Number of base candles to resample limit parent candles from
+    def _get_parent_base_limit(self, limit):
+        # One more parent, the first bucket may have started before the base candles did
+        ratio = self.interval_in_minutes(self.parent_interval) // self.interval_in_minutes(self.interval)
+        return (limit + 1) * ratio
+
     # Validate timeframe relationship
     def _validate_timeframe_relationship(self):
         """
@@ -312,26 +1060,15 @@ class DataManager:
             return
 
         try:
-            current_time = self.data.index[-1]
-            
-            # Find the parent candle that contains the current time
-            parent_data_current = self.data_parent[self.data_parent.index <= current_time]
-            
-            if parent_data_current.empty:
-                self.logger.warning("No parent data found for current timestamp")
+            position = self.get_parent_positions(closed=False)[-1]
+
+            if position < 0:
+                self.logger.warning(f"No parent candle encloses {self.data.index[-1]}")
                 self.latest_parent_data = None
                 return
 
-            latest_parent_time = parent_data_current.index[-1]
-            next_parent_time = latest_parent_time + pd.Timedelta(self.parent_interval)
-            
-            # Verify current time falls within the parent candle's timeframe
-            if latest_parent_time <= current_time < next_parent_time:
-                self.latest_parent_data = parent_data_current.iloc[-1]
-                self.logger.debug(f"Synchronized with parent candle: {latest_parent_time}")
-            else:
-                self.logger.warning(f"Current time {current_time} doesn't align with parent timeframe")
-                self.latest_parent_data = None
+            self.latest_parent_data = self.data_parent.iloc[position]
+            self.logger.debug(f"Synchronized with parent candle: {self.data_parent.index[position]}")
 
         except Exception as e:
             self.logger.error(f"Error during data synchronization: {str(e)}")
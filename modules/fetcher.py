@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+from modules.logger import logger
+from modules.kraken import PRIORITY_SCAN, PRIORITY_BACKFILL
+
+class BatchFetcher:
+    """
+    Fetch candles for many data managers concurrently over the shared Kraken connection pool.
+    Every unique (symbol, interval) is requested once, even when several data managers need it.
+    Requests go through the scan lane of the rate limit scheduler, behind live strategies.
+    """
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self.logger = logger
+
+    # Fetch and prefill data managers
+    def fetch(self, data_managers, limit=180):
+        """
+        Fetch base and parent candles for all data managers and prefill them.
+        Resampled parents are built from the candles of their base job, so those symbols cost one request.
+        Data managers whose fetch failed are left untouched and reported back.
+
+        :param data_managers: List of DataManager
+        :param limit: Number of base candles, parent candles use half of it like update_data
+        :return: Dict of failed (symbol, interval) to the exception
+        """
+        jobs = {}
+        for data_manager in data_managers:
+            jobs.setdefault((data_manager.symbol, data_manager.interval, limit), data_manager)
+            if data_manager.parent_interval_supported:
+                jobs.setdefault((data_manager.symbol, data_manager.parent_interval, int(limit/2)), data_manager)
+
+        # Parent jobs to resample and the base job each one waits for, which fetches enough candles for it
+        resampled = {
+            key: (key[0], data_manager.interval, limit) for key, data_manager in jobs.items()
+            if key[1] == data_manager.parent_interval and data_manager._is_resampling_parent()
+        }
+        base_limits = {}
+        for key, base_key in resampled.items():
+            base_limits[base_key] = max(base_limits.get(base_key, limit), jobs[key]._get_parent_base_limit(key[2]))
+
+        self.logger.info(f"Fetching {len(jobs) - len(resampled)} series for {len(data_managers)} data managers with {self.max_workers} workers")
+
+        results = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for key, data_manager in jobs.items():
+                if key in resampled:
+                    continue
+                if key[1] == data_manager.interval:
+                    futures[key] = executor.submit(data_manager._get_candles, key[0], key[1], limit=base_limits.get(key, limit), priority=PRIORITY_SCAN)
+                else:
+                    futures[key] = executor.submit(data_manager._get_ohlc, key[0], key[1], limit=key[2], priority=PRIORITY_SCAN)
+            candles = self._collect(futures, errors)
+
+            # Resample parents from the fetched base candles, a short base history still requests the parent
+            futures = {
+                key: executor.submit(jobs[key]._get_parent_ohlc, limit=key[2], priority=PRIORITY_SCAN, base=candles[base_key])
+                for key, base_key in resampled.items() if candles.get(base_key) is not None
+            }
+            results.update(self._collect(futures, errors))
+
+        for key, data in candles.items():
+            data_manager = jobs[key]
+            if key[1] != data_manager.interval or data is None:
+                results[key] = data
+            else:
+                results[key] = data_manager._prepare_candles(data, key[0], key[1], key[2])
+
+        for data_manager in data_managers:
+            data = results.get((data_manager.symbol, data_manager.interval, limit))
+            data_parent = None
+            if data_manager.parent_interval_supported:
+                data_parent = results.get((data_manager.symbol, data_manager.parent_interval, int(limit/2)))
+                if data_parent is None:
+                    continue
+            if data is None:
+                continue
+
+            # Each data manager records its own trades on the frame, so they get a copy
+            data_manager.load_data(data.copy(), data_parent.copy() if data_parent is not None else None)
+
+        return errors
+
+    # Update data managers concurrently
+    def update(self, data_managers, limit=180, priority=PRIORITY_BACKFILL):
+        """
+        Call update_data of every data manager, e.g. before backtests that may rebuild history from trades.
+        Fetching here instead of in worker processes keeps every request behind this process's rate limiter.
+
+        :return: Dict of failed (symbol, interval) to the exception
+        """
+        errors = {}
+
+        def update(data_manager):
+            try:
+                data_manager.update_data(limit=limit, priority=priority)
+            except Exception as e:
+                self.logger.error(f"Error fetching {data_manager.symbol} {data_manager.interval}: {str(e)}")
+                errors[(data_manager.symbol, data_manager.interval)] = e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(update, data_managers))
+
+        return errors
+
+    # Wait for fetches, failed ones are logged and recorded in errors
+    def _collect(self, futures, errors):
+        results = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                self.logger.error(f"Error fetching {key[0]} {key[1]}: {str(e)}")
+                errors[(key[0], key[1])] = e
+        return results
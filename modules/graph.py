@@ -154,7 +154,7 @@ def draw_graph(df, limit=180, summary=None, step_run=False):
 
     # Update layout
     if not step_run:
-        text = f'<b>{summary["name"]} {df["symbol"].iloc[0]} - {df["interval"].iloc[0].upper()} </b> - {summary["win_trades"]} Win / {summary["loss_trades"]} Loss Trades -  Profit Factor: {summary["profit_factor"]:.2f} - Total Gain/Loss: {summary["total_profit_loss_percentage"]:.2f}%'
+        text = f'<b>{summary["name"]} {df.attrs["symbol"]} - {df.attrs["interval"].upper()} </b> - {summary["win_trades"]} Win / {summary["loss_trades"]} Loss Trades -  Profit Factor: {summary["profit_factor"]:.2f} - Total Gain/Loss: {summary["total_profit_loss_percentage"]:.2f}%'
     else:
         text = f'<b>{summary["name"]} {summary["symbol"]} {summary["interval"]} </b>'
 
@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from modules.logger import logger
+from modules.kraken import PRIORITY_BACKFILL
+
+class HistoryLoader:
+    """
+    Extends candle history past Kraken's OHLC window, which only ever holds the latest 720 candles.
+    Older candles are rebuilt from the public trades endpoint: the missing span is cut into chunks,
+    each chunk pages through its trades, and chunks are fetched concurrently through the shared rate limit scheduler.
+    Rebuilt candles are stitched in front of the known ones, newest chunk first, and persisted in the candle store.
+    """
+    def __init__(self, client, store=None, chunk_candles=168, max_workers=4):
+        """
+        :param client: KrakenClient to fetch trades with
+        :param store: CandleStore to persist rebuilt candles in, None to only return them
+        :param chunk_candles: Candles covered by one chunk of trades
+        :param max_workers: Chunks fetched at once, requests still wait for the rate limit
+        """
+        self.client = client
+        self.store = store
+        self.chunk_candles = chunk_candles
+        self.max_workers = max_workers
+        self.logger = logger
+
+    # Extend candles back to limit
+    def extend(self, symbol, interval_minutes, rows, limit, interval=None, priority=PRIORITY_BACKFILL):
+        """
+        :param rows: Known candles in Kraken's OHLC layout, ascending and contiguous
+        :param limit: Number of candles wanted
+        :param interval: Interval name the store keys candles by
+        :return: Rows extended with rebuilt older candles, at most limit of them
+        """
+        if not rows or len(rows) >= limit:
+            return rows[-limit:] if rows else rows
+
+        length = interval_minutes * 60
+        first = int(rows[0][0])
+        start = first - (limit - len(rows)) * length
+        span = self.chunk_candles * length
+        chunks = [(max(start, end - span), end) for end in range(first, start, -span)]
+
+        self.logger.info(f"Rebuilding {limit - len(rows)} {symbol} {interval} candles from trades in {len(chunks)} chunks")
+
+        # Only a gapless run of chunks next to the known candles is kept, so stop at the first failure
+        older = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._get_trades, symbol, chunk_start, chunk_end, priority) for chunk_start, chunk_end in chunks]
+            for future in futures:
+                try:
+                    older.insert(0, future.result())
+                except Exception as e:
+                    self.logger.error(f"Error rebuilding {symbol} {interval} history: {str(e)}")
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+        if not older:
+            return rows
+
+        rebuilt = self._trades_to_candles(*(np.concatenate(columns) for columns in zip(*older)), length, first)
+        if rebuilt and self.store is not None:
+            self.store.save(symbol, interval, rebuilt)
+
+        self.logger.info(f"Rebuilt {len(rebuilt)} {symbol} {interval} candles from trades")
+        return (rebuilt + list(rows))[-limit:]
+
+    # Get trades of a time span
+    def _get_trades(self, symbol, start, end, priority):
+        """
+        Page forward through the trades endpoint from start until end.
+
+        :return: Arrays of trade times, prices and volumes
+        """
+        times, prices, volumes = [], [], []
+
+        # since is exclusive, step back a nanosecond to keep trades right at start
+        since = start * 10**9 - 1
+
+        while True:
+            result = self.client.get("/0/public/Trades", params={"pair": symbol, "since": since}, priority=priority)
+            trades = next(value for key, value in result.items() if key != "last")
+            for trade in trades:
+                if float(trade[2]) >= end:
+                    break
+                prices.append(float(trade[0]))
+                volumes.append(float(trade[1]))
+                times.append(float(trade[2]))
+
+            last = int(result["last"])
+            if not trades or float(trades[-1][2]) >= end or last <= since:
+                break
+            since = last
+
+        return np.array(times), np.array(prices), np.array(volumes)
+
+    # Aggregate trades into candles
+    @staticmethod
+    def _trades_to_candles(times, prices, volumes, length, end):
+        """
+        Bucket trades into candles up to end. Candles without trades are flat at the previous close
+        with no volume, like Kraken's own; the span before the first trade is left out.
+
+        :return: Rows in Kraken's OHLC layout
+        """
+        if len(times) == 0:
+            return []
+
+        order = np.argsort(times, kind='stable')
+        times, prices, volumes = times[order], prices[order], volumes[order]
+        buckets = (times // length).astype(np.int64) * length
+        opens, starts = np.unique(buckets, return_index=True)
+        stops = np.append(starts[1:], len(times))
+
+        timestamps = np.arange(opens[0], end, length, dtype=np.int64)
+        positions = np.searchsorted(opens, timestamps, side='right') - 1
+        traded = opens[positions] == timestamps
+
+        close = prices[stops - 1][positions]
+        open_ = np.where(traded, prices[starts][positions], close)
+        high = np.where(traded, np.maximum.reduceat(prices, starts)[positions], close)
+        low = np.where(traded, np.minimum.reduceat(prices, starts)[positions], close)
+        volume = np.add.reduceat(volumes, starts)
+        notional = np.add.reduceat(prices * volumes, starts)
+        vwap = np.divide(notional, volume, out=prices[stops - 1].copy(), where=volume > 0)
+        vwap = np.where(traded, vwap[positions], close)
+        volume = np.where(traded, volume[positions], 0.0)
+        count = np.where(traded, (stops - starts)[positions], 0)
+
+        return [list(row) for row in zip(timestamps.tolist(), open_.tolist(), high.tolist(), low.tolist(), close.tolist(),
+                                         vwap.tolist(), volume.tolist(), count.tolist())]
@@ -0,0 +1,102 @@
+import threading
+import time
+from modules.buffer import CandleBuffer
+from modules.levels import SupportResistanceLevels
+from modules.logger import logger
+
+class MarketFeed:
+    """
+    Candles of one symbol, interval and parent interval shared by every subscribed data manager.
+    Holds the candle buffers and level indexes, updates are fetched once per candle and seen by all subscribers.
+    """
+    def __init__(self, symbol, interval, parent_interval, retention=1000):
+        self.key = (symbol, interval, parent_interval)
+        self.buffer = CandleBuffer(retention)
+        self.parent_buffer = CandleBuffer(retention)
+        self.levels = SupportResistanceLevels()
+        self.parent_levels = SupportResistanceLevels()
+        self.update_counter = 0
+        self.version = 0
+        self.subscribers = 0
+        self.updated_period = None
+        self.updated_limit = 0
+        self.fetches = 0
+        self.skipped = 0
+        self.lock = threading.RLock()
+
+    # Locks can't be pickled, strategies are sent to worker processes by the dashboard
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    # Update candles unless already done for the current candle
+    def update(self, fetch, limit, interval_seconds):
+        """
+        Call fetch once per candle period, later calls within the same period reuse its candles.
+
+        :param fetch: Callable appending fresh candles to the buffers
+        :param limit: Number of candles the caller needs, a larger limit fetches again
+        :param interval_seconds: Candle length
+        :return: True if fetch was called
+        """
+        with self.lock:
+            period = int(time.time() // interval_seconds)
+            if self.updated_period == period and limit <= self.updated_limit:
+                self.skipped += 1
+                return False
+
+            fetch()
+            self.fetches += 1
+            self.updated_limit = limit if self.updated_period != period else max(limit, self.updated_limit)
+            self.updated_period = period
+            return True
+
+    # Mark the candles as changed
+    def touch(self):
+        self.version += 1
+
+class MarketDataHub:
+    """
+    Process-wide market feeds keyed by (symbol, interval, parent_interval).
+    Data managers subscribe to a feed instead of keeping their own candles, feeds are
+    reference counted and dropped once the last subscriber is gone.
+    """
+    def __init__(self):
+        self.feeds = {}
+        self.lock = threading.Lock()
+        self.logger = logger
+
+    # Subscribe to a feed
+    def subscribe(self, symbol, interval, parent_interval, retention=1000):
+        key = (symbol, interval, parent_interval)
+        with self.lock:
+            feed = self.feeds.get(key)
+            if feed is None:
+                feed = MarketFeed(symbol, interval, parent_interval, retention=retention)
+                self.feeds[key] = feed
+            feed.subscribers += 1
+            return feed
+
+    # Unsubscribe from a feed
+    def unsubscribe(self, feed):
+        with self.lock:
+            feed.subscribers -= 1
+            if feed.subscribers <= 0 and self.feeds.get(feed.key) is feed:
+                del self.feeds[feed.key]
+                self.logger.debug(f"Dropped market feed {feed.key}")
+
+    # Get hub stats
+    def get_stats(self):
+        with self.lock:
+            return {
+                key: {'subscribers': feed.subscribers, 'fetches': feed.fetches, 'skipped': feed.skipped, 'candles': len(feed.buffer)}
+                for key, feed in self.feeds.items()
+            }
+
+# Create and export a single hub instance
+market_data_hub = MarketDataHub()
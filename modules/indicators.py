@@ -0,0 +1,586 @@
+from abc import ABC, abstractmethod
+from collections import deque
+import itertools
+import math
+import re
+import sys
+import threading
+import numpy as np
+import pandas as pd
+
+# A base class for streaming indicators
+class Indicator(ABC):
+    """
+    Streaming indicator that keeps its running state between bars.
+    update commits a bar and returns the output values, peek evaluates a bar without committing it.
+    Values follow pandas_ta with its default settings.
+    """
+    def __init__(self, sources=('close',)):
+        self.sources = tuple(sources)
+
+    # Output column names, same as the pandas_ta column names
+    @property
+    def outputs(self):
+        return (self.name,)
+
+    # Update with a closed bar
+    @abstractmethod
+    def update(self, *values):
+        pass
+
+    # Evaluate a bar without committing it
+    def peek(self, *values):
+        state = self.snapshot()
+        try:
+            return self.update(*values)
+        finally:
+            self.restore(state)
+
+    # Snapshot running state
+    def snapshot(self):
+        state = {}
+        for key, value in self.__dict__.items():
+            if isinstance(value, Indicator):
+                state[key] = value.snapshot()
+            elif isinstance(value, deque):
+                state[key] = value.copy()
+            else:
+                state[key] = value
+        return state
+
+    # Restore running state
+    def restore(self, state):
+        for key, value in state.items():
+            if isinstance(self.__dict__.get(key), Indicator):
+                self.__dict__[key].restore(value)
+            else:
+                self.__dict__[key] = value
+
+    # Fresh copy without running state
+    @abstractmethod
+    def clone(self):
+        pass
+
+# Exponential moving average seeded with the SMA of the first length values
+class EMA(Indicator):
+    def __init__(self, length, source='close'):
+        super().__init__(sources=(source,))
+        self.length = length
+        self.alpha = 2 / (length + 1)
+        self.count = 0
+        self.seed = 0.0
+        self.value = math.nan
+
+    @property
+    def name(self):
+        return _name("EMA", self.length, source=self.sources[0])
+
+    def update(self, value):
+        # Leading NaNs (e.g. a MACD line still warming up) are skipped
+        if math.isnan(value):
+            return (self.value,)
+
+        self.count += 1
+        if self.count < self.length:
+            self.seed += value
+        elif self.count == self.length:
+            self.seed += value
+            self.value = self.seed / self.length
+        else:
+            self.value = (1 - self.alpha) * self.value + self.alpha * value
+        return (self.value,)
+
+    def clone(self):
+        return EMA(self.length, source=self.sources[0])
+
+# Simple moving average
+class SMA(Indicator):
+    def __init__(self, length, source='close'):
+        super().__init__(sources=(source,))
+        self.length = length
+        self.window = deque(maxlen=length)
+        # Running sum of the window
+        self.total = 0.0
+        # Latest values that are all the same, like pandas their mean is that value exactly
+        self.repeats = 0
+        self.updates = 0
+
+    @property
+    def name(self):
+        return _name("SMA", self.length, source=self.sources[0])
+
+    def update(self, value):
+        self.total = self._sum(value)
+        self.repeats = self._repeats(value)
+        self.window.append(value)
+        # Same value as the peek of the bar, the sum is refreshed for the next bars only
+        values = self._mean(len(self.window), self.total, value, self.repeats)
+        self.updates += 1
+        # Sum the window again once per window, so rounding errors of the running sum don't pile up
+        if self.updates % self.length == 0:
+            self.total = sum(self.window)
+        return values
+
+    # Evaluate a bar in O(1) without copying the window
+    def peek(self, value):
+        return self._mean(min(len(self.window) + 1, self.length), self._sum(value), value, self._repeats(value))
+
+    # Sum of the window once value is appended
+    def _sum(self, value):
+        full = len(self.window) == self.length
+        total = self.total + value - (self.window[0] if full else 0.0)
+        # A NaN leaving the window can't be subtracted, sum the rest again
+        if math.isnan(total):
+            total = sum(itertools.islice(self.window, 1 if full else 0, None)) + value
+        return total
+
+    def _repeats(self, value):
+        return self.repeats + 1 if self.window and self.window[-1] == value else 1
+
+    def _mean(self, size, total, value, repeats):
+        if size < self.length:
+            return (math.nan,)
+        if repeats >= self.length:
+            return (value,)
+        return (total / self.length,)
+
+    def clone(self):
+        return SMA(self.length, source=self.sources[0])
+
+# Relative strength index with Wilder's smoothing
+class RSI(Indicator):
+    def __init__(self, length=14, source='close'):
+        super().__init__(sources=(source,))
+        self.length = length
+        self.decay = 1 - 1 / length
+        self.previous = math.nan
+        self.count = 0
+        # Adjusted exponential means kept as weighted sums and weights
+        self.gain_sum = 0.0
+        self.loss_sum = 0.0
+        self.weight = 0.0
+
+    @property
+    def name(self):
+        return _name("RSI", self.length, source=self.sources[0])
+
+    def update(self, value):
+        previous, self.previous = self.previous, value
+        if math.isnan(previous) or math.isnan(value):
+            return (math.nan,)
+
+        change = value - previous
+        self.count += 1
+        self.gain_sum = max(change, 0.0) + self.decay * self.gain_sum
+        self.loss_sum = max(-change, 0.0) + self.decay * self.loss_sum
+        self.weight = 1.0 + self.decay * self.weight
+
+        if self.count < self.length:
+            return (math.nan,)
+
+        gain = self.gain_sum / self.weight
+        loss = self.loss_sum / self.weight
+        if gain + loss == 0:
+            return (math.nan,)
+        return (100 * gain / (gain + loss),)
+
+    def clone(self):
+        return RSI(self.length, source=self.sources[0])
+
+# Moving average convergence divergence
+class MACD(Indicator):
+    def __init__(self, fast=12, slow=26, signal=9, source='close'):
+        super().__init__(sources=(source,))
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+        self.fast_ema = EMA(fast)
+        self.slow_ema = EMA(slow)
+        self.signal_ema = EMA(signal)
+
+    @property
+    def name(self):
+        return _name("MACD", self.fast, self.slow, self.signal, source=self.sources[0])
+
+    @property
+    def outputs(self):
+        suffix = self.name[len("MACD"):]
+        return (f"MACD{suffix}", f"MACDh{suffix}", f"MACDs{suffix}")
+
+    def update(self, value):
+        fast, = self.fast_ema.update(value)
+        slow, = self.slow_ema.update(value)
+        macd = fast - slow
+        signal, = self.signal_ema.update(macd)
+        return (macd, macd - signal, signal)
+
+    def clone(self):
+        return MACD(self.fast, self.slow, self.signal, source=self.sources[0])
+
+# Money flow index
+class MFI(Indicator):
+    def __init__(self, length=14):
+        super().__init__(sources=('high', 'low', 'close', 'volume'))
+        self.length = length
+        self.previous = math.nan
+        self.flows = deque(maxlen=length)
+        # Running sums of the positive and negative money flows in the window
+        self.positive = 0.0
+        self.negative = 0.0
+        # Bars without money flow, a window of only those has no index even if the sums kept a rounding error
+        self.idle = 0
+        self.updates = 0
+
+    @property
+    def name(self):
+        return _name("MFI", self.length)
+
+    def update(self, high, low, close, volume):
+        typical_price, flow = self._flow(high, low, close, volume)
+        self.positive, self.negative, self.idle = self._sums(flow)
+        self.flows.append(flow)
+        self.previous = typical_price
+        # Same value as the peek of the bar, the sums are refreshed for the next bars only
+        values = self._index(len(self.flows), self.positive, self.negative, self.idle)
+        self.updates += 1
+        # Sum the window again once per window, so rounding errors of the running sums don't pile up
+        if self.updates % self.length == 0:
+            self.positive = sum(flow[0] for flow in self.flows)
+            self.negative = sum(flow[1] for flow in self.flows)
+        return values
+
+    # Evaluate a bar in O(1) without copying the window
+    def peek(self, high, low, close, volume):
+        _, flow = self._flow(high, low, close, volume)
+        return self._index(min(len(self.flows) + 1, self.length), *self._sums(flow))
+
+    # Typical price and positive and negative money flow of a bar
+    def _flow(self, high, low, close, volume):
+        typical_price = (high + low + close) / 3.0
+        raw_money_flow = typical_price * volume
+
+        if typical_price > self.previous:
+            return typical_price, (raw_money_flow, 0.0)
+        elif typical_price < self.previous:
+            return typical_price, (0.0, raw_money_flow)
+        return typical_price, (0.0, 0.0)
+
+    # Sums and idle bars of the window once flow is appended
+    def _sums(self, flow):
+        full = len(self.flows) == self.length
+        oldest = self.flows[0] if full else None
+        positive = self.positive + flow[0] - (oldest[0] if full else 0.0)
+        negative = self.negative + flow[1] - (oldest[1] if full else 0.0)
+        idle = self.idle + (flow == (0.0, 0.0)) - (oldest == (0.0, 0.0))
+        # A NaN leaving the window can't be subtracted, sum the rest again
+        if math.isnan(positive) or math.isnan(negative):
+            rest = list(itertools.islice(self.flows, 1 if full else 0, None)) + [flow]
+            positive = sum(flow[0] for flow in rest)
+            negative = sum(flow[1] for flow in rest)
+        return positive, negative, idle
+
+    def _index(self, size, positive, negative, idle):
+        if size < self.length:
+            return (math.nan,)
+        if idle == size or positive + negative == 0:
+            return (math.nan,)
+        return (100 * positive / (positive + negative),)
+
+    def clone(self):
+        return MFI(self.length)
+
+# Stochastic RSI
+class StochRSI(Indicator):
+    def __init__(self, length=14, rsi_length=14, k=3, d=3, source='close'):
+        super().__init__(sources=(source,))
+        self.length = length
+        self.rsi_length = rsi_length
+        self.k = k
+        self.d = d
+        self.rsi = RSI(rsi_length)
+        self.window = deque(maxlen=length)
+        self.k_sma = SMA(k)
+        self.d_sma = SMA(d)
+
+    @property
+    def name(self):
+        return _name("STOCHRSI", self.length, self.rsi_length, self.k, self.d, source=self.sources[0])
+
+    @property
+    def outputs(self):
+        suffix = self.name[len("STOCHRSI"):]
+        return (f"STOCHRSIk{suffix}", f"STOCHRSId{suffix}")
+
+    def update(self, value):
+        rsi, = self.rsi.update(value)
+        self.window.append(rsi)
+
+        stoch = math.nan
+        if len(self.window) == self.length and not any(math.isnan(v) for v in self.window):
+            lowest = min(self.window)
+            # pandas_ta replaces a zero range with epsilon
+            value_range = (max(self.window) - lowest) or sys.float_info.epsilon
+            stoch = 100 * (rsi - lowest) / value_range
+
+        k, = self.k_sma.update(stoch)
+        d, = self.d_sma.update(k)
+        return (k, d)
+
+    def clone(self):
+        return StochRSI(self.length, self.rsi_length, self.k, self.d, source=self.sources[0])
+
+# Build a pandas_ta style column name
+def _name(prefix, *lengths, source='close'):
+    name = "_".join([prefix] + [str(length) for length in lengths])
+    if source != 'close':
+        name += f"_{source}"
+    return name
+
+# Growable output column
+class _Column:
+    def __init__(self, capacity=256):
+        self.values = np.full(capacity, np.nan)
+        self.size = 0
+
+    def append(self, value, keep=None):
+        if self.size + 1 >= len(self.values):
+            # Only the latest keep values can be read, copy them to a fresh array instead of growing,
+            # moving them within the array would change Series still viewing it
+            size = keep if keep is not None and 2 * keep < len(self.values) else self.size
+            values = np.full(len(self.values) if size < self.size else len(self.values) * 2, np.nan)
+            values[:size] = self.values[self.size - size:self.size]
+            self.values = values
+            self.size = size
+        self.values[self.size] = value
+        self.size += 1
+
+class IndicatorEngine:
+    """
+    Keeps streaming indicators in sync with a candle frame.
+    Closed bars are fed once and committed, the last bar is still forming so it is only peeked
+    and can change until the next bar arrives. Each sync costs O(1) per new bar.
+    """
+    def __init__(self):
+        self.indicators = {}
+        self.columns = {}
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.keep = 0
+        self.lock = threading.RLock()
+
+    # Locks can't be pickled, strategies are sent to worker processes by the dashboard
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    # Output names of the registered indicators
+    @property
+    def names(self):
+        return list(self.columns)
+
+    # Register an indicator
+    def add(self, indicator):
+        if isinstance(indicator, str):
+            indicator = parse_indicator(indicator)
+        if indicator.name in self.indicators:
+            return self.indicators[indicator.name]
+
+        missing = [source for source in indicator.sources if source not in _CANDLE_COLUMNS and source not in self.columns]
+        if missing:
+            raise ValueError(f"Indicator {indicator.name} depends on unknown columns: {missing}")
+
+        self.indicators[indicator.name] = indicator
+        for output in indicator.outputs:
+            self.columns[output] = _Column()
+
+        # A new indicator needs the whole history, recompute everything on the next sync
+        self.reset()
+        return indicator
+
+    # Reset running state
+    def reset(self):
+        for name, indicator in self.indicators.items():
+            self.indicators[name] = indicator.clone()
+        for output in self.columns:
+            self.columns[output] = _Column()
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    # New engine with the same indicators and no running state
+    def fork(self):
+        engine = IndicatorEngine()
+        for indicator in self.indicators.values():
+            engine.add(indicator.clone())
+        return engine
+
+    # Sync with the candle frame
+    def sync(self, data):
+        if data is None or data.empty:
+            return
+
+        index = data.index
+        start = 0
+
+        # Data reaching further back than what was computed gives different warmup values
+        if self.first_timestamp is not None and index[0] < self.first_timestamp:
+            self.reset()
+
+        if self.last_timestamp is not None:
+            if len(index) > 1 and index[-2] == self.last_timestamp:
+                start = len(index) - 1
+            else:
+                position = index.searchsorted(self.last_timestamp)
+                if position < len(index) and index[position] == self.last_timestamp:
+                    start = position + 1
+                else:
+                    # History was replaced (new backtest, rewound replay), start over
+                    self.reset()
+
+        if self.first_timestamp is None:
+            self.first_timestamp = index[0]
+
+        # Outputs only need to reach as far back as the longest frame synced with
+        self.keep = max(self.keep, len(index))
+
+        sources = {column: data[column].to_numpy()[start:].tolist() for column in _CANDLE_COLUMNS if column in data.columns}
+
+        # Commit closed bars
+        for i in range(len(index) - 1 - start):
+            row = {column: values[i] for column, values in sources.items()}
+            self._step(row, commit=True)
+        if len(index) > 1:
+            self.last_timestamp = index[-2]
+
+        # Peek the forming bar into the slot after the committed values
+        row = {column: values[-1] for column, values in sources.items()}
+        self._step(row, commit=False)
+
+    # Get indicator output aligned with the candle frame
+    def get(self, data, indicator):
+        """
+        Get the values of an indicator for every bar of data.
+
+        :param data: The candle frame to sync with
+        :param indicator: An Indicator, a spec like "SMA(RSI_7,14)" or the name of a registered output column
+        :return: A read-only Series for single output indicators, otherwise a DataFrame
+        """
+        with self.lock:
+            if isinstance(indicator, Indicator) or is_indicator_spec(indicator):
+                indicator = self.add(indicator)
+                outputs = indicator.outputs
+            else:
+                outputs = (indicator,)
+
+            self.sync(data)
+
+            series = {output: self._series(data, output) for output in outputs}
+            if len(series) == 1:
+                return next(iter(series.values()))
+            return pd.DataFrame(series, index=data.index)
+
+    # Feed one bar to every indicator
+    def _step(self, row, commit):
+        for indicator in self.indicators.values():
+            inputs = [row[source] for source in indicator.sources]
+            values = indicator.update(*inputs) if commit else indicator.peek(*inputs)
+            for output, value in zip(indicator.outputs, values):
+                row[output] = value
+                column = self.columns[output]
+                if commit:
+                    column.append(value, keep=self.keep)
+                else:
+                    column.values[column.size] = value
+
+    # Output column as a Series over data
+    def _series(self, data, output):
+        column = self.columns[output]
+        length = min(len(data), column.size + 1)
+        values = column.values[column.size + 1 - length:column.size + 1]
+        # Engines are shared between strategies, hand out read-only views
+        values.flags.writeable = False
+        return pd.Series(values, index=data.index[len(data) - length:], name=output, copy=False)
+
+_CANDLE_COLUMNS = ('open', 'high', 'low', 'close', 'vwap', 'volume', 'count')
+
+INDICATORS = {
+    'EMA': EMA,
+    'SMA': SMA,
+    'RSI': RSI,
+    'MACD': MACD,
+    'MFI': MFI,
+    'STOCHRSI': StochRSI
+}
+
+# Check if a value is an indicator spec like "RSI(7)"
+def is_indicator_spec(value):
+    return isinstance(value, str) and "(" in value
+
+# Parse an indicator spec
+def parse_indicator(spec):
+    """
+    Parse a declarative indicator spec into an Indicator.
+    Arguments are the pandas_ta lengths, an optional leading column name is used as the source,
+    e.g. "RSI(7)", "SMA(RSI_7,14)", "MACD(12,26,9)" or "STOCHRSI(14,14,3,3)".
+
+    :param spec: The indicator spec
+    :return: A new Indicator
+    """
+    match = re.fullmatch(r"\s*([A-Za-z]+)\s*\((.*)\)\s*", spec)
+    if not match or match.group(1).upper() not in INDICATORS:
+        raise ValueError(f"Invalid indicator spec: {spec}")
+
+    indicator_class = INDICATORS[match.group(1).upper()]
+    arguments = [argument.strip() for argument in match.group(2).split(",") if argument.strip()]
+
+    kwargs = {}
+    if arguments and not arguments[0].isdigit():
+        kwargs['source'] = arguments.pop(0)
+
+    try:
+        return indicator_class(*[int(argument) for argument in arguments], **kwargs)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid indicator spec: {spec} ({str(e)})")
+
+class IndicatorRegistry:
+    """
+    Process-wide indicator engines keyed by (symbol, interval, parent_interval), like the market feeds
+    whose candles they are synced with. Strategies running on the same feed register their indicators
+    on the same engines, so the union of everything they need is computed once per bar.
+    Engines are reference counted and dropped once the last subscriber is gone.
+    """
+    def __init__(self):
+        self.engines = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    # Subscribe to the shared base and parent engines of a symbol and intervals
+    def subscribe(self, symbol, interval, parent_interval):
+        """
+        :return: Engine of the base candles and engine of the parent candles
+        """
+        key = (symbol, interval, parent_interval)
+        with self.lock:
+            if key not in self.engines:
+                self.engines[key] = (IndicatorEngine(), IndicatorEngine())
+                self.subscribers[key] = 0
+            self.subscribers[key] += 1
+            return self.engines[key]
+
+    # Unsubscribe from the engines of a symbol and intervals
+    def unsubscribe(self, symbol, interval, parent_interval):
+        key = (symbol, interval, parent_interval)
+        with self.lock:
+            if key not in self.subscribers:
+                return
+            self.subscribers[key] -= 1
+            if self.subscribers[key] <= 0:
+                del self.engines[key]
+                del self.subscribers[key]
+
+# Create and export a single registry instance
+indicator_registry = IndicatorRegistry()
@@ -0,0 +1,245 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+import requests
+from collections import deque
+from requests.adapters import HTTPAdapter
+from modules.logger import logger
+
+# Priority lanes, lower goes first
+PRIORITY_LIVE = 0
+PRIORITY_SCAN = 1
+PRIORITY_BACKFILL = 2
+
+# API root, point it at a local stand-in to run without api.kraken.com
+KRAKEN_API_URL = os.environ.get("KRAKEN_API_URL", "https://api.kraken.com")
+
+class RequestScheduler:
+    """
+    Token bucket shared by every Kraken request of the process.
+    Waiting requests are served by priority lane first and arrival order second,
+    so live ticks overtake scans and backfills when the budget is tight.
+    """
+    def __init__(self, rate=1.0, capacity=5):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.stats = {
+            'requests': 0,
+            'throttled': 0,
+            'rate_limited': 0,
+            'retried': 0,
+            'failed': 0,
+            'expired': 0
+        }
+
+    # Refill tokens for the elapsed time
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Acquire a token
+    def acquire(self, priority=PRIORITY_LIVE, deadline=None):
+        """
+        Block until a token is available and no higher priority request is waiting.
+
+        :param priority: One of PRIORITY_LIVE, PRIORITY_SCAN, PRIORITY_BACKFILL
+        :param deadline: time.monotonic() value after which waiting raises TimeoutError
+        """
+        with self.condition:
+            entry = (priority, next(self.sequence))
+            heapq.heappush(self.waiting, entry)
+            throttled = False
+
+            try:
+                while True:
+                    self._refill()
+                    is_next = self.waiting[0] == entry
+                    if is_next and self.tokens >= 1:
+                        self.tokens -= 1
+                        self.stats['requests'] += 1
+                        return
+
+                    # The next in line sleeps until its token is refilled, the others until notified
+                    timeout = (1 - self.tokens) / self.rate if is_next else None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.stats['expired'] += 1
+                            raise TimeoutError("Request deadline exceeded while waiting for rate limit")
+                        timeout = remaining if timeout is None else min(timeout, remaining)
+
+                    throttled = True
+                    self.condition.wait(timeout)
+            finally:
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+                if throttled:
+                    self.stats['throttled'] += 1
+                self.condition.notify_all()
+
+    # Drain the bucket after the API reported a rate limit
+    def penalize(self):
+        with self.condition:
+            self._refill()
+            self.tokens = min(self.tokens, 0)
+            self.stats['rate_limited'] += 1
+
+    # Count a retry or a failure
+    def record(self, name):
+        with self.condition:
+            self.stats[name] += 1
+
+    # Get scheduler stats
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            stats['queued'] = len(self.waiting)
+            return stats
+
+    # Conditions can't be pickled
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['condition']
+        del state['sequence']
+        state['waiting'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+
+# Errors worth retrying
+class RetryableError(Exception):
+    pass
+
+class KrakenClient:
+    """
+    Kraken public API client sharing one keep-alive connection pool between all callers,
+    so concurrent fetches reuse TCP/TLS connections instead of opening one per request.
+    Requests go through the rate limit scheduler and are retried with jittered exponential backoff.
+    """
+    def __init__(self, base_url=KRAKEN_API_URL, pool_size=16, timeout=10, scheduler=None,
+                 max_retries=5, backoff_base=1.0, backoff_max=30.0, deadline=60):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.logger = logger
+        self.latencies = deque(maxlen=10000)
+        self.session = self._create_session()
+
+    # Create session
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({'Accept': 'application/json'})
+        return session
+
+    # Public GET request
+    def get(self, path, params=None, priority=PRIORITY_LIVE, deadline=None):
+        """
+        Send a GET request to a public endpoint.
+
+        :param path: Endpoint path, e.g. /0/public/OHLC
+        :param params: Query parameters
+        :param priority: Scheduler priority lane
+        :param deadline: Seconds the request may take including waits and retries, client default if None
+        :return: The result field of the response
+        """
+        started = time.monotonic()
+        deadline_at = started + (deadline if deadline is not None else self.deadline)
+
+        try:
+            return self._get(path, params, priority, deadline_at)
+        finally:
+            # Latency as seen by the caller, including rate limit waits and retries
+            self.latencies.append(time.monotonic() - started)
+
+    # Send a request with retries
+    def _get(self, path, params, priority, deadline_at):
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.acquire(priority, deadline=deadline_at)
+            remaining = deadline_at - time.monotonic()
+
+            try:
+                return self._send(path, params, timeout=max(min(self.timeout, remaining), 0.1))
+            except (RetryableError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+                if attempt == self.max_retries or time.monotonic() + delay > deadline_at:
+                    self.scheduler.record('failed')
+                    if isinstance(e, RetryableError):
+                        raise ValueError(str(e))
+                    raise
+
+                self.scheduler.record('retried')
+                self.logger.warning(f"Kraken request {path} failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    # Send a single request
+    def _send(self, path, params, timeout):
+        response = self.session.get(self.base_url + path, params=params, timeout=timeout)
+
+        if response.status_code == 429:
+            self.scheduler.penalize()
+            raise RetryableError("Kraken API error: HTTP 429")
+        if response.status_code >= 500:
+            raise RetryableError(f"Kraken API error: HTTP {response.status_code}")
+
+        response.raise_for_status()
+        data = response.json()
+
+        if 'error' in data and data['error']:
+            if any("Rate limit" in error for error in data['error']):
+                self.scheduler.penalize()
+                raise RetryableError(f"Kraken API error: {data['error']}")
+            if any(error.startswith("EService") for error in data['error']):
+                raise RetryableError(f"Kraken API error: {data['error']}")
+            raise ValueError(f"Kraken API error: {data['error']}")
+
+        return data['result']
+
+    # Sessions hold sockets, recreate them after pickling into worker processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['session']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.session = self._create_session()
+
+# Clients of other API roots, e.g. a local stand-in
+_clients = {}
+
+# Get the client of an API root
+def get_kraken_client(base_url=None):
+    """
+    Get a client sharing its connection pool and rate limit with every caller of the same API root.
+
+    :param base_url: API root, the default client's if None
+    """
+    if base_url is None or base_url == kraken_client.base_url:
+        return kraken_client
+    if base_url not in _clients:
+        _clients[base_url] = KrakenClient(base_url=base_url)
+    return _clients[base_url]
+
+# Create and export a single client instance
+kraken_client = KrakenClient()
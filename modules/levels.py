@@ -0,0 +1,132 @@
+import bisect
+import numpy as np
+
+class LevelIndex:
+    """
+    Sorted price levels of one kind with O(log n) nearest-level queries.
+    Levels closer than deviation_threshold are clustered into one level, its strength counts the touches.
+    Every touch keeps the timestamp it was confirmed at, so queries can be limited to what was known at a bar.
+    """
+    def __init__(self, deviation_threshold=0.005):
+        self.deviation_threshold = deviation_threshold
+        self.prices = []
+        self.levels = []
+        self._seen = set()
+
+    def __len__(self):
+        return len(self.levels)
+
+    # Add a detected level
+    def add(self, price, timestamp, confirmed_at=None):
+        """
+        Add a level, merging it into an existing one within deviation_threshold.
+        Adding the same timestamp twice is a no-op, so overlapping fetches can be fed again.
+
+        :param price: Level price
+        :param timestamp: Timestamp of the bar the level was detected at
+        :param confirmed_at: Timestamp from which the level is known, timestamp if None
+        """
+        if timestamp in self._seen:
+            return
+        self._seen.add(timestamp)
+
+        touch = (confirmed_at if confirmed_at is not None else timestamp, timestamp)
+        position = bisect.bisect_left(self.prices, price)
+
+        # Merge into the closest neighbour if it is close enough
+        closest = None
+        for neighbour in (position - 1, position):
+            if 0 <= neighbour < len(self.prices):
+                deviation = abs(price - self.prices[neighbour]) / self.prices[neighbour]
+                if deviation <= self.deviation_threshold and (closest is None or deviation < closest[1]):
+                    closest = (neighbour, deviation)
+
+        if closest is not None:
+            bisect.insort(self.levels[closest[0]]['touches'], touch)
+        else:
+            self.prices.insert(position, price)
+            self.levels.insert(position, {'price': price, 'touches': [touch]})
+
+    # Get nearest level below price
+    def nearest_below(self, price, as_of=None):
+        i = bisect.bisect_left(self.prices, price) - 1
+        while i >= 0:
+            level = self._view(self.levels[i], as_of)
+            if level is not None:
+                return level
+            i -= 1
+        return None
+
+    # Get nearest level above price
+    def nearest_above(self, price, as_of=None):
+        i = bisect.bisect_right(self.prices, price)
+        while i < len(self.prices):
+            level = self._view(self.levels[i], as_of)
+            if level is not None:
+                return level
+            i += 1
+        return None
+
+    # Get levels within a percentage of price
+    def within(self, price, percentage, as_of=None):
+        lower = bisect.bisect_left(self.prices, price * (1 - percentage / 100))
+        upper = bisect.bisect_right(self.prices, price * (1 + percentage / 100))
+        levels = (self._view(level, as_of) for level in self.levels[lower:upper])
+        return [level for level in levels if level is not None]
+
+    # Level as known at as_of, None if it wasn't confirmed yet
+    @staticmethod
+    def _view(level, as_of):
+        touches = level['touches']
+        if as_of is not None:
+            touches = touches[:bisect.bisect_right(touches, (as_of, as_of))]
+            if not touches:
+                return None
+
+        timestamps = [timestamp for _, timestamp in touches]
+        return {
+            'price': level['price'],
+            'strength': len(touches),
+            'first_seen': min(timestamps),
+            'last_seen': max(timestamps)
+        }
+
+class SupportResistanceLevels:
+    """
+    Support and resistance level indexes of one symbol and interval, fed from the sparse
+    support/resistance columns of fetched candles.
+    A level detected at bar i needs window more bars to be confirmed, queries with as_of respect that.
+    """
+    def __init__(self, window=15, deviation_threshold=0.005):
+        self.window = window
+        self.support = LevelIndex(deviation_threshold)
+        self.resistance = LevelIndex(deviation_threshold)
+
+    # Ingest levels of fetched candles
+    def update(self, data):
+        if data is None or data.empty:
+            return
+
+        for column, index in (('support', self.support), ('resistance', self.resistance)):
+            if column not in data.columns:
+                continue
+
+            values = data[column]
+            for i in np.flatnonzero(values.notna().to_numpy()):
+                confirmed_at = data.index[min(i + self.window, len(data) - 1)]
+                index.add(float(values.iat[i]), data.index[i], confirmed_at)
+
+    # Get nearest support below price
+    def nearest_support(self, price, as_of=None):
+        return self.support.nearest_below(price, as_of)
+
+    # Get nearest resistance above price
+    def nearest_resistance(self, price, as_of=None):
+        return self.resistance.nearest_above(price, as_of)
+
+    # Get support and resistance levels within a percentage of price
+    def within(self, price, percentage, as_of=None):
+        return {
+            'support': self.support.within(price, percentage, as_of),
+            'resistance': self.resistance.within(price, percentage, as_of)
+        }
@@ -0,0 +1,190 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import numpy as np
+from modules.data import DataManager
+from modules.fetcher import BatchFetcher
+from modules.kraken import KrakenClient, RequestScheduler
+from modules.logger import logger
+from modules.standin import KrakenStandIn
+from modules.store import CandleStore
+from modules.strategy import BACKTEST_OFFSET
+
+class LoadHarness:
+    """
+    Drives the data layer against a Kraken stand-in the way the dashboard does:
+    the scan of every coin in coins.json and backtests of several coins.
+    Reports throughput, fetch latency percentiles and how failures were handled.
+    """
+    def __init__(self, strategy_class, stand_in, coins, interval="4h", parent_interval="1d",
+                 rate=None, capacity=15, max_workers=8, seed=0):
+        """
+        :param strategy_class: Strategy to scan and backtest with
+        :param stand_in: Started KrakenStandIn
+        :param coins: Coin pairs in coins.json format, e.g. BTC/USDT
+        :param rate: Client requests per second, unlimited if None
+        :param capacity: Client request burst
+        :param seed: Seed of the client's retry jitter
+        """
+        self.strategy_class = strategy_class
+        self.stand_in = stand_in
+        self.coins = coins
+        self.interval = interval
+        self.parent_interval = parent_interval
+        self.max_workers = max_workers
+        self.seed = seed
+        self.logger = logger
+        self.scheduler = RequestScheduler(rate=rate if rate is not None else 1e9, capacity=capacity)
+        self.client = KrakenClient(base_url=stand_in.url, scheduler=self.scheduler, backoff_base=0.05, backoff_max=1.0)
+
+    # Create strategies fetching from the stand-in
+    def _create_strategies(self, coins):
+        strategies = []
+        for coin in coins:
+            # Convert from "BTC/USDT" format to "BTCUSD" format
+            symbol = coin.split('/')[0] + "USD"
+            data_manager = DataManager(symbol, self.interval, self.parent_interval, store=None, client=self.client)
+            strategies.append(self.strategy_class(symbol=symbol, interval=self.interval, parent_interval=self.parent_interval,
+                                                  data_manager=data_manager))
+        return strategies
+
+    # Release the strategies' market feeds, so the next run fetches again
+    @staticmethod
+    def _close(strategies):
+        for strategy in strategies:
+            strategy.data_manager.close()
+
+    # Run the scan
+    def run_scan(self, limit=180):
+        """
+        Fetch every coin with BatchFetcher and run a strategy step on each, like the scanning dashboard.
+        """
+        strategies = self._create_strategies(self.coins)
+        return self._measure("scan", lambda: self._scan(strategies, limit), strategies)
+
+    def _scan(self, strategies, limit):
+        errors = BatchFetcher(max_workers=self.max_workers).fetch([strategy.data_manager for strategy in strategies], limit=limit)
+        for strategy in strategies:
+            strategy.run_step(update=strategy.data_manager.data.empty)
+        return errors
+
+    # Run backtests
+    def run_backtests(self, coins=10, duration=500):
+        """
+        Fetch the history of the first coins, then backtest them on it like the backtesting dashboard.
+        """
+        strategies = self._create_strategies(self.coins[:coins])
+        return self._measure("backtest", lambda: self._backtest(strategies, duration), strategies)
+
+    def _backtest(self, strategies, duration):
+        errors = BatchFetcher(max_workers=self.max_workers).update([strategy.data_manager for strategy in strategies], limit=duration + BACKTEST_OFFSET)
+        for strategy in strategies:
+            if (strategy.symbol, strategy.interval) in errors:
+                continue
+            try:
+                # The fetched candles stay fixed while backtesting and only the data layer is measured
+                strategy.backtest(duration, update=False, graph=False)
+            except Exception as e:
+                errors[(strategy.symbol, strategy.interval)] = e
+        return errors
+
+    # Check cold loads from a stale candle store
+    def run_store_check(self, limit=180):
+        """
+        Load a coin into an empty store, then load it again into a fresh data manager once the store is stale.
+        The second load only fetches the candles newer than the store, yet must still return limit candles.
+        """
+        symbol = self.coins[0].split('/')[0] + "USD"
+        with tempfile.TemporaryDirectory() as directory:
+            store = CandleStore(os.path.join(directory, "candles.db"))
+            lengths = []
+            for _ in range(2):
+                data_manager = DataManager(symbol, self.interval, self.parent_interval, store=store, store_max_age=0,
+                                           client=self.client, hub=None)
+                data_manager.update_data(limit=limit)
+                lengths.append(len(data_manager.data))
+
+        report = {'workload': "store", 'symbol': symbol, 'limit': limit, 'lengths': lengths, 'passed': lengths == [limit, limit]}
+        if not report['passed']:
+            self.logger.error(f"Cold load from a stale store returned {lengths[-1]} of {limit} {symbol} candles")
+        else:
+            self.logger.info(f"Load test store: {report}")
+        return report
+
+    # Run a workload and collect its report
+    def _measure(self, name, workload, strategies):
+        random.seed(self.seed)
+        self.client.latencies.clear()
+        client_before = self.scheduler.get_stats()
+        server_before = self.stand_in.get_stats()
+
+        started = time.perf_counter()
+        try:
+            errors = workload()
+        finally:
+            elapsed = time.perf_counter() - started
+            self._close(strategies)
+
+        client = self.scheduler.get_stats()
+        server = self.stand_in.get_stats()
+        latencies = np.array(self.client.latencies) * 1000
+        fetches = len(latencies)
+
+        report = {
+            'workload': name,
+            'strategies': len(strategies),
+            'seconds': round(elapsed, 3),
+            'fetches': fetches,
+            'fetches_per_second': round(fetches / elapsed, 2) if elapsed else 0,
+            'strategies_per_second': round(len(strategies) / elapsed, 2) if elapsed else 0,
+            'p50_ms': round(float(np.percentile(latencies, 50)), 2) if fetches else None,
+            'p99_ms': round(float(np.percentile(latencies, 99)), 2) if fetches else None,
+            'failed_series': sorted(f"{symbol} {interval}" for symbol, interval in errors),
+            'client': {key: client[key] - client_before.get(key, 0) for key in ('requests', 'retried', 'rate_limited', 'failed', 'expired')},
+            'server': {key: server[key] - server_before[key] for key in server}
+        }
+        self.logger.info(f"Load test {name}: {report}")
+        return report
+
+# Load coins.json
+def load_coins(path="./coins.json"):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scan and backtests against a local Kraken stand-in")
+    parser.add_argument("--strategy", default="RSI", help="Strategy class from strategies/, e.g. RSI, MACD_DOUBLE")
+    parser.add_argument("--interval", default="4h")
+    parser.add_argument("--parent-interval", default="1d")
+    parser.add_argument("--backtest-coins", type=int, default=10)
+    parser.add_argument("--duration", type=int, default=500)
+    parser.add_argument("--data-dir", default=None, help="Directory of recorded <pair>_<interval>.json candle files")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--server-rate-limit", type=float, default=None, help="Stand-in requests per second")
+    parser.add_argument("--client-rate", type=float, default=None, help="Client requests per second")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import importlib
+    import inspect
+    from modules.strategy import Strategy
+    strategy_class = None
+    for module in ("mfi", "rsi", "mfi_macd", "macd", "stoch_rsi", "stoch_rsi_double", "macd_double"):
+        candidate = getattr(importlib.import_module(f"strategies.{module}"), args.strategy, None)
+        if inspect.isclass(candidate) and issubclass(candidate, Strategy):
+            strategy_class = candidate
+    if strategy_class is None:
+        raise ValueError(f"Invalid strategy: {args.strategy}")
+
+    with KrakenStandIn(data_dir=args.data_dir, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       rate_limit=args.server_rate_limit, seed=args.seed) as stand_in:
+        harness = LoadHarness(strategy_class, stand_in, load_coins(), interval=args.interval, parent_interval=args.parent_interval,
+                              rate=args.client_rate, max_workers=args.workers, seed=args.seed)
+        for report in (harness.run_store_check(), harness.run_scan(), harness.run_backtests(coins=args.backtest_coins, duration=args.duration)):
+            print(json.dumps(report, indent=2))
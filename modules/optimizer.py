@@ -0,0 +1,363 @@
+import itertools
+import logging
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from modules.data import DataManager
+from modules.kraken import PRIORITY_BACKFILL
+from modules.logger import logger
+from modules.strategy import BACKTEST_OFFSET
+
+# Result columns that can rank a sweep and whether the lowest value ranks first
+RANKINGS = {
+    'profit_factor': False,
+    'total_profit_loss': False,
+    'total_profit_loss_percentage': False,
+    'max_drawdown_percentage': True
+}
+
+# Summary values kept per backtest
+METRICS = ('total_trades', 'win_trades', 'loss_trades', 'profit_factor', 'total_profit_loss',
+           'total_profit_loss_percentage', 'max_drawdown_percentage')
+
+class SharedFrame:
+    """
+    A candle frame published once into a shared memory block, so worker processes map it instead of
+    receiving a pickled copy with every task. Timestamps come first, then every column back to back.
+    Only the small spec is sent to the workers.
+    """
+    def __init__(self, frame):
+        columns = [(name, frame[name].dtype.str) for name in frame.columns]
+        rows = len(frame)
+        size = max(rows * 8 * (1 + len(columns)), 1)
+
+        self.block = shared_memory.SharedMemory(create=True, size=size)
+        self.spec = {
+            'name': self.block.name,
+            'rows': rows,
+            'columns': columns,
+            'tz': str(frame.index.tz) if frame.index.tz is not None else None,
+            'attrs': dict(frame.attrs)
+        }
+
+        # Columns are 8 byte aligned, narrower dtypes leave padding
+        for name, values in self._views(self.block, self.spec).items():
+            values[:] = frame.index.asi8 if name is None else frame[name].to_numpy()
+
+    # Free the block
+    def close(self):
+        self.block.close()
+        self.block.unlink()
+
+    # Map a published frame
+    @classmethod
+    def attach(cls, spec):
+        """
+        :return: The shared memory block, keep it open while the frame is used, and a read-only frame over it
+        """
+        block = shared_memory.SharedMemory(name=spec['name'])
+        views = cls._views(block, spec)
+        for values in views.values():
+            values.flags.writeable = False
+
+        index = pd.DatetimeIndex(views.pop(None).view('datetime64[ns]'))
+        if spec['tz'] is not None:
+            index = index.tz_localize('UTC').tz_convert(spec['tz'])
+        frame = pd.DataFrame({name: views[name] for name, _ in spec['columns']}, index=index, copy=False)
+        frame.attrs.update(spec['attrs'])
+        return block, frame
+
+    # Arrays of the timestamps and columns in a block
+    @staticmethod
+    def _views(block, spec):
+        rows = spec['rows']
+        views = {None: np.ndarray((rows,), dtype=np.int64, buffer=block.buf)}
+        for position, (name, dtype) in enumerate(spec['columns'], start=1):
+            views[name] = np.ndarray((rows,), dtype=np.dtype(dtype), buffer=block.buf, offset=position * rows * 8)
+        return views
+
+# Candle frames a worker process mapped, by (symbol, interval, parent_interval)
+_markets = {}
+
+# Set up a worker process
+def _init_worker(specs, level):
+    logger.setLevel(level)
+    for key, (spec, parent_spec) in specs.items():
+        block, data = SharedFrame.attach(spec)
+        parent_block, data_parent = SharedFrame.attach(parent_spec) if parent_spec is not None else (None, None)
+        _markets[key] = (data, data_parent, block, parent_block)
+
+# Load a strategy on mapped candles in a worker process
+def load_strategy(strategy_class, parameters, market, rows, options):
+    """
+    :param market: Symbol, interval and parent interval the candles were published under
+    :param rows: Most recent bars to load
+    :param options: Further strategy arguments, e.g. balance
+    """
+    symbol, interval, parent_interval = market
+    data, data_parent = _markets[market][:2]
+
+    # A private data manager, mapped candles are copied into its buffer and indicators computed for this run only
+    data_manager = DataManager(symbol, interval, parent_interval, store=None, hub=None, registry=None)
+    data_manager.load_data(data.iloc[max(len(data) - rows, 0):], data_parent)
+    return strategy_class(symbol, interval, parent_interval, parameters=parameters, data_manager=data_manager, **options)
+
+# Backtest one parameter set in a worker process
+def _run_backtest(task):
+    strategy_class, parameters, market, duration, options = task
+    symbol, interval, parent_interval = market
+
+    result = {'symbol': symbol, 'interval': interval, 'parent_interval': parent_interval, **parameters}
+    try:
+        # The last duration bars are traded, the bars before them warm up the indicators
+        strategy = load_strategy(strategy_class, parameters, market, duration + BACKTEST_OFFSET, options)
+        summary = strategy.backtest(duration, update=False, graph=False) or {}
+        result.update({metric: summary.get(metric, np.nan) for metric in METRICS})
+        result['error'] = None
+    except Exception as e:
+        logger.error(f"Error backtesting {symbol} {interval} with {parameters}: {str(e)}")
+        result.update({metric: np.nan for metric in METRICS})
+        result['error'] = str(e)
+    return result
+
+# Run a chunk of tasks in a worker process
+def _run_chunk(function, tasks):
+    return [function(task) for task in tasks]
+
+class Optimizer:
+    """
+    Sweep a strategy's parameters over symbols and intervals with backtests on a process pool.
+    Candles of every symbol and interval are fetched once and published into shared memory,
+    each task only carries its parameters and the key of the candles to map.
+    Either every parameter set runs over the full duration, or successive halving spends
+    most backtests on the promising ones.
+    """
+    def __init__(self, strategy_class, grid, symbols, intervals=("4h",), parent_interval="1d",
+                 duration=500, balance=1000, risk_percentage=100, max_workers=None, chunksize=None):
+        """
+        :param strategy_class: Strategy subclass declaring its tunable parameters
+        :param grid: Dict of parameter name to the values to try
+        :param symbols: Symbols, e.g. XBTUSD
+        :param intervals: Interval names or (interval, parent_interval) pairs
+        :param parent_interval: Parent interval of intervals given by name
+        :param duration: Bars every backtest trades over
+        :param max_workers: Worker processes, the CPU count if None
+        :param chunksize: Tasks sent to a worker at once, derived from the task count if None
+        """
+        unknown = sorted(set(grid) - set(strategy_class.parameters))
+        if unknown:
+            logger.error(f"Unknown parameters for {strategy_class.__name__}: {unknown}")
+            raise ValueError(f"Unknown parameters for {strategy_class.__name__}: {unknown}")
+
+        self.strategy_class = strategy_class
+        self.grid = grid
+        self.symbols = symbols
+        self.markets = [
+            (symbol, *(interval if isinstance(interval, tuple) else (interval, parent_interval)))
+            for symbol in symbols for interval in intervals
+        ]
+        self.duration = duration
+        self.options = {'balance': balance, 'risk_percentage': risk_percentage}
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunksize = chunksize
+        self.logger = logger
+
+    # Expand a grid into parameter sets
+    @staticmethod
+    def expand_grid(grid):
+        names = list(grid)
+        return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+    # Run the sweep
+    def run(self, rank_by="profit_factor"):
+        """
+        :param rank_by: Result column to rank by, one of RANKINGS
+        :return: DataFrame with a row per symbol, interval and parameter set, best first
+        """
+        self._check_ranking(rank_by)
+        parameter_sets = self.expand_grid(self.grid)
+
+        with self._open_pool() as (executor, markets):
+            self.logger.info(f"Sweeping {len(parameter_sets)} parameter sets over {len(markets)} markets with {self.max_workers} workers")
+            results = self._map(executor, _run_backtest, [(parameters, market, self.duration) for market in markets for parameters in parameter_sets])
+
+        return self.rank(pd.DataFrame(results), rank_by)
+
+    # Run successive halving
+    def run_halving(self, rank_by="profit_factor", min_duration=100, reduction=3, samples=None, seed=0, budget=None, min_trades=5):
+        """
+        Evaluate every candidate on the most recent min_duration bars, keep the best 1/reduction of them
+        per market and evaluate those again on reduction times as many bars, until the survivors ran over
+        the full duration. Most backtests are short ones that rule out bad candidates cheaply.
+
+        :param rank_by: Result column to rank by, one of RANKINGS
+        :param min_duration: Bars of the first round
+        :param reduction: Factor the candidates shrink and the bars grow by each round
+        :param samples: Candidates drawn from the grid, all of the grid if None
+        :param seed: Seed of the drawn candidates, the same seed draws the same ones
+        :param budget: Seconds to stay within, a round expected to overrun it is skipped and the backtests
+                       not started once it is spent are cancelled, also in the first round
+        :param min_trades: Candidates with fewer trades rank below the others, e.g. a single winning trade
+                           in a short round has an infinite profit factor
+        :return: DataFrame with the latest result of every candidate and the round and bars it got to,
+                 furthest and best first, so the first row per symbol and interval is its pick.
+                 Candidates cancelled in the first round are left out
+        """
+        self._check_ranking(rank_by)
+        if reduction < 2:
+            self.logger.error(f"Invalid reduction: {reduction}")
+            raise ValueError(f"Invalid reduction: {reduction}")
+
+        candidates = self.expand_grid(self.grid)
+        if samples is not None and samples < len(candidates):
+            candidates = random.Random(seed).sample(candidates, samples)
+
+        # Bars per round, the last round always runs the full duration
+        durations = []
+        duration = min(min_duration, self.duration)
+        while duration < self.duration:
+            durations.append(duration)
+            duration *= reduction
+        durations.append(self.duration)
+
+        started = time.perf_counter()
+        latest = {}
+        with self._open_pool() as (executor, markets):
+            survivors = {market: list(range(len(candidates))) for market in markets}
+            self.logger.info(f"Halving {len(candidates)} parameter sets over {len(markets)} markets in {len(durations)} rounds of {durations} bars")
+
+            deadline = started + budget if budget is not None else None
+            cost = None
+            for round_, duration in enumerate(durations):
+                # Markets take turns, so a round cut short by the budget still covers every market best first
+                keys = [
+                    key for turn in itertools.zip_longest(*([(market, candidate) for candidate in survivors[market]] for market in markets))
+                    for key in turn if key is not None
+                ]
+                tasks = [(candidates[candidate], market, duration) for market, candidate in keys]
+
+                # Backtests cost about the same per bar, estimate the round from the previous one
+                elapsed = time.perf_counter() - started
+                if budget is not None and cost is not None and elapsed + cost * len(tasks) * duration > budget:
+                    self.logger.warning(f"Stopping before round {round_ + 1} of {len(durations)} to stay within the {budget}s budget")
+                    break
+
+                round_started = time.perf_counter()
+                results = self._map(executor, _run_backtest, tasks, deadline=deadline)
+                finished = [(key, result) for key, result in zip(keys, results) if result is not None]
+                cost = (time.perf_counter() - round_started) / (max(len(finished), 1) * duration)
+
+                for key, result in finished:
+                    latest[key] = {**result, 'round': round_ + 1, 'duration': duration}
+
+                if len(finished) < len(tasks):
+                    self.logger.warning(f"Budget of {budget}s spent in round {round_ + 1} of {len(durations)}, {len(tasks) - len(finished)} backtests cancelled")
+                    break
+
+                # Keep the best of every market for the next round
+                for market in markets:
+                    ranked = self.rank(pd.DataFrame([latest[(market, candidate)] for candidate in survivors[market]]).assign(candidate=survivors[market]), rank_by, min_trades)
+                    survivors[market] = ranked['candidate'].tolist()[:max(1, math.ceil(len(ranked) / reduction))]
+
+        if not latest:
+            return pd.DataFrame()
+
+        results = pd.DataFrame(list(latest.values()))
+        results = self.rank(results, rank_by, min_trades)
+        return results.sort_values('round', ascending=False, kind='stable').reset_index(drop=True)
+
+    # Rank sweep results
+    @staticmethod
+    def rank(results, rank_by="profit_factor", min_trades=0):
+        """
+        :param min_trades: Results with fewer trades rank after the others
+        """
+        if results.empty:
+            return results
+        results = results.sort_values(rank_by, ascending=RANKINGS[rank_by], na_position='last', kind='stable')
+        if min_trades:
+            results = results.iloc[np.argsort(results['total_trades'].fillna(0).to_numpy() < min_trades, kind='stable')]
+        return results.reset_index(drop=True)
+
+    # Check a ranking column
+    def _check_ranking(self, rank_by):
+        if rank_by not in RANKINGS:
+            self.logger.error(f"Invalid ranking: {rank_by}")
+            raise ValueError(f"Invalid ranking: {rank_by}")
+
+    # Publish the markets and start the worker pool
+    @contextmanager
+    def _open_pool(self):
+        """
+        :return: The executor and the markets that could be published
+        """
+        frames = self._publish_markets()
+        try:
+            specs = {market: tuple(frame.spec if frame is not None else None for frame in shared) for market, shared in frames.items()}
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker, initargs=(specs, logging.WARNING)) as executor:
+                yield executor, list(frames)
+        finally:
+            for shared in frames.values():
+                for frame in shared:
+                    if frame is not None:
+                        frame.close()
+
+    # Run tasks on the pool
+    def _map(self, executor, function, tasks, deadline=None):
+        """
+        :param function: Worker function taking the strategy class, the task's values and the strategy options
+        :param tasks: List of value tuples, e.g. parameters, market and duration
+        :param deadline: time.perf_counter() value after which chunks not started yet are cancelled
+        :return: Result per task in order, None for the tasks of unfinished chunks
+        """
+        if not tasks:
+            return []
+
+        started = time.perf_counter()
+        # With a deadline single tasks are sent, so only a few backtests still run once it passes
+        chunksize = self.chunksize or (1 if deadline is not None else max(1, len(tasks) // (self.max_workers * 4)))
+        tasks = [(self.strategy_class, *task, self.options) for task in tasks]
+        chunks = [tasks[start:start + chunksize] for start in range(0, len(tasks), chunksize)]
+        futures = [executor.submit(_run_chunk, function, chunk) for chunk in chunks]
+
+        if deadline is not None:
+            wait(futures, timeout=max(deadline - time.perf_counter(), 0))
+            for future in futures:
+                future.cancel()
+
+        results = []
+        for future, chunk in zip(futures, chunks):
+            if future.cancelled() or (deadline is not None and not future.done()):
+                results.extend([None] * len(chunk))
+            else:
+                results.extend(future.result())
+        self.logger.info(f"Ran {sum(result is not None for result in results)} of {len(tasks)} tasks in {time.perf_counter() - started:.1f}s")
+        return results
+
+    # Fetch every market once and publish it into shared memory
+    def _publish_markets(self):
+        frames = {}
+        for market in self.markets:
+            symbol, interval, parent_interval = market
+            data_manager = DataManager(symbol, interval, parent_interval)
+            try:
+                data_manager.update_data(limit=self.duration + BACKTEST_OFFSET, priority=PRIORITY_BACKFILL)
+            except Exception as e:
+                self.logger.error(f"Error fetching {symbol} {interval}, skipping it: {str(e)}")
+                continue
+            finally:
+                data_manager.close()
+
+            if data_manager.data.empty:
+                self.logger.error(f"No candles for {symbol} {interval}, skipping it")
+                continue
+
+            data_parent = data_manager.data_parent
+            frames[market] = (SharedFrame(data_manager.data), SharedFrame(data_parent) if data_parent is not None and not data_parent.empty else None)
+        return frames
@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+from modules.backtest import summarize_trades
+from modules.fetcher import BatchFetcher
+from modules.logger import logger
+from modules.strategy import BACKTEST_OFFSET
+
+class PortfolioBacktest:
+    """
+    Backtest strategies on several symbols against one balance.
+    The signal arrays of every symbol are merged onto one timestamp clock. At each timestamp positions
+    are closed first, then new ones opened while the position and exposure limits allow, in strategy order.
+    Only timestamps carrying a signal are visited, the equity curve is built with NumPy afterwards.
+    """
+    def __init__(self, strategies, balance=1000, max_positions=5, max_exposure_percentage=100, position_percentage=None, max_workers=8):
+        """
+        :param strategies: Strategies providing signal arrays, one per symbol
+        :param balance: Starting balance shared by all positions
+        :param max_positions: Positions open at once
+        :param max_exposure_percentage: Open position value allowed, as a percentage of the balance
+        :param position_percentage: Value of a new position as a percentage of the balance,
+                                    max_exposure_percentage split over max_positions if None
+        :param max_workers: Strategies fetching their data at once
+        """
+        self.strategies = strategies
+        self.balance = balance
+        self.max_positions = max_positions
+        self.max_exposure_percentage = max_exposure_percentage
+        self.position_percentage = position_percentage if position_percentage is not None else max_exposure_percentage / max_positions
+        self.max_workers = max_workers
+        self.logger = logger
+
+    # Run the backtest
+    def run(self, duration, update=True):
+        """
+        :param duration: Number of bars every symbol trades over
+        :param update: Fetch the data first, False to backtest the already loaded data
+        :return: Dict of summary, the combined results, equity, the balance marked to market on the clock,
+                 positions, the number of open positions on the clock, trades, a DataFrame of every position,
+                 and symbols, a DataFrame of results per symbol
+        """
+        if update:
+            self._load(duration)
+
+        strategies, signals = [], []
+        for strategy in self.strategies:
+            if strategy.data_manager.data.empty:
+                self.logger.warning(f"No data for {strategy.symbol}, leaving it out of the portfolio")
+                continue
+            strategy_signals = strategy.get_signals()
+            if strategy_signals is None:
+                self.logger.error(f"{strategy.name} has no signal arrays to backtest a portfolio with")
+                raise ValueError(f"{strategy.name} has no signal arrays to backtest a portfolio with")
+            strategies.append(strategy)
+            signals.append((np.asarray(strategy_signals[0]), np.asarray(strategy_signals[1], dtype=bool)))
+
+        if not strategies:
+            self.logger.error("Not enough data to perform portfolio backtest")
+            return None
+
+        indexes = [strategy.data_manager.data.index for strategy in strategies]
+        closes = [strategy.data_manager.data['close'].to_numpy(dtype=float) for strategy in strategies]
+        starts = [max(BACKTEST_OFFSET, len(index) - duration) for index in indexes]
+        clock = np.unique(np.concatenate([index.asi8 for index in indexes]))
+
+        events = self._merge_events(indexes, signals, starts, clock)
+        trades, skipped = self._simulate(strategies, signals, closes, events)
+        equity, positions = self._mark_to_market(indexes, closes, trades, clock)
+
+        # The curve starts when the first symbol may trade
+        first = np.searchsorted(clock, min(index.asi8[start] for index, start in zip(indexes, starts)))
+        tz = indexes[0].tz
+        timeline = pd.DatetimeIndex(clock[first:], tz='UTC').tz_convert(tz) if tz is not None else pd.DatetimeIndex(clock[first:])
+        equity = pd.Series(equity[first:], index=timeline, name='equity')
+        positions = pd.Series(positions[first:], index=timeline, name='positions')
+
+        return self._report(strategies, trades, skipped, equity, positions, clock)
+
+    # Fetch every strategy's data concurrently
+    def _load(self, duration):
+        BatchFetcher(max_workers=self.max_workers).update([strategy.data_manager for strategy in self.strategies], limit=duration + BACKTEST_OFFSET)
+
+    # Merge the signal bars of every symbol onto the clock
+    @staticmethod
+    def _merge_events(indexes, signals, starts, clock):
+        """
+        :return: Clock position, strategy and bar position of every bar carrying a signal,
+                 sorted by time and then by strategy
+        """
+        times, owners, bars = [], [], []
+        for owner, (index, (entry_signals, exit_signals), start) in enumerate(zip(indexes, signals, starts)):
+            candidates = np.flatnonzero((entry_signals != 0) | exit_signals)
+            candidates = candidates[candidates >= start]
+            times.append(np.searchsorted(clock, index.asi8[candidates]))
+            owners.append(np.full(len(candidates), owner))
+            bars.append(candidates)
+
+        times, owners, bars = np.concatenate(times), np.concatenate(owners), np.concatenate(bars)
+        order = np.lexsort((owners, times))
+        return times[order], owners[order], bars[order]
+
+    # Walk the merged signals with one balance
+    def _simulate(self, strategies, signals, closes, events):
+        times, owners, bars = events
+        balance = self.balance
+        exposure = 0.0
+        open_positions = {}
+        trades = []
+        skipped = {'max_positions': 0, 'max_exposure': 0}
+
+        # Events of one timestamp are handled together
+        bounds = np.flatnonzero(np.diff(times)) + 1
+        for group in np.split(np.arange(len(times)), bounds):
+            closed = set()
+
+            # Closes first, so the capital they free is available to entries at the same time
+            for event in group:
+                owner, bar = owners[event], bars[event]
+                trade = open_positions.get(owner)
+                if trade is None or not signals[owner][1][bar]:
+                    continue
+
+                slippage = strategies[owner].slippage_percentage / 100
+                if trade['side'] == "long":
+                    price = closes[owner][bar] * (1 - slippage)
+                    profit_loss = (price - trade['entry_price']) * trade['size']
+                else:
+                    price = closes[owner][bar] * (1 + slippage)
+                    profit_loss = (trade['entry_price'] - price) * trade['size']
+
+                balance += profit_loss
+                exposure -= trade['amount']
+                trade.update({'exit_time': times[event], 'exit_bar': int(bar), 'exit_price': price, 'profit_loss': profit_loss})
+                del open_positions[owner]
+                closed.add(owner)
+
+            for event in group:
+                owner, bar = owners[event], bars[event]
+                entry = signals[owner][0][bar]
+                if entry == 0 or owner in open_positions or owner in closed:
+                    continue
+                if len(open_positions) >= self.max_positions:
+                    skipped['max_positions'] += 1
+                    continue
+
+                amount = min(balance * self.position_percentage / 100, balance * self.max_exposure_percentage / 100 - exposure)
+                if amount <= 0:
+                    skipped['max_exposure'] += 1
+                    continue
+
+                slippage = strategies[owner].slippage_percentage / 100
+                side = "long" if entry > 0 else "short"
+                current_price = closes[owner][bar]
+                trade = {
+                    'owner': owner,
+                    'side': side,
+                    'entry_time': times[event],
+                    'entry_bar': int(bar),
+                    'entry_price': current_price * (1 + slippage) if side == "long" else current_price * (1 - slippage),
+                    'size': amount / current_price,
+                    'amount': amount,
+                    'exit_time': None,
+                    'exit_bar': None,
+                    'exit_price': None,
+                    'profit_loss': None
+                }
+                exposure += amount
+                open_positions[owner] = trade
+                trades.append(trade)
+
+        return trades, skipped
+
+    # Balance marked to market and open positions on every timestamp of the clock
+    def _mark_to_market(self, indexes, closes, trades, clock):
+        realized = np.zeros(len(clock))
+        unrealized = np.zeros(len(clock))
+        positions = np.zeros(len(clock), dtype=np.int64)
+
+        # Last close of every symbol at every timestamp
+        prices = [close[np.maximum(np.searchsorted(index.asi8, clock, side='right') - 1, 0)] for index, close in zip(indexes, closes)]
+
+        for trade in trades:
+            end = trade['exit_time'] if trade['exit_time'] is not None else len(clock)
+            direction = 1 if trade['side'] == "long" else -1
+            unrealized[trade['entry_time']:end] += direction * (prices[trade['owner']][trade['entry_time']:end] - trade['entry_price']) * trade['size']
+            positions[trade['entry_time']:end] += 1
+            if trade['exit_time'] is not None:
+                realized[trade['exit_time']] += trade['profit_loss']
+
+        return self.balance + np.cumsum(realized) + unrealized, positions
+
+    # Collect the results
+    def _report(self, strategies, trades, skipped, equity, positions, clock):
+        def to_time(position):
+            return pd.Timestamp(clock[position], tz='UTC').tz_convert(equity.index.tz)
+
+        closed = [trade for trade in trades if trade['exit_time'] is not None]
+        balance = self.balance + sum(trade['profit_loss'] for trade in closed)
+
+        # summarize_trades reads the layout simulate_signals returns
+        summary = summarize_trades([{'action': "close", 'profit_loss': trade['profit_loss']} for trade in closed], balance)
+        peaks = np.maximum.accumulate(equity.to_numpy())
+        summary.update({
+            'symbols': len(strategies),
+            'final_balance': balance,
+            'final_equity': float(equity.iloc[-1]),
+            'total_profit_loss_percentage': (balance / self.balance - 1) * 100,
+            'max_drawdown_percentage': float(((peaks - equity.to_numpy()) / peaks).max() * 100),
+            'open_positions': len(trades) - len(closed),
+            'skipped_max_positions': skipped['max_positions'],
+            'skipped_max_exposure': skipped['max_exposure']
+        })
+
+        trades = pd.DataFrame([{
+            'symbol': strategies[trade['owner']].symbol,
+            'side': trade['side'],
+            'entry_time': to_time(trade['entry_time']),
+            'exit_time': to_time(trade['exit_time']) if trade['exit_time'] is not None else pd.NaT,
+            'entry_price': trade['entry_price'],
+            'exit_price': trade['exit_price'],
+            'size': trade['size'],
+            'amount': trade['amount'],
+            'profit_loss': trade['profit_loss']
+        } for trade in trades], columns=['symbol', 'side', 'entry_time', 'exit_time', 'entry_price', 'exit_price', 'size', 'amount', 'profit_loss'])
+
+        symbols = trades.groupby('symbol').agg(
+            trades=('side', 'size'),
+            win_trades=('profit_loss', lambda values: int((values > 0).sum())),
+            total_profit_loss=('profit_loss', 'sum')
+        ).sort_values('total_profit_loss', ascending=False)
+
+        self.logger.info(f"Portfolio backtest of {len(strategies)} symbols: {summary}")
+        return {'summary': summary, 'equity': equity, 'positions': positions, 'trades': trades, 'symbols': symbols}
@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from modules.kraken import PRIORITY_LIVE
+from modules.logger import logger
+
+class LiveScheduler:
+    """
+    Runs many live strategies from one asyncio loop instead of a sleeping thread each.
+    The loop wakes at every candle close boundary, aligned to the epoch like Kraken's candles, plus a grace delay
+    for the exchange to publish the closed candle. The strategies due at a boundary refresh their data and are
+    evaluated concurrently on a bounded pool of worker threads, only busy while a strategy runs.
+    Strategies sharing a symbol and interval share one fetch through the market data hub.
+    """
+    def __init__(self, grace=2.0, max_workers=16, max_errors=3):
+        """
+        :param grace: Seconds to wait after a boundary before refreshing
+        :param max_workers: Strategies refreshed and evaluated at once
+        :param max_errors: Consecutive errors after which a strategy is deactivated
+        """
+        self.grace = grace
+        self.max_workers = max_workers
+        self.max_errors = max_errors
+        self.logger = logger
+        self.strategies = []
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.executor = None
+        self._loop = None
+        self._stop = None
+        self._wakeup = None
+        self._started = threading.Event()
+        self._thread = None
+
+    # Add a strategy
+    def add(self, strategy):
+        with self.lock:
+            if strategy not in self.strategies:
+                self.strategies.append(strategy)
+                self.metrics[id(strategy)] = {
+                    'name': strategy.name,
+                    'symbol': strategy.symbol,
+                    'interval': strategy.interval,
+                    'runs': 0,
+                    'errors': 0,
+                    'consecutive_errors': 0,
+                    'last_error': None,
+                    'last_boundary': None,
+                    'wake_lag': None,
+                    'lag': None,
+                    'max_lag': 0.0,
+                    'total_lag': 0.0,
+                    'duration': None
+                }
+        self._wake()
+
+    # Remove a strategy
+    def remove(self, strategy):
+        with self.lock:
+            if strategy in self.strategies:
+                self.strategies.remove(strategy)
+                del self.metrics[id(strategy)]
+
+    # Get per-strategy metrics
+    def get_metrics(self):
+        """
+        :return: List of dicts per strategy, lags are seconds from candle close:
+                 wake_lag until its refresh started, lag until its evaluation finished
+        """
+        with self.lock:
+            metrics = []
+            for values in self.metrics.values():
+                values = dict(values)
+                values['mean_lag'] = values.pop('total_lag') / values['runs'] if values['runs'] else None
+                metrics.append(values)
+            return metrics
+
+    # Next candle close boundary of an interval
+    @staticmethod
+    def next_boundary(interval_seconds, now):
+        return (int(now) // interval_seconds + 1) * interval_seconds
+
+    # Run until stopped
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="live")
+        self._started.set()
+
+        try:
+            while not self._stop.is_set():
+                with self.lock:
+                    intervals = {strategy.data_manager.get_sleep_duration() for strategy in self.strategies}
+
+                if not intervals:
+                    await self._sleep(None)
+                    continue
+
+                now = time.time()
+                boundary = min(self.next_boundary(interval, now) for interval in intervals)
+
+                # Strategies added meanwhile may have an earlier boundary, recompute when woken
+                if not await self._sleep(boundary + self.grace - time.time()):
+                    continue
+
+                await self._run_boundary(boundary)
+        finally:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+            self._started.clear()
+
+    # Sleep until timeout, False if woken or stopped before
+    async def _sleep(self, timeout):
+        if timeout is not None and timeout <= 0:
+            return True
+
+        waiters = [asyncio.ensure_future(self._stop.wait()), asyncio.ensure_future(self._wakeup.wait())]
+        done, pending = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in pending:
+            waiter.cancel()
+        self._wakeup.clear()
+        return not done
+
+    # Run the strategies due at a boundary
+    async def _run_boundary(self, boundary):
+        with self.lock:
+            due = [
+                strategy for strategy in self.strategies
+                if strategy.active and boundary % strategy.data_manager.get_sleep_duration() == 0
+            ]
+
+        if due:
+            self.logger.debug(f"Running {len(due)} strategies at {boundary}")
+            await asyncio.gather(*(self._run_strategy(strategy, boundary) for strategy in due))
+
+    # Refresh and evaluate a strategy
+    async def _run_strategy(self, strategy, boundary):
+        started = time.time()
+        error = None
+        try:
+            await self._loop.run_in_executor(self.executor, self._step, strategy)
+        except Exception as e:
+            error = e
+            self.logger.error(f"Error running {strategy.name} {strategy.symbol} {strategy.interval}: {str(e)}")
+        finished = time.time()
+
+        with self.lock:
+            metrics = self.metrics.get(id(strategy))
+            if metrics is None:
+                return
+
+            metrics['runs'] += 1
+            metrics['last_boundary'] = boundary
+            metrics['wake_lag'] = started - boundary
+            metrics['lag'] = finished - boundary
+            metrics['max_lag'] = max(metrics['max_lag'], metrics['lag'])
+            metrics['total_lag'] += metrics['lag']
+            metrics['duration'] = finished - started
+
+            if error is None:
+                metrics['consecutive_errors'] = 0
+                return
+
+            metrics['errors'] += 1
+            metrics['consecutive_errors'] += 1
+            metrics['last_error'] = str(error)
+            if metrics['consecutive_errors'] >= self.max_errors:
+                self.logger.error(f"Deactivating {strategy.name} {strategy.symbol} {strategy.interval} after {self.max_errors} consecutive errors")
+                strategy.active = False
+
+    # Refresh data and evaluate, runs on a worker thread
+    @staticmethod
+    def _step(strategy):
+        strategy.data_manager.update_data(priority=PRIORITY_LIVE)
+        strategy.evaluate()
+
+    # Wake the loop to reconsider boundaries
+    def _wake(self):
+        if self._started.is_set():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # Run in a background thread
+    def start(self):
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+        self._thread.start()
+        return self
+
+    # Stop running
+    def stop(self):
+        if self._thread is not None:
+            self._started.wait()
+        if self._started.is_set():
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
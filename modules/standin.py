@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+from modules.logger import logger
+
+# Kraken returns at most this many candles per OHLC request
+OHLC_LIMIT = 720
+
+# Kraken returns at most this many trades per Trades request
+TRADES_LIMIT = 1000
+
+class KrakenStandIn:
+    """
+    Local stand-in for the Kraken public OHLC and Trades endpoints, to benchmark and reproduce failures offline.
+    Candles come from recorded files, <pair>_<interval>.json holding Kraken OHLC rows, or are generated
+    from a random walk seeded by the pair and interval, so every run serves the same prices.
+    Trades are four per candle of trade_interval, at its open, high, low and close, so candles rebuilt
+    from them match the served ones.
+    Latency, injected errors and rate limit responses are configurable, errors are drawn from a seeded generator.
+    """
+    def __init__(self, host="127.0.0.1", port=0, data_dir=None, history=2000, latency=0.0, jitter=0.0,
+                 error_rate=0.0, rate_limit=None, burst=15, seed=0, trade_interval=60):
+        """
+        :param port: Port to listen on, a free one if 0
+        :param data_dir: Directory of recorded candle files, None to only serve synthetic candles
+        :param history: Number of synthetic candles per pair and interval
+        :param latency: Seconds added to every response
+        :param jitter: Random seconds added on top of latency
+        :param error_rate: Share of requests answered with an HTTP 5xx or an EService error
+        :param rate_limit: Requests per second before answering with a rate limit error, None for no limit
+        :param burst: Requests allowed at once before rate_limit applies
+        :param seed: Seed of synthetic candles and injected errors
+        :param trade_interval: Minutes of the candles trades are derived from
+        """
+        self.host = host
+        self.port = port
+        self.data_dir = data_dir
+        self.history = history
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.seed = seed
+        self.trade_interval = trade_interval
+        self.logger = logger
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.candles = {}
+        self.trades = {}
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'rate_limited': 0,
+            'not_found': 0
+        }
+        self.server = None
+        self.thread = None
+
+    # Base URL to point KrakenClient at
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.server.server_address[1]}"
+
+    # Start serving in a background thread
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.logger.info(f"Kraken stand-in listening on {self.url}")
+        return self
+
+    # Stop serving
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # Get stand-in stats
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
+
+    # Handle a request
+    def _handle(self, handler):
+        url = urlparse(handler.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        with self.lock:
+            self.stats['requests'] += 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            limited = self._is_rate_limited()
+            failure = self.random.choice((500, 502, 503, "EService:Unavailable")) if self.random.random() < self.error_rate else None
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if url.path not in ("/0/public/OHLC", "/0/public/Trades"):
+            self._count('not_found')
+            return self._respond(handler, 404, {"error": ["EGeneral:Unknown method"]})
+        if limited:
+            self._count('rate_limited')
+            return self._respond(handler, 200, {"error": ["EAPI:Rate limit exceeded"]})
+        if failure is not None:
+            self._count('errors')
+            if isinstance(failure, int):
+                return self._respond(handler, failure, {"error": [f"HTTP {failure}"]})
+            return self._respond(handler, 200, {"error": [failure]})
+
+        try:
+            if url.path == "/0/public/Trades":
+                result = self._get_trades_page(params["pair"], int(params.get("since", 0)))
+            else:
+                result = self._get_ohlc_page(params["pair"], int(params.get("interval", 1)), int(params["since"]) if "since" in params else None)
+        except (KeyError, ValueError):
+            return self._respond(handler, 200, {"error": ["EGeneral:Invalid arguments"]})
+        return self._respond(handler, 200, {"error": [], "result": result})
+
+    # Get OHLC rows after since
+    def _get_ohlc_page(self, pair, interval, since):
+        rows = self._get_rows(pair, interval)
+        if since is not None:
+            rows = [row for row in rows if row[0] > since]
+        rows = rows[-OHLC_LIMIT:]
+        last = rows[-1][0] if rows else since or 0
+        return {pair: rows, "last": last}
+
+    # Get trades after since, in seconds or nanoseconds like Kraken accepts
+    def _get_trades_page(self, pair, since):
+        times, prices, volumes = self._get_trades(pair)
+        since_ns = since if since >= 10**12 else since * 10**9
+        start = int(np.searchsorted(times, since_ns, side='right'))
+        stop = min(start + TRADES_LIMIT, len(times))
+
+        trades = [
+            [f"{prices[i]:.6f}", f"{volumes[i]:.8f}", times[i] / 1e9, "b" if i % 2 else "s", "l", "", i + 1]
+            for i in range(start, stop)
+        ]
+        last = int(times[stop - 1]) if stop > start else since_ns
+        return {pair: trades, "last": str(last)}
+
+    # Get trades of a pair as nanosecond times, prices and volumes
+    def _get_trades(self, pair):
+        rows = self._get_rows(pair, self.trade_interval)
+        with self.lock:
+            if pair not in self.trades:
+                length = self.trade_interval * 60
+                timestamps = np.array([row[0] for row in rows], dtype=np.int64)
+                candles = np.array([row[1:5] for row in rows], dtype=float)
+                volumes = np.array([row[6] for row in rows], dtype=float)
+
+                # Open, high, low and close, spread over the candle
+                offsets = np.array([0, length // 4, length // 2, 3 * length // 4], dtype=np.int64)
+                times = ((timestamps[:, None] + offsets) * 10**9).ravel()
+                self.trades[pair] = (times, candles.ravel(), np.repeat(volumes / 4, 4))
+            return self.trades[pair]
+
+    # Count an event
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    # Take a rate limit token, True if there was none
+    def _is_rate_limited(self):
+        if self.rate_limit is None:
+            return False
+
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate_limit)
+        self.updated = now
+        if self.tokens < 1:
+            return True
+        self.tokens -= 1
+        return False
+
+    # Write a JSON response
+    @staticmethod
+    def _respond(handler, status, body):
+        payload = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    # Get candles of a pair and interval
+    def _get_rows(self, pair, interval):
+        key = (pair, interval)
+        with self.lock:
+            if key not in self.candles:
+                self.candles[key] = self._load_rows(pair, interval) or self._generate_rows(pair, interval)
+            return self.candles[key]
+
+    # Load recorded candles
+    def _load_rows(self, pair, interval):
+        if self.data_dir is None:
+            return None
+
+        path = os.path.join(self.data_dir, f"{pair}_{interval}.json")
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'r') as f:
+            rows = json.load(f)
+        return [[int(row[0])] + [str(value) for value in row[1:7]] + [int(row[7])] for row in rows]
+
+    # Generate candles ending at the current, still forming, candle
+    def _generate_rows(self, pair, interval):
+        rng = np.random.default_rng([self.seed, zlib.crc32(f"{pair}:{interval}".encode())])
+        length = interval * 60
+        end = int(time.time()) // length * length
+        timestamps = end - length * np.arange(self.history - 1, -1, -1)
+
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, self.history)))
+        open_ = np.concatenate(([close[0]], close[:-1]))
+        spread = np.abs(rng.normal(0, 0.005, self.history)) * close
+        high = np.maximum(open_, close) + spread
+        low = np.minimum(open_, close) - spread
+        vwap = (high + low + close) / 3
+        volume = rng.gamma(2.0, 50.0, self.history)
+        count = rng.integers(10, 500, self.history)
+
+        return [
+            [int(timestamps[i]), f"{open_[i]:.6f}", f"{high[i]:.6f}", f"{low[i]:.6f}", f"{close[i]:.6f}",
+             f"{vwap[i]:.6f}", f"{volume[i]:.8f}", int(count[i])]
+            for i in range(self.history)
+        ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in of the Kraken OHLC endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data-dir", default=None, help="Directory of recorded <pair>_<interval>.json candle files")
+    parser.add_argument("--history", type=int, default=2000, help="Synthetic candles per pair and interval")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random seconds added on top of latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with an error")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests per second before rate limit errors")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stand_in = KrakenStandIn(host=args.host, port=args.port, data_dir=args.data_dir, history=args.history,
+                             latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             rate_limit=args.rate_limit, seed=args.seed)
+    stand_in.start()
+    print(f"Set KRAKEN_API_URL={stand_in.url} to use it, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stand_in.stop()
@@ -0,0 +1,142 @@
+import os
+import sqlite3
+import time
+from modules.logger import logger
+
+class CandleStore:
+    """
+    On-disk OHLC candle store keyed by symbol and interval, backed by SQLite.
+    Rows are kept in Kraken's OHLC layout: timestamp, open, high, low, close, vwap, volume, count.
+    """
+    def __init__(self, path="data/candles.db"):
+        self.path = path
+        self.logger = logger
+        self._initialized = False
+
+    # Open a connection, one per call so the store can be used from threads and processes
+    def _connect(self):
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, timeout=30)
+
+        if not self._initialized:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS candles (
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL,
+                    vwap REAL, volume REAL, count REAL,
+                    PRIMARY KEY (symbol, interval, timestamp)
+                ) WITHOUT ROWID
+            """)
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS fetches (
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (symbol, interval)
+                )
+            """)
+            connection.commit()
+            self._initialized = True
+
+        return connection
+
+    # Load the latest candles
+    def load(self, symbol, interval, limit=None, since=None):
+        """
+        Load stored candles in ascending timestamp order.
+
+        :param limit: Only return the latest limit candles
+        :param since: Only return candles from this timestamp on
+        :return: List of rows in Kraken's OHLC layout
+        """
+        connection = self._connect()
+        try:
+            query = "SELECT timestamp, open, high, low, close, vwap, volume, count FROM candles WHERE symbol = ? AND interval = ?"
+            parameters = (symbol, interval)
+            if since is not None:
+                query += " AND timestamp >= ?"
+                parameters += (int(since),)
+            query += " ORDER BY timestamp DESC"
+            if limit is not None:
+                query += " LIMIT ?"
+                parameters += (int(limit),)
+            rows = connection.execute(query, parameters).fetchall()
+        finally:
+            connection.close()
+
+        rows.reverse()
+        return rows
+
+    # Get last stored timestamp
+    def get_last_timestamp(self, symbol, interval):
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT MAX(timestamp) FROM candles WHERE symbol = ? AND interval = ?",
+                (symbol, interval)
+            ).fetchone()
+        finally:
+            connection.close()
+        return row[0]
+
+    # Get when the candles were last fetched from the API
+    def get_fetched_at(self, symbol, interval):
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT fetched_at FROM fetches WHERE symbol = ? AND interval = ?",
+                (symbol, interval)
+            ).fetchone()
+        finally:
+            connection.close()
+        return row[0] if row else None
+
+    # Save candles
+    def save(self, symbol, interval, rows, fetched_at=None):
+        """
+        Insert or replace candles in a single transaction, so readers never see a partial append.
+        Replacing keeps the still-forming last candle up to date.
+
+        :param rows: Rows in Kraken's OHLC layout, values may be strings
+        :param fetched_at: Time of the API fetch, now if None
+        """
+        records = [
+            (symbol, interval, int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5]), float(row[6]), float(row[7]))
+            for row in rows
+        ]
+
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO candles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    records
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO fetches VALUES (?, ?, ?)",
+                    (symbol, interval, fetched_at if fetched_at is not None else time.time())
+                )
+        finally:
+            connection.close()
+
+        self.logger.debug(f"Stored {len(records)} {symbol} {interval} candles")
+
+    # Delete all candles of a symbol and interval
+    def delete(self, symbol, interval):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute("DELETE FROM candles WHERE symbol = ? AND interval = ?", (symbol, interval))
+                connection.execute("DELETE FROM fetches WHERE symbol = ? AND interval = ?", (symbol, interval))
+        finally:
+            connection.close()
+
+# Create and export a single store instance
+candle_store = CandleStore()
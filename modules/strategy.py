@@ -1,21 +1,49 @@
 from abc import ABC, abstractmethod
 import datetime
 from time import sleep
+import numpy as np
 import pandas as pd
+from modules.backtest import simulate_signals
 from modules.graph import draw_graph
 from modules.logger import logger 
 from modules.data import DataManager
+from modules.trades import TradeLedger
+from modules.kraken import PRIORITY_SCAN, PRIORITY_BACKFILL
+
+# Bars before a backtest starts trading, they warm up the indicators
+BACKTEST_OFFSET = 50
 
 # A base class for all strategies
 class Strategy(ABC):
-    def __init__(self, symbol, interval, parent_interval=None, balance=1000, risk_percentage=100, trailing_stop_percentage=0):
+    # Indicator specs the strategy reads, parameters are filled in by name, e.g. "RSI({rsi_length})", "MACD(12,26,9)"
+    indicators = []
+    parent_indicators = []
+
+    # Tunable parameters and their defaults, e.g. {"rsi_length": 7}
+    parameters = {}
+
+    def __init__(self, symbol, interval, parent_interval=None, balance=1000, risk_percentage=100, trailing_stop_percentage=0, parameters=None, data_manager=None):
+        """
+        :param parameters: Values overriding the default parameters
+        :param data_manager: DataManager to read candles from, a new one if None
+        """
         self.name = self.__class__.__name__
         self.symbol = symbol
         self.balance = balance
+        self.initial_balance = balance
         self.interval = interval # 30m, 1h, 4h, 1d, 1w
         self.parent_interval = parent_interval # 1h, 4h, 1d, 1w, 15d
-        self.data_manager = DataManager(symbol, interval, parent_interval)
         self.logger = logger
+
+        unknown = sorted(set(parameters or {}) - set(self.parameters))
+        if unknown:
+            self.logger.error(f"Unknown parameters for {self.name}: {unknown}")
+            raise ValueError(f"Unknown parameters for {self.name}: {unknown}")
+        for key, value in {**self.parameters, **(parameters or {})}.items():
+            setattr(self, key, value)
+
+        self.data_manager = data_manager if data_manager is not None else DataManager(symbol, interval, parent_interval)
+        self._register_indicators()
         self.active = True
         self.simulation = True
         self.trailing_stop_percentage = trailing_stop_percentage
@@ -25,6 +53,7 @@ class Strategy(ABC):
         self.stop_loss_price = 0
         self.position_size = 0
         self.trade_history = []
+        self.ledger = TradeLedger(balance)
         self.performance_metrics = {}
         self.slippage_percentage = 0.1
 
@@ -35,8 +64,24 @@ class Strategy(ABC):
         self.logger.info(f"  - Balance: ${self.balance}")
         self.logger.info(f"  - Trailing Stop Percentage: {self.trailing_stop_percentage}%")
         self.logger.info(f"  - Risk Percentage: {self.risk_percentage}%")
+        if self.parameters:
+            self.logger.info(f"  - Parameters: {self.get_parameters()}")
         self.logger.info("--------------------------------")
 
+    # Get the current parameter values
+    def get_parameters(self):
+        return {key: getattr(self, key) for key in self.parameters}
+
+    # Fill the current parameters into an indicator spec
+    def spec(self, template):
+        return template.format(**self.get_parameters())
+
+    # Register the indicator specs of the current parameters
+    def _register_indicators(self):
+        self.indicators = [self.spec(template) for template in type(self).indicators]
+        self.parent_indicators = [self.spec(template) for template in type(self).parent_indicators]
+        self.data_manager.register_indicators(self.indicators, self.parent_indicators)
+
     # Check entry
     @abstractmethod
     def check_entry(self):
@@ -52,6 +97,25 @@ class Strategy(ABC):
     @abstractmethod
     def check_partial_close(self):
         pass
+
+    # Get signals
+    def get_signals(self):
+        """
+        Compute entry and exit signals for every bar of the loaded data at once.
+        Strategies that can't express their rules as arrays return None and are backtested bar by bar.
+
+        :return: Entry array (1 long, -1 short, 0 none) and boolean exit array, without signals while
+                 there are too few bars for the indicators. None if the strategy has no vectorized rules
+        """
+        return None
+
+    # Signals of a strategy that can't trade yet
+    def no_signals(self):
+        """
+        :return: Entry and exit arrays without any signal for every bar of the loaded data
+        """
+        length = len(self.data_manager.data)
+        return np.zeros(length, dtype=int), np.zeros(length, dtype=bool)
     
     # Long position
     def long(self):
@@ -127,33 +191,67 @@ class Strategy(ABC):
         def run_strategy():
             try:
                 self.data_manager.update_data()
-
-                if self.position is None:
-                    entry_signal = self.check_entry()
-                    if entry_signal == "long":
-                        self.long()
-                    elif entry_signal == "short":
-                        self.short()
-                else:
-                    if self.check_exit():
-                        self.close_position("exit")
-                    self.check_trailing_stop_loss()
-                    if percentage := self.check_partial_close():
-                        self.partial_close(percentage=percentage)
             except Exception as e:
                 self.logger.error(f"Error during strategy execution: {str(e)}")
                 self.active = False
-            
+                return
+
+            self._trade_step()
             sleep(self.data_manager.get_sleep_duration())
 
         from threading import Thread
         thread = Thread(target=run_strategy)
         thread.start()
+
+    # Run strategy on streamed candles
+    def run_stream(self, stream, limit=180):
+        """
+        Load the history once, then act on every candle close pushed by stream instead of polling.
+
+        :param stream: CandleStream, e.g. KrakenStream or ReplayStream, started by the caller
+        """
+        if not self.active:
+            self.logger.warning("Strategy is not active. Skipping run.")
+            return
+
+        self.data_manager.update_data(limit=limit)
+        self.data_manager.follow(stream, on_close=lambda timestamp: self._trade_step())
+
+    # Stop acting on streamed candles
+    def stop_stream(self):
+        self.data_manager.unfollow()
+
+    # Check signals and trade on the latest data, errors are raised
+    def evaluate(self):
+        if self.position is None:
+            entry_signal = self.check_entry()
+            if entry_signal == "long":
+                self.long()
+            elif entry_signal == "short":
+                self.short()
+        else:
+            if self.check_exit():
+                self.close_position("exit")
+            self.check_trailing_stop_loss()
+            if percentage := self.check_partial_close():
+                self.partial_close(percentage=percentage)
+
+    # Evaluate, deactivating the strategy on errors
+    def _trade_step(self):
+        if not self.active:
+            return
+
+        try:
+            self.evaluate()
+        except Exception as e:
+            self.logger.error(f"Error during strategy execution: {str(e)}")
+            self.active = False
     
     # Run step
-    def run_step(self):
+    def run_step(self, update=True):
         try:
-            self.data_manager.update_data()
+            if update:
+                self.data_manager.update_data(priority=PRIORITY_SCAN)
             entry_signal = self.check_entry()
             exit_signal = self.check_exit()
         except Exception as e:
@@ -172,7 +270,8 @@ class Strategy(ABC):
         result['exit_signal'] = exit_signal
         result['last_index'] = self.data_manager.data.index[-1]
 
-        draw_graph(self.data_manager.data, limit=100, summary=result, step_run=True)
+        self.data_manager.attach_indicators(self.indicators, self.parent_indicators)
+        draw_graph(self.data_manager.get_chart_data(), limit=100, summary=result, step_run=True)
         return result
 
     # Execute trade
@@ -230,13 +329,12 @@ class Strategy(ABC):
                 # Update balance
                 self.balance += profit_loss
                 
-                last_index = self.data_manager.data.index[-1]
                 if action == "close":
-                    self.data_manager.data.at[last_index, "exit_data"] = trade_info
+                    self.data_manager.record_trade("exit_data", trade_info)
                     self.position = None
                     self.position_size = 0
                 else:
-                    self.data_manager.data.at[last_index, "partial_close_data"] = trade_info
+                    self.data_manager.record_trade("partial_close_data", trade_info)
                     self.position_size -= size
 
             elif action in ["long", "short"]:
@@ -245,9 +343,9 @@ class Strategy(ABC):
                 self.position_size = size
                 
                 # Put entry data in DataFrame
-                last_index = self.data_manager.data.index[-1]
-                self.data_manager.data.at[last_index, "entry_data"] = trade_info
+                self.data_manager.record_trade("entry_data", trade_info)
 
+            self.ledger.record(trade_info['index'], action, execution_price, size, trade_info.get('profit_loss'), trade_info.get('percentage_gain_loss'))
             self.trade_history.append(trade_info)
             self.update_performance_metrics()
         
@@ -291,118 +389,147 @@ class Strategy(ABC):
     def check_trailing_stop_loss(self):
         pass
 
-    # Update performance metrics
+    # Update performance metrics from the ledger's running totals, O(1) per trade
     def update_performance_metrics(self):
-        try:
-            if len(self.trade_history) > 0:
-                closed_trades = [trade for trade in self.trade_history if trade['action'] == 'close']
-
-                if len(closed_trades) < 1:
-                    return
-                
-                self.performance_metrics['total_trades'] = len(closed_trades)
-                
-                winning_trades = [trade for trade in closed_trades if trade['result'] == 'win']
-                losing_trades = [trade for trade in closed_trades if trade['result'] == 'loss']
-                self.performance_metrics['win_trades'] = len(winning_trades)
-                self.performance_metrics['loss_trades'] = len(losing_trades)
-                
-                self.performance_metrics['win_rate'] = len(winning_trades) / len(closed_trades) if closed_trades else 0
-                
-                total_profit = sum(trade['profit_loss'] for trade in winning_trades)
-                total_loss = abs(sum(trade['profit_loss'] for trade in losing_trades))
-                
-                if total_loss == 0:
-                    if total_profit > 0:
-                        self.performance_metrics['profit_factor'] = float('inf')
-                    else:
-                        self.performance_metrics['profit_factor'] = 0
-                else:
-                    self.performance_metrics['profit_factor'] = total_profit / total_loss
-                
-                self.performance_metrics['total_profit_loss'] = total_profit - total_loss
-                self.performance_metrics['total_profit_loss_percentage'] = (self.performance_metrics['total_profit_loss'] / self.balance) * 100
-                
-                self.logger.info("Updated Performance Metrics:")
-                self.logger.info(f"  - Total Trades: {self.performance_metrics['total_trades']}")
-                self.logger.info(f"  - Win Rate: {self.performance_metrics['win_rate']:.2%}")
-                self.logger.info(f"  - Profit Factor: {self.performance_metrics['profit_factor']:.2f}")
-                self.logger.info(f"  - Total Profit/Loss: ${self.performance_metrics['total_profit_loss']:.2f} ({self.performance_metrics['total_profit_loss_percentage']:.2f}%)")
-        except Exception as e:
-            self.logger.error(f"Error updating performance metrics: {str(e)}")
+        self.performance_metrics = self.ledger.get_metrics()
+        self.logger.debug(f"Performance: {self.performance_metrics['total_trades']} trades, "
+                          f"win rate {self.performance_metrics['win_rate']:.2%}, "
+                          f"profit factor {self.performance_metrics['profit_factor']:.2f}, "
+                          f"P/L ${self.performance_metrics['total_profit_loss']:.2f}")
+
+    # Get full trade statistics
+    def get_trade_statistics(self):
+        return self.ledger.get_statistics()
     
     # Backtest
-    def backtest(self, duration):
+    def backtest(self, duration, vectorized=True, update=True, graph=True):
+        """
+        :param duration: Number of bars to trade over
+        :param vectorized: Use the strategy's signal arrays when it provides them
+        :param update: Fetch duration bars first, False to backtest the already loaded data
+        :param graph: Draw the results graph
+        :return: Summary of the results, None without enough data
+        """
         self.position = None
-        self.balance = 1000
+        self.balance = self.initial_balance
         self.trade_history = []
+        self.ledger.reset(self.balance)
+        self.data_manager.trades.clear()
         self.performance_metrics = {}
         self.entry_price = 0
         self.stop_loss_price = 0
         self.position_size = 0
         self.simulation = True
-        self.backtest = True
-        offset = 50
+        offset = BACKTEST_OFFSET
 
         self.logger.info(f"Starting backtest for {duration} periods")
 
         # Get data for the duration of the backtest
-        self.data_manager.update_data(limit=duration+offset)
-        original_data = self.data_manager.data.copy()
-
-        if self.data_manager.parent_interval_supported:
-            original_data_parent = self.data_manager.data_parent.copy()
-        
-        total_periods = len(original_data) - offset
+        if update:
+            self.data_manager.update_data(limit=duration+offset, priority=PRIORITY_BACKFILL)
 
-        if total_periods < 1:
+        if len(self.data_manager.data) - offset < 1:
             self.logger.error("Not enough data to perform backtest")
             return
 
-        for i in range(total_periods):
-            # Use data up to the current index
-            current_time = original_data.index[i+offset]
-            self.data_manager.data = original_data[:i+1+offset].copy()
-            
-            if self.data_manager.parent_interval_supported:
-                # Only include parent data up to the current timestamp
-                self.data_manager.data_parent = original_data_parent[original_data_parent.index <= current_time].copy()
-                self.data_manager._synchronize_data()
+        # Use the whole-history signal arrays when the strategy provides them
+        signals = self.get_signals() if vectorized else None
+        if signals is not None:
+            entry_signals, exit_signals = signals
+            self._backtest_signals(entry_signals, exit_signals, offset)
+            return self._finish_backtest(duration, graph)
 
-            # Update progress bar
-            self.print_progress_bar(i + 1, total_periods)
+        total_periods = len(self.data_manager.data) - offset
 
-            try:
-                if self.position is None:
-                    entry_signal = self.check_entry()
-                    if entry_signal == "long":
-                        self.long()
-                    elif entry_signal == "short":
-                        self.short()
-                else:
-                    if self.check_exit():
-                        self.close_position("exit")
-                    self.check_trailing_stop_loss()
-                    if percentage := self.check_partial_close():
-                        self.partial_close(percentage=percentage)
-                    
-                # Preserve entry and exit points
-                last_index = self.data_manager.data.index[-1]
-                if pd.notna(self.data_manager.data.at[last_index, 'entry_data']):
-                    original_data.at[last_index, 'entry_data'] = self.data_manager.data.at[last_index, 'entry_data']
-                if pd.notna(self.data_manager.data.at[last_index, 'exit_data']):
-                    original_data.at[last_index, 'exit_data'] = self.data_manager.data.at[last_index, 'exit_data']
-                if pd.notna(self.data_manager.data.at[last_index, 'partial_close_data']):
-                    original_data.at[last_index, 'partial_close_data'] = self.data_manager.data.at[last_index, 'partial_close_data']
+        # Move a cursor over the loaded data instead of copying a prefix every bar
+        self.data_manager.start_replay(start=offset)
+        try:
+            for i in range(total_periods):
+                self.data_manager.advance_replay()
+
+                # Update progress bar
+                if graph:
+                    self.print_progress_bar(i + 1, total_periods)
+
+                try:
+                    if self.position is None:
+                        entry_signal = self.check_entry()
+                        if entry_signal == "long":
+                            self.long()
+                        elif entry_signal == "short":
+                            self.short()
+                    else:
+                        if self.check_exit():
+                            self.close_position("exit")
+                        self.check_trailing_stop_loss()
+                        if percentage := self.check_partial_close():
+                            self.partial_close(percentage=percentage)
+
+                except Exception as e:
+                    self.logger.error(f"Error during backtest execution: {str(e)}")
+                    break
+        finally:
+            self.data_manager.stop_replay()
+
+        return self._finish_backtest(duration, graph)
+
+    # Backtest with signal arrays
+    def _backtest_signals(self, entry_signals, exit_signals, offset):
+        data = self.data_manager.data
+        trades, self.balance = simulate_signals(
+            data['close'].to_numpy(),
+            entry_signals,
+            exit_signals,
+            balance=self.balance,
+            risk_percentage=self.risk_percentage,
+            slippage_percentage=self.slippage_percentage,
+            start=offset
+        )
+
+        for trade in trades:
+            index = data.index[trade['position']]
+            trade_info = {
+                'symbol': self.symbol,
+                'interval': self.interval,
+                'index': index,
+                'action': trade['action'],
+                'price': trade['price'],
+                'size': trade['size'],
+                'amount': trade['amount'],
+                'date': datetime.datetime.now().strftime('%Y-%m-%d %I:%M:%S %p'),
+                'reason': "exit" if trade['action'] == "close" else None
+            }
 
-            except Exception as e:
-                self.logger.error(f"Error during backtest execution: {str(e)}")
-                break
+            if trade['action'] == "close":
+                trade_info['profit_loss'] = trade['profit_loss']
+                trade_info['percentage_gain_loss'] = trade['percentage_gain_loss']
+                trade_info['result'] = trade['result']
+                self.data_manager.record_trade("exit_data", trade_info, index=index)
+                self.position = None
+                self.position_size = 0
+            else:
+                self.data_manager.record_trade("entry_data", trade_info, index=index)
+                self.position = trade['action']
+                self.entry_price = trade['price']
+                self.position_size = trade['size']
 
-        self.logger.info("Backtest completed, Graphing results")
+            self.ledger.record(index, trade['action'], trade['price'], trade['size'], trade.get('profit_loss'), trade.get('percentage_gain_loss'))
+            self.trade_history.append(trade_info)
+
+        self.logger.info(f"Simulated {len(trades)} trades over {len(data) - offset} periods")
+        self.update_performance_metrics()
+
+    # Finish backtest
+    def _finish_backtest(self, duration, graph=True):
         summary = self.log_backtest_results()
+        self.logger.debug(f"Indicator cache: {self.data_manager.get_indicator_cache_stats()}")
+        if not graph:
+            return summary
+
+        self.logger.info("Backtest completed, Graphing results")
         print(summary)
-        draw_graph(self.data_manager.data, limit=duration, summary=summary)
+        self.data_manager.attach_indicators(self.indicators, self.parent_indicators)
+        draw_graph(self.data_manager.get_chart_data(), limit=duration, summary=summary)
         self.logger.info("Results graphed")
         return summary
     
@@ -419,11 +546,13 @@ class Strategy(ABC):
         summary['name'] = self.name
         summary['symbol'] = self.symbol
         summary['interval'] = self.interval
+        summary['total_trades'] = self.performance_metrics.get('total_trades', 0)
         summary['win_trades'] = self.performance_metrics.get('win_trades', 0)
         summary['loss_trades'] = self.performance_metrics.get('loss_trades', 0)
         summary['profit_factor'] = self.performance_metrics.get('profit_factor', 0)
         summary['total_profit_loss'] = self.performance_metrics.get('total_profit_loss', 0)
         summary['total_profit_loss_percentage'] = self.performance_metrics.get('total_profit_loss_percentage', 0)
+        summary['max_drawdown_percentage'] = self.performance_metrics.get('max_drawdown_percentage', 0)
 
         self.logger.info(results)
         return summary
@@ -437,6 +566,10 @@ class Strategy(ABC):
             else:
                 self.logger.warning(f"Attribute {key} not found in strategy")
 
+        # Indicator specs follow the parameters
+        if any(key in self.parameters for key in kwargs):
+            self._register_indicators()
+
     # Print progress bar
     def print_progress_bar(self, current, total):
         percent = f"{100 * (current / float(total)):.1f}"
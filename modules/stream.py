@@ -0,0 +1,295 @@
+import json
+import threading
+import time
+import pandas as pd
+from modules.data import DataManager
+from modules.logger import logger
+
+# The WebSocket client is only needed to stream from Kraken
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+class CandleStream:
+    """
+    Push-based candle source, the streaming alternative to polling the OHLC endpoint.
+    Subscribers get every update of a candle while it forms and once more when it closes.
+    Rows are in Kraken's OHLC layout: timestamp, open, high, low, close, vwap, volume, count.
+
+    A candle closes when a later one shows up or, with close_on_time, as soon as its interval has ended,
+    so subscribers hear of a close within milliseconds even if no trade follows it.
+    A candle is closed once, updates arriving after its close are passed on as not closed,
+    subscribers tell them apart from the forming candle by their earlier timestamp.
+    """
+    def __init__(self, close_on_time=True):
+        self.close_on_time = close_on_time
+        self.subscribers = {}
+        self.candles = {}
+        self.lock = threading.RLock()
+        self.logger = logger
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+        self._closer = None
+
+    # Subscribe to candles of a symbol and interval
+    def subscribe(self, symbol, interval, callback):
+        """
+        :param interval: Interval name, e.g. 1h
+        :param callback: Called with the candle row and whether it is closed
+        """
+        with self.lock:
+            self.subscribers.setdefault((symbol, interval), []).append(callback)
+
+    # Unsubscribe a callback
+    def unsubscribe(self, symbol, interval, callback):
+        with self.lock:
+            callbacks = self.subscribers.get((symbol, interval), [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self.subscribers.pop((symbol, interval), None)
+                self.candles.pop((symbol, interval), None)
+
+    # Start streaming
+    def start(self):
+        self._stopped.clear()
+        if self.close_on_time and self._closer is None:
+            self._closer = threading.Thread(target=self._close_expired, daemon=True)
+            self._closer.start()
+        return self
+
+    # Stop streaming
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._closer is not None:
+            self._closer.join()
+            self._closer = None
+
+    # Handle an update of a candle
+    def update(self, symbol, interval, row):
+        """
+        Publish a candle update, closing the previous candle first if this one is newer.
+        """
+        key = (symbol, interval)
+        with self.lock:
+            if key not in self.subscribers:
+                return
+
+            current = self.candles.get(key)
+            if current is not None and row[0] < current[0][0]:
+                # A late update of a candle the newer one already closed, the newer one stays held
+                self._publish(key, row, False)
+                return
+
+            if current is not None and row[0] > current[0][0] and not current[1]:
+                self._publish(key, current[0], True)
+
+            # A candle closed on time stays closed through its late updates
+            closed = current is not None and row[0] == current[0][0] and current[1]
+            self.candles[key] = [row, closed]
+            self._publish(key, row, False)
+
+        # Let the closer know about the new candle's end
+        self._wakeup.set()
+
+    # Close the held candles
+    def flush(self):
+        with self.lock:
+            for key, candle in self.candles.items():
+                if not candle[1]:
+                    candle[1] = True
+                    self._publish(key, candle[0], True)
+
+    # Publish a candle to subscribers
+    def _publish(self, key, row, closed):
+        for callback in list(self.subscribers.get(key, [])):
+            try:
+                callback(row, closed)
+            except Exception as e:
+                self.logger.error(f"Error handling {key[0]} {key[1]} candle: {str(e)}")
+
+    # Close candles whose interval has ended
+    def _close_expired(self):
+        while not self._stopped.is_set():
+            now = time.time()
+            next_close = now + 1
+            with self.lock:
+                for key, candle in self.candles.items():
+                    if candle[1]:
+                        continue
+                    end = candle[0][0] + interval_in_seconds(key[1])
+                    if end <= now:
+                        candle[1] = True
+                        self._publish(key, candle[0], True)
+                    else:
+                        next_close = min(next_close, end)
+            self._wakeup.wait(max(next_close - time.time(), 0.001))
+            self._wakeup.clear()
+
+class KrakenStream(CandleStream):
+    """
+    Candles from the ohlc channel of Kraken's WebSocket API v2, reconnecting with backoff when the connection drops.
+    Needs the websocket-client package.
+    """
+    def __init__(self, url="wss://ws.kraken.com/v2", reconnect_delay=1.0, reconnect_max=30.0):
+        super().__init__(close_on_time=True)
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max = reconnect_max
+        self.app = None
+        self.thread = None
+        self.symbols = {}
+
+    # Subscribe, also on the open connection
+    def subscribe(self, symbol, interval, callback):
+        with self.lock:
+            new = (symbol, interval) not in self.subscribers
+            super().subscribe(symbol, interval, callback)
+            self.symbols[self._ws_symbol(symbol)] = symbol
+        if new and self.app is not None:
+            self._send_subscription([(symbol, interval)])
+
+    # Connect and stream in a background thread
+    def start(self):
+        if websocket is None:
+            raise ImportError("KrakenStream needs the websocket-client package: pip install websocket-client")
+
+        super().start()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    # Disconnect
+    def stop(self):
+        super().stop()
+        if self.app is not None:
+            self.app.close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    # Keep a connection open until stopped
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stopped.is_set():
+            self.app = websocket.WebSocketApp(self.url, on_open=self._on_open, on_message=self._on_message)
+            started = time.monotonic()
+            self.app.run_forever(ping_interval=30, ping_timeout=10)
+            self.app = None
+
+            if self._stopped.is_set():
+                break
+
+            # Back off only if the connection kept failing
+            if time.monotonic() - started > self.reconnect_max:
+                delay = self.reconnect_delay
+            self.logger.warning(f"Kraken stream disconnected, reconnecting in {delay:.1f}s")
+            self._stopped.wait(delay)
+            delay = min(delay * 2, self.reconnect_max)
+
+    # Subscribe to every symbol and interval on connect
+    def _on_open(self, app):
+        with self.lock:
+            keys = list(self.subscribers)
+        self._send_subscription(keys)
+
+    # Send ohlc subscriptions, one per interval
+    def _send_subscription(self, keys):
+        intervals = {}
+        for symbol, interval in keys:
+            intervals.setdefault(interval, []).append(self._ws_symbol(symbol))
+
+        for interval, symbols in intervals.items():
+            self.app.send(json.dumps({
+                "method": "subscribe",
+                "params": {"channel": "ohlc", "symbol": symbols, "interval": interval_in_seconds(interval) // 60}
+            }))
+
+    # Handle a message
+    def _on_message(self, app, message):
+        message = json.loads(message)
+        if message.get("channel") != "ohlc" or message.get("type") not in ("snapshot", "update"):
+            return
+
+        # A snapshot holds recent candles, only the latest is new to subscribers that loaded data over REST
+        candles = message["data"][-1:] if message["type"] == "snapshot" else message["data"]
+        for candle in candles:
+            symbol = self.symbols.get(candle["symbol"])
+            if symbol is None:
+                continue
+            row = [
+                int(pd.Timestamp(candle["interval_begin"]).timestamp()),
+                candle["open"], candle["high"], candle["low"], candle["close"],
+                candle["vwap"], candle["volume"], candle["trades"]
+            ]
+            self.update(symbol, interval_name(candle["interval"]), row)
+
+    # WebSocket symbol of a REST pair, e.g. XBTUSD to BTC/USD
+    @staticmethod
+    def _ws_symbol(symbol):
+        base, quote = symbol[:-3], symbol[-3:]
+        return f"{'BTC' if base == 'XBT' else base}/{quote}"
+
+class ReplayStream(CandleStream):
+    """
+    Stand-in stream replaying recorded candles, for tests without a connection.
+    Every candle is pushed as steps in-progress updates building up to it, then the next candle closes it.
+    """
+    def __init__(self, candles, steps=1, delay=0.0):
+        """
+        :param candles: Dict of (symbol, interval) to rows in Kraken's OHLC layout
+        :param steps: Updates per candle, the last one is the complete candle
+        :param delay: Seconds between updates
+        """
+        super().__init__(close_on_time=False)
+        self.recorded = candles
+        self.steps = steps
+        self.delay = delay
+        self.thread = None
+
+    # Replay in a background thread
+    def start(self):
+        super().start()
+        self.thread = threading.Thread(target=self.play, daemon=True)
+        self.thread.start()
+        return self
+
+    # Wait for the replay to finish
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    # Replay all candles in timestamp order
+    def play(self):
+        updates = sorted(
+            (row[0], key, row) for key, rows in self.recorded.items() for row in rows
+        )
+        for _, key, row in updates:
+            for step in range(1, self.steps + 1):
+                if self._stopped.is_set():
+                    return
+                self.update(key[0], key[1], self._partial(row, step) if step < self.steps else row)
+                if self.delay:
+                    time.sleep(self.delay)
+        self.flush()
+
+    # Candle as seen after step of steps updates
+    def _partial(self, row, step):
+        open_, high, low, close = (float(value) for value in row[1:5])
+        share = step / self.steps
+        price = open_ + (close - open_) * share
+        return [row[0], open_, max(open_, price), min(open_, price), price, price,
+                float(row[6]) * share, int(int(row[7]) * share)]
+
+# Seconds of an interval name
+def interval_in_seconds(interval):
+    return DataManager.interval_in_minutes(interval) * 60
+
+# Interval name of a length in minutes
+def interval_name(minutes):
+    for interval in ('1m', '5m', '15m', '30m', '1h', '4h', '1d', '1w', '15d'):
+        if DataManager.interval_in_minutes(interval) == minutes:
+            return interval
+    raise ValueError(f"Invalid interval: {minutes} minutes")
@@ -0,0 +1,227 @@
+import numpy as np
+import pandas as pd
+
+# Trade event kinds, named after the chart columns they are joined into
+TRADE_EVENTS = ('entry_data', 'exit_data', 'partial_close_data')
+
+class TradeLog:
+    """
+    Columnar log of trade events kept outside the candle frame.
+    Candles stay purely numeric, events are only joined to them when charting.
+    """
+    fields = ('event', 'index', 'symbol', 'interval', 'action', 'price', 'size', 'amount', 'date', 'reason',
+              'profit_loss', 'percentage_gain_loss', 'result')
+
+    def __init__(self):
+        self.columns = {field: [] for field in self.fields}
+
+    def __len__(self):
+        return len(self.columns['event'])
+
+    # Record a trade event
+    def record(self, event, timestamp, trade_info):
+        """
+        :param event: One of TRADE_EVENTS
+        :param timestamp: Timestamp of the candle the trade happened on
+        :param trade_info: Trade dict as built by Strategy.execute_trade
+        """
+        if event not in TRADE_EVENTS:
+            raise ValueError(f"Invalid trade event: {event}")
+
+        for field, values in self.columns.items():
+            if field == 'event':
+                values.append(event)
+            elif field == 'index':
+                values.append(timestamp)
+            else:
+                values.append(trade_info.get(field))
+
+    # Drop all events
+    def clear(self):
+        for values in self.columns.values():
+            values.clear()
+
+    # Events as a DataFrame
+    def to_frame(self):
+        return pd.DataFrame(self.columns)
+
+    # Join events to candles for charting
+    def join(self, data):
+        """
+        Get a copy of data with an object column per event kind holding the trade dicts,
+        the layout draw_graph expects. Events outside data are left out.
+
+        :param data: Candle frame
+        :return: The joined frame
+        """
+        data = data.copy()
+        for event in TRADE_EVENTS:
+            data[event] = None
+
+        if not len(self) or data.empty:
+            return data
+
+        positions = data.index.get_indexer(pd.DatetimeIndex(self.columns['index']))
+        for i, position in enumerate(positions):
+            if position < 0:
+                continue
+
+            trade_info = {field: self.columns[field][i] for field in self.fields[1:]}
+            if trade_info['profit_loss'] is None:
+                for field in ('profit_loss', 'percentage_gain_loss', 'result'):
+                    del trade_info[field]
+
+            data.iat[position, data.columns.get_loc(self.columns['event'][i])] = trade_info
+
+        return data
+
+# Ledger actions, stored as their position
+LEDGER_ACTIONS = ('long', 'short', 'close', 'partial close')
+
+class TradeLedger:
+    """
+    Preallocated columnar ledger of fills in a NumPy structured array, doubled when full.
+    Win and loss counts, gross profit and loss and the realized drawdown are running aggregates
+    updated in O(1) per fill, so metrics can be read after every trade of a backtest.
+    Closes and partial closes both realize profit/loss and count as trades.
+    Fuller statistics are computed from the columns only when asked for.
+    """
+    dtype = np.dtype([
+        ('timestamp', 'i8'),
+        ('action', 'u1'),
+        ('price', 'f8'),
+        ('size', 'f8'),
+        ('amount', 'f8'),
+        ('profit_loss', 'f8'),
+        ('percentage_gain_loss', 'f8')
+    ])
+
+    def __init__(self, balance=1000, capacity=256):
+        self.capacity = capacity
+        self.reset(balance)
+
+    def __len__(self):
+        return self.size
+
+    # Drop all fills and start over from a balance
+    def reset(self, balance=1000):
+        self.records = np.empty(self.capacity, dtype=self.dtype)
+        self.size = 0
+        self.tz = None
+        self.initial_balance = balance
+        self.balance = balance
+        self.peak_balance = balance
+        self.max_drawdown = 0.0
+        self.win_trades = 0
+        self.loss_trades = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self._statistics = None
+
+    # Record a fill
+    def record(self, timestamp, action, price, size, profit_loss=None, percentage_gain_loss=None):
+        """
+        :param timestamp: Timestamp of the candle the fill happened on
+        :param action: One of LEDGER_ACTIONS
+        :param profit_loss: Realized profit/loss of a close or partial close
+        """
+        if self.size == len(self.records):
+            records = np.empty(2 * len(self.records), dtype=self.dtype)
+            records[:self.size] = self.records[:self.size]
+            self.records = records
+
+        timestamp = pd.Timestamp(timestamp)
+        if self.tz is None and timestamp.tz is not None:
+            self.tz = timestamp.tz
+
+        self.records[self.size] = (
+            timestamp.value,
+            LEDGER_ACTIONS.index(action),
+            price,
+            size,
+            price * size,
+            np.nan if profit_loss is None else profit_loss,
+            np.nan if percentage_gain_loss is None else percentage_gain_loss
+        )
+        self.size += 1
+        self._statistics = None
+
+        if profit_loss is None:
+            return
+
+        if profit_loss > 0:
+            self.win_trades += 1
+            self.gross_profit += profit_loss
+        else:
+            self.loss_trades += 1
+            self.gross_loss -= profit_loss
+
+        self.balance += profit_loss
+        self.peak_balance = max(self.peak_balance, self.balance)
+        self.max_drawdown = max(self.max_drawdown, (self.peak_balance - self.balance) / self.peak_balance)
+
+    # Get running metrics, O(1)
+    def get_metrics(self):
+        total_trades = self.win_trades + self.loss_trades
+        if self.gross_loss == 0:
+            profit_factor = float('inf') if self.gross_profit > 0 else 0
+        else:
+            profit_factor = self.gross_profit / self.gross_loss
+
+        return {
+            'total_trades': total_trades,
+            'win_trades': self.win_trades,
+            'loss_trades': self.loss_trades,
+            'win_rate': self.win_trades / total_trades if total_trades else 0,
+            'profit_factor': profit_factor,
+            'total_profit_loss': self.gross_profit - self.gross_loss,
+            'total_profit_loss_percentage': (self.gross_profit - self.gross_loss) / self.balance * 100,
+            'max_drawdown_percentage': self.max_drawdown * 100
+        }
+
+    # Get full statistics, computed once per new fill
+    def get_statistics(self):
+        """
+        :return: Running metrics plus average, largest and expected trade results,
+                 the longest losing streak and the fill counts per action
+        """
+        if self._statistics is not None:
+            return self._statistics
+
+        records = self.records[:self.size]
+        profit_losses = records['profit_loss'][~np.isnan(records['profit_loss'])]
+        wins = profit_losses[profit_losses > 0]
+        losses = profit_losses[profit_losses <= 0]
+
+        # Longest run of losses, from the positions of the wins around it
+        breaks = np.flatnonzero(np.concatenate(([True], profit_losses > 0, [True])))
+        losing_streak = int((np.diff(breaks) - 1).max()) if len(profit_losses) else 0
+
+        statistics = self.get_metrics()
+        statistics.update({
+            'fills': self.size,
+            'fills_per_action': {action: int((records['action'] == code).sum()) for code, action in enumerate(LEDGER_ACTIONS)},
+            'gross_profit': self.gross_profit,
+            'gross_loss': self.gross_loss,
+            'average_win': float(wins.mean()) if len(wins) else 0.0,
+            'average_loss': float(losses.mean()) if len(losses) else 0.0,
+            'largest_win': float(wins.max()) if len(wins) else 0.0,
+            'largest_loss': float(losses.min()) if len(losses) else 0.0,
+            'expectancy': float(profit_losses.mean()) if len(profit_losses) else 0.0,
+            'average_percentage_gain_loss': float(np.nanmean(records['percentage_gain_loss'])) if len(profit_losses) else 0.0,
+            'max_consecutive_losses': losing_streak,
+            'final_balance': self.balance
+        })
+        self._statistics = statistics
+        return statistics
+
+    # Fills as a DataFrame
+    def to_frame(self):
+        records = self.records[:self.size]
+        index = pd.to_datetime(records['timestamp'], utc=self.tz is not None)
+        if self.tz is not None:
+            index = index.tz_convert(self.tz)
+
+        frame = pd.DataFrame({name: records[name] for name in self.dtype.names if name != 'timestamp'}, index=index)
+        frame['action'] = np.array(LEDGER_ACTIONS, dtype=object)[records['action']]
+        return frame
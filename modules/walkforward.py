@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+from modules.backtest import simulate_signals, summarize_trades, equity_curve
+from modules.optimizer import Optimizer, load_strategy
+from modules.strategy import BACKTEST_OFFSET
+
+# Load a strategy and compute its signals over the whole history, in a worker process
+def _load_signals(strategy_class, parameters, market, rows, options):
+    strategy = load_strategy(strategy_class, parameters, market, rows, options)
+    if len(strategy.data_manager.data) < rows:
+        raise ValueError(f"Not enough data to walk forward: {len(strategy.data_manager.data)} of {rows} bars")
+
+    signals = strategy.get_signals()
+    if signals is None:
+        raise ValueError(f"{strategy.name} has no signal arrays to walk forward with")
+    return strategy, signals
+
+# Simulate a window of the history
+def _simulate_window(strategy, signals, start, end):
+    """
+    Indicators before start count as warmup, a position still open on the last bar is closed there.
+
+    :return: The trades and the final balance
+    """
+    entry_signals, exit_signals = signals
+    exit_signals = np.array(exit_signals[:end], dtype=bool)
+    exit_signals[-1] = True
+    return simulate_signals(
+        strategy.data_manager.data['close'].to_numpy()[:end],
+        np.asarray(entry_signals)[:end],
+        exit_signals,
+        balance=strategy.balance,
+        risk_percentage=strategy.risk_percentage,
+        slippage_percentage=strategy.slippage_percentage,
+        start=start
+    )
+
+# Evaluate one parameter set on every train window
+def _run_train(task):
+    strategy_class, parameters, market, rows, windows, options = task
+    strategy, signals = _load_signals(strategy_class, parameters, market, rows, options)
+    return [summarize_trades(*_simulate_window(strategy, signals, start, end)) for start, end in windows]
+
+# Evaluate the picked parameter set of a fold on its test window
+def _run_test(task):
+    strategy_class, parameters, market, rows, fold, options = task
+    train_start, test_start, test_end = fold
+    strategy, signals = _load_signals(strategy_class, parameters, market, rows, options)
+    trades, balance = _simulate_window(strategy, signals, test_start, test_end)
+
+    data = strategy.data_manager.data
+    return {
+        'summary': summarize_trades(trades, balance),
+        'equity': equity_curve(data['close'].to_numpy(), trades, strategy.balance, test_start, test_end),
+        'index': data.index[test_start:test_end],
+        'bounds': data.index[[train_start, test_start - 1, test_start, test_end - 1]]
+    }
+
+class WalkForward(Optimizer):
+    """
+    Walk-forward analysis: the history is split into folds of a train window followed by a test window.
+    Parameters are picked on every train window by a sweep and judged on the test window right after it,
+    the test windows stitched together give an out-of-sample equity curve.
+    A parameter set's indicators and signals are computed once over the whole history and each fold
+    simulates its windows from them, so overlapping folds don't compute them again.
+    """
+    def __init__(self, strategy_class, grid, symbol, interval="4h", parent_interval="1d", train=500, test=100, folds=5,
+                 anchored=False, balance=1000, risk_percentage=100, max_workers=None, chunksize=None):
+        """
+        :param train: Bars of a train window, the first one's with anchored
+        :param test: Bars of a test window, also the step between folds
+        :param folds: Number of folds, the last test window ends at the latest bar
+        :param anchored: Train windows all start at the first bar and grow, instead of rolling
+        """
+        super().__init__(strategy_class, grid, [symbol], intervals=[(interval, parent_interval)], duration=train + folds * test,
+                         balance=balance, risk_percentage=risk_percentage, max_workers=max_workers, chunksize=chunksize)
+        self.train = train
+        self.test = test
+        self.folds = folds
+        self.anchored = anchored
+
+    # Bar positions of the folds
+    def get_folds(self):
+        """
+        :return: List of train start, test start and test end per fold, counted from the first loaded bar
+        """
+        folds = []
+        for fold in range(self.folds):
+            test_start = BACKTEST_OFFSET + self.train + fold * self.test
+            train_start = BACKTEST_OFFSET if self.anchored else test_start - self.train
+            folds.append((train_start, test_start, test_start + self.test))
+        return folds
+
+    # Run the walk-forward analysis
+    def run(self, rank_by="profit_factor"):
+        """
+        :param rank_by: Train window result to pick parameters by, one of RANKINGS
+        :return: Dict of folds, a DataFrame of every fold's windows, picked parameters and train and test results,
+                 equity, the stitched out-of-sample equity Series, and stability, a DataFrame of how the picked
+                 value of every parameter varied over the folds
+        """
+        self._check_ranking(rank_by)
+        parameter_sets = self.expand_grid(self.grid)
+        folds = self.get_folds()
+        windows = [(train_start, test_start) for train_start, test_start, _ in folds]
+        rows = self.duration + BACKTEST_OFFSET
+
+        with self._open_pool() as (executor, markets):
+            if not markets:
+                self.logger.error(f"No candles to walk forward {self.symbols[0]} with")
+                raise ValueError(f"No candles to walk forward {self.symbols[0]} with")
+            market = markets[0]
+
+            self.logger.info(f"Walking forward {len(parameter_sets)} parameter sets over {len(folds)} folds of {self.train}/{self.test} bars")
+            train = self._map(executor, _run_train, [(parameters, market, rows, windows) for parameters in parameter_sets])
+
+            # Pick the best parameters of every train window
+            picks = []
+            for fold in range(len(folds)):
+                results = pd.DataFrame([results[fold] for results in train]).assign(candidate=range(len(parameter_sets)))
+                picks.append(self.rank(results, rank_by).iloc[0])
+
+            tests = self._map(executor, _run_test, [
+                (parameter_sets[int(pick['candidate'])], market, rows, fold)
+                for pick, fold in zip(picks, folds)
+            ])
+
+        return {
+            'folds': self._get_fold_report(parameter_sets, picks, tests),
+            'equity': self._stitch_equity(tests),
+            'stability': self._get_stability_report([parameter_sets[int(pick['candidate'])] for pick in picks])
+        }
+
+    # Table of the folds
+    def _get_fold_report(self, parameter_sets, picks, tests):
+        rows = []
+        for fold, (pick, test) in enumerate(zip(picks, tests), start=1):
+            train_start, train_end, test_start, test_end = test['bounds']
+            row = {'fold': fold, 'train_start': train_start, 'train_end': train_end, 'test_start': test_start, 'test_end': test_end}
+            row.update(parameter_sets[int(pick['candidate'])])
+            row.update({f"train_{metric}": value for metric, value in pick.drop('candidate').items()})
+            row.update({f"test_{metric}": value for metric, value in test['summary'].items()})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    # Chain the test windows' equity
+    def _stitch_equity(self, tests):
+        """
+        Every test window was simulated from the starting balance, positions are sized from the balance,
+        so a window's curve scales with the balance the previous windows left.
+        """
+        balance = self.options['balance']
+        curves = []
+        for test in tests:
+            equity = test['equity'] * (balance / self.options['balance'])
+            curves.append(pd.Series(equity, index=test['index']))
+            balance = equity[-1]
+        return pd.concat(curves).rename('equity')
+
+    # Table of how the picked parameters varied
+    def _get_stability_report(self, picked):
+        rows = []
+        for name in self.grid:
+            values = pd.Series([parameters[name] for parameters in picked])
+            mode = values.mode().iloc[0]
+            row = {
+                'parameter': name,
+                'values': values.tolist(),
+                'mode': mode,
+                'mode_share': float((values == mode).mean()),
+                'changes': int((values != values.shift()).iloc[1:].sum())
+            }
+            if pd.api.types.is_numeric_dtype(values):
+                row.update({'mean': values.mean(), 'std': values.std(ddof=0), 'min': values.min(), 'max': values.max()})
+            rows.append(row)
+        return pd.DataFrame(rows)
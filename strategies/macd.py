@@ -1,15 +1,18 @@
 from modules.strategy import Strategy
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
 class MACD(Strategy):
+    indicators = ["EMA(21)", "MACD({macd_fast},{macd_slow},{macd_signal})"]
+    parameters = {"macd_fast": 12, "macd_slow": 26, "macd_signal": 9}
+
     def get_indicators(self):
         if len(self.data_manager.data) < 35:
-            return None, None, None, None
+            return None
         
         self.parent_interval_supported = False
-        ema = self.data_manager.data.ta.ema(close=self.data_manager.data['close'], length=21, append=True, suffix='EMA')
-        macd = self.data_manager.data.ta.macd(close=self.data_manager.data['close'], append=True)
+        # Columns are named by the lengths, rename them so the rules read the same for any parameters
+        macd = self.data_manager.get_indicator(self.spec("MACD({macd_fast},{macd_slow},{macd_signal})")).set_axis(["MACD", "MACDh", "MACDs"], axis=1)
 
         return macd
 
@@ -22,10 +25,10 @@ class MACD(Strategy):
         macd_prev = macd.iloc[-3]
 
         # Check if MACD crosses above its Signal line
-        if macd_prev['MACD_12_26_9'] < macd_prev['MACDs_12_26_9'] and macd_current['MACD_12_26_9'] > macd_current['MACDs_12_26_9']:
+        if macd_prev['MACD'] < macd_prev['MACDs'] and macd_current['MACD'] > macd_current['MACDs']:
             self.logger.debug("MACD crossed above SMA. Entering Long")
             return "long"
-        elif macd_prev['MACD_12_26_9'] > macd_prev['MACDs_12_26_9'] and macd_current['MACD_12_26_9'] < macd_current['MACDs_12_26_9']:
+        elif macd_prev['MACD'] > macd_prev['MACDs'] and macd_current['MACD'] < macd_current['MACDs']:
             self.logger.debug("MACD crossed below SMA. Entering Short")
             return "short"
         return False
@@ -39,10 +42,24 @@ class MACD(Strategy):
         macd_current = macd.iloc[-2]
 
         # Check if MACD crosses below its Signal line
-        if macd_prev['MACD_12_26_9'] > macd_prev['MACDs_12_26_9'] and macd_current['MACD_12_26_9'] < macd_current['MACDs_12_26_9']:
+        if macd_prev['MACD'] > macd_prev['MACDs'] and macd_current['MACD'] < macd_current['MACDs']:
             self.logger.debug("MACD crossed below SMA. Exiting Long")
             return True
         return False
     
+    def get_signals(self):
+        macd = self.get_indicators()
+        if macd is None:
+            return self.no_signals()
+
+        # Bar i decides on the closed bars i-1 and i-2, same as iloc[-2] and iloc[-3]
+        macd_current, macd_prev = macd.shift(1), macd.shift(2)
+
+        long = (macd_prev['MACD'] < macd_prev['MACDs']) & (macd_current['MACD'] > macd_current['MACDs'])
+        short = (macd_prev['MACD'] > macd_prev['MACDs']) & (macd_current['MACD'] < macd_current['MACDs'])
+
+        entry = np.where(long, 1, np.where(short, -1, 0))
+        return entry, short.to_numpy()
+
     def check_partial_close(self):
         return False
@@ -1,18 +1,23 @@
 from modules.strategy import Strategy
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
 class MACD_DOUBLE(Strategy):
+    indicators = ["EMA(21)", "MACD({macd_fast},{macd_slow},{macd_signal})"]
+    parent_indicators = ["MACD({macd_fast},{macd_slow},{macd_signal})"]
+    parameters = {"macd_fast": 12, "macd_slow": 26, "macd_signal": 9}
+
     def get_indicators(self):
         if len(self.data_manager.data) < 35:
-            return None, None, None, None
+            return None, None
         
         self.parent_interval_supported = False
-        ema = self.data_manager.data.ta.ema(close=self.data_manager.data['close'], length=21, append=True, suffix='EMA')
-        macd = self.data_manager.data.ta.macd(close=self.data_manager.data['close'], append=True)
+        # Columns are named by the lengths, rename them so the rules read the same for any parameters
+        spec = self.spec("MACD({macd_fast},{macd_slow},{macd_signal})")
+        macd = self.data_manager.get_indicator(spec).set_axis(["MACD", "MACDh", "MACDs"], axis=1)
         
-        # Calculate parent MACD
-        macd_parent = self.data_manager.data_parent.ta.macd(close=self.data_manager.data_parent['close'])
+        # Calculate parent MACD, aligned to the last closed parent candle of every bar
+        macd_parent = self.data_manager.get_aligned_parent_indicator(spec).set_axis(["MACD", "MACDh", "MACDs"], axis=1)
 
         return macd, macd_parent
 
@@ -27,10 +32,10 @@ class MACD_DOUBLE(Strategy):
         macd_parent_prev = macd_parent.iloc[-3]
 
         # Check if MACD crosses above its Signal line
-        if macd_current['MACD_12_26_9'] > macd_current['MACDs_12_26_9'] and macd_parent_current['MACD_12_26_9'] > macd_parent_current['MACDs_12_26_9']:
+        if macd_current['MACD'] > macd_current['MACDs'] and macd_parent_current['MACD'] > macd_parent_current['MACDs']:
             self.logger.debug("MACD crossed above SMA. Entering Long")
             return "long"
-        elif macd_current['MACD_12_26_9'] < macd_current['MACDs_12_26_9'] and macd_parent_current['MACD_12_26_9'] < macd_parent_current['MACDs_12_26_9']:
+        elif macd_current['MACD'] < macd_current['MACDs'] and macd_parent_current['MACD'] < macd_parent_current['MACDs']:
             self.logger.debug("MACD crossed below SMA. Entering Short")
             return "short"
         return False
@@ -44,10 +49,26 @@ class MACD_DOUBLE(Strategy):
         macd_current = macd.iloc[-2]
 
         # Check if MACD crosses below its Signal line
-        if macd_prev['MACD_12_26_9'] > macd_prev['MACDs_12_26_9'] and macd_current['MACD_12_26_9'] < macd_current['MACDs_12_26_9']:
+        if macd_prev['MACD'] > macd_prev['MACDs'] and macd_current['MACD'] < macd_current['MACDs']:
             self.logger.debug("MACD crossed below SMA. Exiting Long")
             return True
         return False
+
+    def get_signals(self):
+        macd, macd_parent = self.get_indicators()
+        if macd is None or macd_parent is None:
+            return self.no_signals()
+
+        # Bar i decides on the closed bars i-1 and i-2, same as iloc[-2] and iloc[-3]
+        macd_current, macd_prev = macd.shift(1), macd.shift(2)
+        macd_parent_current = macd_parent.shift(1)
+
+        long = (macd_current['MACD'] > macd_current['MACDs']) & (macd_parent_current['MACD'] > macd_parent_current['MACDs'])
+        short = (macd_current['MACD'] < macd_current['MACDs']) & (macd_parent_current['MACD'] < macd_parent_current['MACDs'])
+        exit = (macd_prev['MACD'] > macd_prev['MACDs']) & (macd_current['MACD'] < macd_current['MACDs'])
+
+        entry = np.where(long, 1, np.where(short, -1, 0))
+        return entry, exit.to_numpy()
     
     def check_partial_close(self):
         return False
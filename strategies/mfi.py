@@ -1,15 +1,17 @@
 from modules.strategy import Strategy
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
 class MFI(Strategy):    
+    indicators = ["EMA(21)", "MFI({mfi_length})", "SMA(MFI_{mfi_length},{sma_length})"]
+    parameters = {"mfi_length": 7, "sma_length": 14}
+
     def get_indicators(self):
         if len(self.data_manager.data) < 35:
             return None, None
         
-        ema = self.data_manager.data.ta.ema(close=self.data_manager.data['close'], length=21, append=True, suffix='EMA')
-        mfi = self.data_manager.data.ta.mfi(high=self.data_manager.data['high'], low=self.data_manager.data['low'], close=self.data_manager.data['close'], volume=self.data_manager.data['volume'], length=7, append=True)
-        mfi_sma = self.data_manager.data.ta.sma(close=self.data_manager.data['MFI_7'], length=14, append=True, suffix='MFI')
+        mfi = self.data_manager.get_indicator(self.spec("MFI({mfi_length})"))
+        mfi_sma = self.data_manager.get_indicator(self.spec("SMA(MFI_{mfi_length},{sma_length})"))
         return mfi, mfi_sma
 
     def check_entry(self):
@@ -58,5 +60,20 @@ class MFI(Strategy):
             return True
         return False
     
+    def get_signals(self):
+        mfi, mfi_sma = self.get_indicators()
+        if mfi is None or mfi_sma is None:
+            return self.no_signals()
+
+        # Bar i decides on the closed bars i-1 and i-2, same as iloc[-2] and iloc[-3]
+        mfi_current, mfi_prev = mfi.shift(1), mfi.shift(2)
+        mfi_sma_current, mfi_sma_prev = mfi_sma.shift(1), mfi_sma.shift(2)
+
+        long = (mfi_prev <= mfi_sma_prev) & (mfi_current > mfi_sma_current)
+        short = (mfi_prev >= mfi_sma_prev) & (mfi_current < mfi_sma_current)
+
+        entry = np.where(long, 1, np.where(short, -1, 0))
+        return entry, short.to_numpy()
+
     def check_partial_close(self):
         return False
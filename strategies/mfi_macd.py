@@ -1,17 +1,21 @@
 from modules.strategy import Strategy
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
 class MFI_MACD(Strategy):
+    indicators = ["EMA(21)", "MFI({mfi_length})", "SMA(MFI_{mfi_length},{sma_length})", "MACD({macd_fast},{macd_slow},{macd_signal})"]
+    parameters = {"mfi_length": 7, "sma_length": 14, "macd_fast": 12, "macd_slow": 26, "macd_signal": 9}
+
     def get_indicators(self):
         if len(self.data_manager.data) < 35:
-            return None, None, None, None
+            return None, None, None
         
         self.parent_interval_supported = False
-        ema = self.data_manager.data.ta.ema(close=self.data_manager.data['close'], length=21, append=True, suffix='EMA')
-        mfi = self.data_manager.data.ta.mfi(high=self.data_manager.data['high'], low=self.data_manager.data['low'], close=self.data_manager.data['close'], volume=self.data_manager.data['volume'], length=7, append=True)
-        mfi_sma = self.data_manager.data.ta.sma(close=self.data_manager.data['MFI_7'], length=14, append=True, suffix='MFI')
-        macd = self.data_manager.data.ta.macd(close=self.data_manager.data['close'], append=True)
+        mfi = self.data_manager.get_indicator(self.spec("MFI({mfi_length})"))
+        mfi_sma = self.data_manager.get_indicator(self.spec("SMA(MFI_{mfi_length},{sma_length})"))
+
+        # Columns are named by the lengths, rename them so the rules read the same for any parameters
+        macd = self.data_manager.get_indicator(self.spec("MACD({macd_fast},{macd_slow},{macd_signal})")).set_axis(["MACD", "MACDh", "MACDs"], axis=1)
 
         return mfi, mfi_sma, macd
 
@@ -29,10 +33,10 @@ class MFI_MACD(Strategy):
         self.logger.info(f"MACD: {macd.iloc[-1]} - {macd.iloc[-2]}")
 
         # Check if MFI crosses above its SMA
-        if mfi_prev <= mfi_sma_prev and mfi_current > mfi_sma_current and macd['MACD_12_26_9'].iloc[-1] > macd['MACDs_12_26_9'].iloc[-1]:
+        if mfi_prev <= mfi_sma_prev and mfi_current > mfi_sma_current and macd['MACD'].iloc[-1] > macd['MACDs'].iloc[-1]:
             self.logger.debug("MFI crossed above SMA. Entering Long")
             return "long"
-        elif mfi_prev >= mfi_sma_prev and mfi_current < mfi_sma_current and macd['MACD_12_26_9'].iloc[-1] < macd['MACDs_12_26_9'].iloc[-1]:
+        elif mfi_prev >= mfi_sma_prev and mfi_current < mfi_sma_current and macd['MACD'].iloc[-1] < macd['MACDs'].iloc[-1]:
             self.logger.debug("MFI crossed below SMA. Entering Short")
             return "short"
         return False
@@ -54,5 +58,22 @@ class MFI_MACD(Strategy):
             return True
         return False
     
+    def get_signals(self):
+        mfi, mfi_sma, macd = self.get_indicators()
+        if mfi is None or mfi_sma is None or macd is None:
+            return self.no_signals()
+
+        # Bar i decides on the closed bars i-1 and i-2, MACD is read on bar i itself like iloc[-1]
+        mfi_current, mfi_prev = mfi.shift(1), mfi.shift(2)
+        mfi_sma_current, mfi_sma_prev = mfi_sma.shift(1), mfi_sma.shift(2)
+
+        cross_up = (mfi_prev <= mfi_sma_prev) & (mfi_current > mfi_sma_current)
+        cross_down = (mfi_prev >= mfi_sma_prev) & (mfi_current < mfi_sma_current)
+        long = cross_up & (macd['MACD'] > macd['MACDs'])
+        short = cross_down & (macd['MACD'] < macd['MACDs'])
+
+        entry = np.where(long, 1, np.where(short, -1, 0))
+        return entry, cross_down.to_numpy()
+
     def check_partial_close(self):
         return False
@@ -1,15 +1,17 @@
 from modules.strategy import Strategy
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
 class RSI(Strategy):    
+    indicators = ["EMA(21)", "RSI({rsi_length})", "SMA(RSI_{rsi_length},{sma_length})"]
+    parameters = {"rsi_length": 7, "sma_length": 14}
+
     def get_indicators(self):
         if len(self.data_manager.data) < 35:
             return None, None
         
-        ema = self.data_manager.data.ta.ema(close=self.data_manager.data['close'], length=21, append=True, suffix='EMA')
-        rsi = self.data_manager.data.ta.rsi(close=self.data_manager.data['close'], length=7, append=True)
-        rsi_sma = self.data_manager.data.ta.sma(close=self.data_manager.data['RSI_7'], length=14, append=True, suffix='RSI')
+        rsi = self.data_manager.get_indicator(self.spec("RSI({rsi_length})"))
+        rsi_sma = self.data_manager.get_indicator(self.spec("SMA(RSI_{rsi_length},{sma_length})"))
         return rsi, rsi_sma
 
     def check_entry(self):
@@ -60,5 +62,20 @@ class RSI(Strategy):
             return True
         return False
     
+    def get_signals(self):
+        rsi, rsi_sma = self.get_indicators()
+        if rsi is None or rsi_sma is None:
+            return self.no_signals()
+
+        # Bar i decides on the closed bars i-1 and i-2, same as iloc[-2] and iloc[-3]
+        rsi_current, rsi_prev = rsi.shift(1), rsi.shift(2)
+        rsi_sma_current, rsi_sma_prev = rsi_sma.shift(1), rsi_sma.shift(2)
+
+        long = (rsi_prev <= rsi_sma_prev) & (rsi_current > rsi_sma_current)
+        short = (rsi_prev >= rsi_sma_prev) & (rsi_current < rsi_sma_current)
+
+        entry = np.where(long, 1, np.where(short, -1, 0))
+        return entry, short.to_numpy()
+
     def check_partial_close(self):
         return False
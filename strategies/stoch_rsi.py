@@ -1,16 +1,21 @@
 from modules.strategy import Strategy
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
 class STOCH_RSI(Strategy):
+    indicators = ["EMA(21)", "STOCHRSI({stoch_length},{rsi_length},{k},{d})"]
+    parent_indicators = ["STOCHRSI({stoch_length},{rsi_length},{k},{d})"]
+    parameters = {"stoch_length": 14, "rsi_length": 14, "k": 3, "d": 3}
+
     def get_indicators(self):
         if len(self.data_manager.data) < 35:
-            return None, None, None, None
+            return None, None
         
         self.parent_interval_supported = False
-        ema = self.data_manager.data.ta.ema(close=self.data_manager.data['close'], length=21, append=True, suffix='EMA')
-        stoch_rsi = self.data_manager.data.ta.stochrsi(close=self.data_manager.data['close'], append=True)
-        stoch_rsi_parent = self.data_manager.data_parent.ta.stochrsi(close=self.data_manager.data_parent['close'], append=True)
+        # Columns are named by the lengths, rename them so the rules read the same for any parameters
+        spec = self.spec("STOCHRSI({stoch_length},{rsi_length},{k},{d})")
+        stoch_rsi = self.data_manager.get_indicator(spec).set_axis(["STOCHRSIk", "STOCHRSId"], axis=1)
+        stoch_rsi_parent = self.data_manager.get_parent_indicator(spec).set_axis(["STOCHRSIk", "STOCHRSId"], axis=1)
 
         return stoch_rsi, stoch_rsi_parent
 
@@ -22,10 +27,10 @@ class STOCH_RSI(Strategy):
         stoch_rsi_current = stoch_rsi.iloc[-2]
         stoch_rsi_prev = stoch_rsi.iloc[-3]
 
-        if stoch_rsi_prev['STOCHRSIk_14_14_3_3'] <= stoch_rsi_prev['STOCHRSId_14_14_3_3'] and stoch_rsi_current['STOCHRSIk_14_14_3_3'] > stoch_rsi_current['STOCHRSId_14_14_3_3']:
+        if stoch_rsi_prev['STOCHRSIk'] <= stoch_rsi_prev['STOCHRSId'] and stoch_rsi_current['STOCHRSIk'] > stoch_rsi_current['STOCHRSId']:
             self.logger.debug("STOCH-RSI crossed above SMA. Entering Long")
             return "long"
-        elif stoch_rsi_prev['STOCHRSIk_14_14_3_3'] >= stoch_rsi_prev['STOCHRSId_14_14_3_3'] and stoch_rsi_current['STOCHRSIk_14_14_3_3'] < stoch_rsi_current['STOCHRSId_14_14_3_3']:
+        elif stoch_rsi_prev['STOCHRSIk'] >= stoch_rsi_prev['STOCHRSId'] and stoch_rsi_current['STOCHRSIk'] < stoch_rsi_current['STOCHRSId']:
             self.logger.debug("STOCH-RSI crossed below SMA. Entering Short")
             return "short"
         return False
@@ -39,10 +44,27 @@ class STOCH_RSI(Strategy):
         stoch_rsi_current = stoch_rsi.iloc[-3]
 
         # Check if MACD crosses below its Signal line
-        if stoch_rsi_prev['STOCHRSIk_14_14_3_3'] > stoch_rsi_prev['STOCHRSId_14_14_3_3'] and stoch_rsi_current['STOCHRSIk_14_14_3_3'] <= stoch_rsi_current['STOCHRSId_14_14_3_3']:
+        if stoch_rsi_prev['STOCHRSIk'] > stoch_rsi_prev['STOCHRSId'] and stoch_rsi_current['STOCHRSIk'] <= stoch_rsi_current['STOCHRSId']:
             self.logger.debug("STOCH-RSI crossed below SMA. Exiting Long")
             return True
         return False
     
+    def get_signals(self):
+        stoch_rsi, stoch_rsi_parent = self.get_indicators()
+        if stoch_rsi is None or stoch_rsi_parent is None:
+            return self.no_signals()
+
+        k = stoch_rsi['STOCHRSIk']
+        d = stoch_rsi['STOCHRSId']
+
+        # Bar i decides on the closed bars i-1 and i-2, same as iloc[-2] and iloc[-3]
+        long = (k.shift(2) <= d.shift(2)) & (k.shift(1) > d.shift(1))
+        short = (k.shift(2) >= d.shift(2)) & (k.shift(1) < d.shift(1))
+        # check_exit reads iloc[-2] as prev and iloc[-3] as current
+        exit = (k.shift(1) > d.shift(1)) & (k.shift(2) <= d.shift(2))
+
+        entry = np.where(long, 1, np.where(short, -1, 0))
+        return entry, exit.to_numpy()
+
     def check_partial_close(self):
         return False
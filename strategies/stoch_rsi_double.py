@@ -1,33 +1,22 @@
 from modules.strategy import Strategy
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
 class STOCH_RSI_DOUBLE(Strategy):
+    indicators = ["EMA(21)", "STOCHRSI({stoch_length},{rsi_length},{k},{d})"]
+    parent_indicators = ["STOCHRSI({stoch_length},{rsi_length},{k},{d})"]
+    parameters = {"stoch_length": 14, "rsi_length": 14, "k": 3, "d": 3}
+
     def get_indicators(self):
         if len(self.data_manager.data) < 35:
-            return None, None, None, None
+            return None, None
         
         self.parent_interval_supported = False
-        ema = self.data_manager.data.ta.ema(close=self.data_manager.data['close'], length=21, append=True, suffix='EMA')
-        stoch_rsi = self.data_manager.data.ta.stochrsi(close=self.data_manager.data['close'], append=True)
-        stoch_rsi_parent = self.data_manager.data_parent.ta.stochrsi(close=self.data_manager.data_parent['close'], append=True)
-
-        # self.logger.info(stoch_rsi)
-        # self.logger.info(stoch_rsi_parent)
-        # exit()
-        # # Create a new DataFrame with parent MACD data
-        # parent_data = pd.DataFrame(index=self.data_manager.data_parent.index)
-        # parent_data['MACD_12_26_9_Parent'] = macd_parent['MACD_12_26_9']
-        # parent_data['MACDs_12_26_9_Parent'] = macd_parent['MACDs_12_26_9']
-        # parent_data['MACDh_12_26_9_Parent'] = macd_parent['MACDh_12_26_9']
-        
-        # # Reindex parent data to match base timeframe and forward fill
-        # reindexed_parent = parent_data.reindex(self.data_manager.data.index, method='ffill')
-        
-        # # Add parent MACD columns to base timeframe data
-        # self.data_manager.data['MACD_12_26_9_Parent'] = reindexed_parent['MACD_12_26_9_Parent']
-        # self.data_manager.data['MACDs_12_26_9_Parent'] = reindexed_parent['MACDs_12_26_9_Parent']
-        # self.data_manager.data['MACDh_12_26_9_Parent'] = reindexed_parent['MACDh_12_26_9_Parent']
+        # Columns are named by the lengths, rename them so the rules read the same for any parameters
+        spec = self.spec("STOCHRSI({stoch_length},{rsi_length},{k},{d})")
+        stoch_rsi = self.data_manager.get_indicator(spec).set_axis(["STOCHRSIk", "STOCHRSId"], axis=1)
+        # Parent STOCH-RSI aligned to the last closed parent candle of every bar
+        stoch_rsi_parent = self.data_manager.get_aligned_parent_indicator(spec).set_axis(["STOCHRSIk", "STOCHRSId"], axis=1)
 
         return stoch_rsi, stoch_rsi_parent
 
@@ -40,10 +29,10 @@ class STOCH_RSI_DOUBLE(Strategy):
         stoch_rsi_parent_current = stoch_rsi_parent.iloc[-2]
 
         # Check if STOCH-RSI crossed above its Signal line
-        if stoch_rsi_current['STOCHRSIk_14_14_3_3'] > stoch_rsi_current['STOCHRSId_14_14_3_3'] and stoch_rsi_parent_current['STOCHRSIk_14_14_3_3'] > stoch_rsi_parent_current['STOCHRSId_14_14_3_3']:
+        if stoch_rsi_current['STOCHRSIk'] > stoch_rsi_current['STOCHRSId'] and stoch_rsi_parent_current['STOCHRSIk'] > stoch_rsi_parent_current['STOCHRSId']:
             self.logger.debug("STOCH-RSI crossed above SMA. Entering Long")
             return "long"
-        elif stoch_rsi_current['STOCHRSIk_14_14_3_3'] < stoch_rsi_current['STOCHRSId_14_14_3_3'] and stoch_rsi_parent_current['STOCHRSIk_14_14_3_3'] < stoch_rsi_parent_current['STOCHRSId_14_14_3_3']:
+        elif stoch_rsi_current['STOCHRSIk'] < stoch_rsi_current['STOCHRSId'] and stoch_rsi_parent_current['STOCHRSIk'] < stoch_rsi_parent_current['STOCHRSId']:
             self.logger.debug("STOCH-RSI crossed below SMA. Entering Short")
             return "short"
         return False
@@ -57,10 +46,28 @@ class STOCH_RSI_DOUBLE(Strategy):
         stoch_rsi_current = stoch_rsi.iloc[-2]
 
         # Check if MACD crosses below its Signal line
-        if stoch_rsi_prev['STOCHRSIk_14_14_3_3'] > stoch_rsi_prev['STOCHRSId_14_14_3_3'] and stoch_rsi_current['STOCHRSIk_14_14_3_3'] < stoch_rsi_current['STOCHRSId_14_14_3_3']:
+        if stoch_rsi_prev['STOCHRSIk'] > stoch_rsi_prev['STOCHRSId'] and stoch_rsi_current['STOCHRSIk'] < stoch_rsi_current['STOCHRSId']:
             self.logger.debug("STOCH-RSI crossed below SMA. Exiting Long")
             return True
         return False
+
+    def get_signals(self):
+        stoch_rsi, stoch_rsi_parent = self.get_indicators()
+        if stoch_rsi is None or stoch_rsi_parent is None:
+            return self.no_signals()
+
+        k = stoch_rsi['STOCHRSIk']
+        d = stoch_rsi['STOCHRSId']
+        k_parent = stoch_rsi_parent['STOCHRSIk']
+        d_parent = stoch_rsi_parent['STOCHRSId']
+
+        # Bar i decides on the closed bar i-1, same as iloc[-2]
+        long = (k.shift(1) > d.shift(1)) & (k_parent.shift(1) > d_parent.shift(1))
+        short = (k.shift(1) < d.shift(1)) & (k_parent.shift(1) < d_parent.shift(1))
+        exit = (k.shift(2) > d.shift(2)) & (k.shift(1) < d.shift(1))
+
+        entry = np.where(long, 1, np.where(short, -1, 0))
+        return entry, exit.to_numpy()
     
     def check_partial_close(self):
         return False
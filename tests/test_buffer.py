@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from modules.buffer import CandleBuffer
+from modules.data import DataManager
+from modules.stream import CandleStream
+
+HOUR = 3600
+START = 1700000000 // 86400 * 86400
+
+def make_frame(start, length):
+    index = pd.date_range('2024-01-01', periods=start + length, freq='h', tz='UTC')[start:]
+    values = np.arange(start, start + length, dtype=float)
+    return pd.DataFrame({'close': values, 'count': values.astype(np.int32)}, index=index)
+
+def test_wraparound_keeps_latest_candles():
+    buffer = CandleBuffer(capacity=100)
+    buffer.append(make_frame(0, 100))
+    # Single appends run past the end of the arrays several times
+    for start in range(100, 750):
+        buffer.append(make_frame(start, 1))
+
+    frame = buffer.frame()
+    assert len(frame) == 100
+    np.testing.assert_array_equal(frame['close'].to_numpy(), np.arange(650, 750))
+    assert frame['count'].dtype == np.int32
+    assert frame.index.equals(make_frame(650, 100).index)
+
+def test_wraparound_leaves_earlier_frames_intact():
+    buffer = CandleBuffer(capacity=100)
+    buffer.append(make_frame(0, 100))
+    first = buffer.frame()
+    for start in range(100, 400):
+        buffer.append(make_frame(start, 1))
+
+    np.testing.assert_array_equal(first['close'].to_numpy(), np.arange(0, 100))
+    assert first.index.equals(make_frame(0, 100).index)
+
+def test_append_larger_than_capacity():
+    buffer = CandleBuffer(capacity=100)
+    buffer.append(make_frame(0, 50))
+    buffer.append(make_frame(50, 250))
+    np.testing.assert_array_equal(buffer.frame()['close'].to_numpy(), np.arange(200, 300))
+
+def test_refresh_after_wraparound():
+    buffer = CandleBuffer(capacity=100)
+    for start in range(0, 350, 7):
+        buffer.append(make_frame(start, 7))
+
+    # A late update of a closed candle is written in place, unknown candles are ignored
+    late = make_frame(300, 1).assign(close=-1.0)
+    assert buffer.refresh(pd.concat([make_frame(0, 1), late])) == 1
+    frame = buffer.frame()
+    assert frame['close'].loc[late.index[0]] == -1.0
+    assert len(frame) == 100 and frame['close'].iloc[-1] == 349
+
+def test_refresh_last_overwrites_forming_candle():
+    buffer = CandleBuffer(capacity=100)
+    buffer.append(make_frame(0, 10))
+    forming = make_frame(9, 1).assign(close=42.0)
+    assert buffer.append(forming) == 0
+    assert buffer.append(forming, refresh_last=True) == 1
+    assert len(buffer) == 10 and buffer.frame()['close'].iloc[-1] == 42.0
+
+# Data manager following a stream, loaded with flat hourly candles
+def follow_stream(bars=100):
+    data_manager = DataManager('XBTUSD', '1h', '1d', store=None, hub=None, registry=None)
+    rows = [[START + i * HOUR, 80, 90, 70, 80, 80, 1, 1] for i in range(bars)]
+    frame = data_manager._rows_to_frame(rows)
+    data_manager.load_data(
+        data_manager._prepare_candles(frame, 'XBTUSD', '1h', bars),
+        data_manager._prepare_candles(data_manager._resample_candles(frame, '1d'), 'XBTUSD', '1d', bars)
+    )
+    stream = CandleStream(close_on_time=False)
+    closes = []
+    data_manager.follow(stream, on_close=closes.append)
+    return data_manager, stream, closes
+
+def test_late_update_after_timed_close():
+    data_manager, stream, closes = follow_stream()
+    candle = START + 100 * HOUR
+    stream.update('XBTUSD', '1h', [candle, 80, 91, 70, 81, 80, 1, 1])
+    # Closed by the timer, before the next candle shows up
+    stream.flush()
+    stream.update('XBTUSD', '1h', [candle, 80, 93, 70, 83, 80, 1, 1])
+
+    data = data_manager.data
+    assert len(closes) == 1
+    assert data.index[-2] == pd.Timestamp(candle, unit='s', tz='UTC')
+    assert (data['high'].iloc[-2], data['close'].iloc[-2]) == (93, 83)
+    # The next candle stays open flat at the updated close
+    assert data['close'].iloc[-1] == 83 and data['count'].iloc[-1] == 0
+    assert data_manager.data_parent['close'].iloc[-1] == 83
+
+def test_late_update_after_next_candle():
+    data_manager, stream, closes = follow_stream()
+    candle = START + 100 * HOUR
+    stream.update('XBTUSD', '1h', [candle, 80, 91, 70, 81, 80, 1, 1])
+    stream.update('XBTUSD', '1h', [candle + HOUR, 81, 95, 81, 94, 80, 1, 1])
+    stream.update('XBTUSD', '1h', [candle, 80, 93, 70, 84, 80, 1, 1])
+
+    assert len(closes) == 1
+    assert data_manager.data['close'].iloc[-2:].tolist() == [84, 94]
+
+def test_late_update_of_previous_parent_candle():
+    data_manager, stream, _ = follow_stream(bars=96)
+    # The last hour of a day updated after the next day started
+    last_hour = START + 119 * HOUR
+    for hour in range(96, 120):
+        stream.update('XBTUSD', '1h', [START + hour * HOUR, 80, 90, 70, 80, 80, 1, 1])
+    stream.update('XBTUSD', '1h', [last_hour + HOUR, 80, 90, 70, 80, 80, 1, 1])
+    stream.update('XBTUSD', '1h', [last_hour, 80, 99, 70, 88, 80, 1, 1])
+
+    parent = data_manager.data_parent
+    assert parent.index[-1] == pd.Timestamp(START + 120 * HOUR, unit='s', tz='UTC')
+    assert (parent['high'].iloc[-2], parent['close'].iloc[-2]) == (99, 88)
@@ -0,0 +1,147 @@
+import sys
+import numpy as np
+import pandas as pd
+from modules.indicators import IndicatorEngine, IndicatorRegistry
+
+# Random walk candles
+def make_candles(length, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, length))
+    return pd.DataFrame({
+        'open': close + rng.normal(0, 0.2, length),
+        'high': close + rng.random(length),
+        'low': close - rng.random(length),
+        'close': close,
+        'volume': rng.random(length) * 10,
+    }, index=pd.date_range('2024-01-01', periods=length, freq='h', tz='UTC'))
+
+# pandas_ta's sma
+def reference_sma(close, length):
+    return close.rolling(length, min_periods=length).mean()
+
+# pandas_ta's ema, seeded with the sma of the first length values
+def reference_ema(close, length):
+    close = close.loc[close.first_valid_index():].copy()
+    seed = close.iloc[:length].mean()
+    close.iloc[:length - 1] = np.nan
+    close.iloc[length - 1] = seed
+    return close.ewm(span=length, adjust=False).mean()
+
+# pandas_ta's rsi
+def reference_rsi(close, length):
+    change = close.diff()
+    gain = change.clip(lower=0).ewm(alpha=1 / length, min_periods=length).mean()
+    loss = change.clip(upper=0).abs().ewm(alpha=1 / length, min_periods=length).mean()
+    return 100 * gain / (gain + loss)
+
+# pandas_ta's macd
+def reference_macd(close, fast, slow, signal):
+    macd = reference_ema(close, fast) - reference_ema(close, slow)
+    signal_line = reference_ema(macd, signal).reindex(close.index)
+    return pd.DataFrame({'macd': macd, 'histogram': macd - signal_line, 'signal': signal_line})
+
+# pandas_ta's stochrsi
+def reference_stochrsi(close, length, rsi_length, k, d):
+    rsi = reference_rsi(close, rsi_length)
+    lowest = rsi.rolling(length).min()
+    value_range = rsi.rolling(length).max() - lowest
+    if value_range.eq(0).any():
+        value_range += sys.float_info.epsilon
+    stoch_k = reference_sma(100 * (rsi - lowest) / value_range, k)
+    return pd.DataFrame({'k': stoch_k, 'd': reference_sma(stoch_k, d)})
+
+# pandas_ta's mfi
+def reference_mfi(high, low, close, volume, length):
+    typical_price = (high + low + close) / 3
+    raw_money_flow = typical_price * volume
+    change = typical_price.diff()
+    positive = raw_money_flow.where(change > 0, 0).rolling(length).sum()
+    negative = raw_money_flow.where(change < 0, 0).rolling(length).sum()
+    return 100 * positive / (positive + negative)
+
+def test_ema_matches_pandas_ta():
+    candles = make_candles(3000)
+    values = IndicatorEngine().get(candles, "EMA(21)")
+    np.testing.assert_allclose(values, reference_ema(candles['close'], 21), rtol=1e-9)
+
+def test_rsi_matches_pandas_ta():
+    candles = make_candles(3000)
+    values = IndicatorEngine().get(candles, "RSI(14)")
+    np.testing.assert_allclose(values, reference_rsi(candles['close'], 14), rtol=1e-9)
+
+def test_macd_matches_pandas_ta():
+    candles = make_candles(3000)
+    values = IndicatorEngine().get(candles, "MACD(12,26,9)")
+    assert list(values.columns) == ["MACD_12_26_9", "MACDh_12_26_9", "MACDs_12_26_9"]
+    # The histogram crosses zero, compare absolutely
+    np.testing.assert_allclose(values.to_numpy(), reference_macd(candles['close'], 12, 26, 9).to_numpy(), rtol=1e-9, atol=1e-9)
+
+def test_stochrsi_matches_pandas_ta():
+    candles = make_candles(3000)
+    values = IndicatorEngine().get(candles, "STOCHRSI(14,14,3,3)")
+    assert list(values.columns) == ["STOCHRSIk_14_14_3_3", "STOCHRSId_14_14_3_3"]
+    np.testing.assert_allclose(values.to_numpy(), reference_stochrsi(candles['close'], 14, 14, 3, 3).to_numpy(), rtol=1e-9, atol=1e-9)
+
+def test_sma_matches_pandas_ta():
+    candles = make_candles(3000)
+    # The last bar is forming, it is peeked rather than committed
+    values = IndicatorEngine().get(candles, "SMA(20)")
+    np.testing.assert_allclose(values, reference_sma(candles['close'], 20), rtol=1e-9)
+
+def test_sma_of_warming_up_indicator_matches_pandas_ta():
+    candles = make_candles(500)
+    engine = IndicatorEngine()
+    rsi = engine.get(candles, "RSI(7)")
+    np.testing.assert_allclose(engine.get(candles, "SMA(RSI_7,14)"), reference_sma(rsi, 14), rtol=1e-9)
+
+def test_sma_of_constant_window_is_exact():
+    candles = make_candles(100)
+    # Stochastic RSI saturates at 100, its smoothed lines must tie exactly there
+    candles.iloc[40:, candles.columns.get_loc('close')] = 100.0
+    values = IndicatorEngine().get(candles, "SMA(3)")
+    assert (values.iloc[42:] == 100.0).all()
+
+def test_mfi_matches_pandas_ta():
+    candles = make_candles(3000)
+    values = IndicatorEngine().get(candles, "MFI(14)")
+    expected = reference_mfi(candles['high'], candles['low'], candles['close'], candles['volume'], 14)
+    np.testing.assert_allclose(values, expected, rtol=1e-9)
+
+def test_mfi_without_money_flow_is_nan():
+    candles = make_candles(100)
+    candles.iloc[50:, :] = candles.iloc[50].to_numpy()
+    candles.iloc[50:, candles.columns.get_loc('volume')] = 0.0
+    values = IndicatorEngine().get(candles, "MFI(14)")
+    assert values.iloc[65:].isna().all()
+
+def test_streamed_bars_match_whole_history():
+    candles = make_candles(600)
+    engine = IndicatorEngine()
+    for end in range(300, 601):
+        streamed = engine.get(candles.iloc[:end], "MFI(14)")
+    np.testing.assert_allclose(streamed, IndicatorEngine().get(candles, "MFI(14)"), rtol=1e-9)
+
+def test_series_survive_compaction():
+    candles = make_candles(400)
+    engine = IndicatorEngine()
+    first = engine.get(candles.iloc[:100], "SMA(5)")
+    expected = first.to_numpy().copy()
+
+    # A sliding 100 bar window keeps the output column compacting to its latest values
+    for end in range(101, 401):
+        engine.get(candles.iloc[end - 100:end], "SMA(5)")
+
+    np.testing.assert_array_equal(first.to_numpy(), expected)
+
+def test_registry_engines_follow_feeds():
+    registry = IndicatorRegistry()
+    engines = registry.subscribe("XBTUSD", "1h", "4h")
+    assert registry.subscribe("XBTUSD", "1h", "4h") is engines
+    # Feeds with another parent interval have their own candles, so their own engines
+    assert registry.subscribe("XBTUSD", "1h", "1d")[0] is not engines[0]
+
+    registry.unsubscribe("XBTUSD", "1h", "4h")
+    assert ("XBTUSD", "1h", "4h") in registry.engines
+    registry.unsubscribe("XBTUSD", "1h", "4h")
+    assert ("XBTUSD", "1h", "4h") not in registry.engines
+    assert ("XBTUSD", "1h", "1d") in registry.engines
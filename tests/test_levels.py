@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from modules.data import DataManager
+from modules.levels import LevelIndex, SupportResistanceLevels
+
+# Candles with swings and volume spikes, so levels are found
+def make_candles(length, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + 10 * np.sin(np.arange(length) / 12) + np.cumsum(rng.normal(0, 0.5, length))
+    return pd.DataFrame({
+        'open': close,
+        'high': close + rng.random(length),
+        'low': close - rng.random(length),
+        'close': close,
+        'volume': rng.exponential(10, length),
+    }, index=pd.date_range('2024-01-01', periods=length, freq='h', tz='UTC'))
+
+# The loop the support and resistance detection was vectorized from
+def reference_levels(data, window=15, deviation_threshold=0.005, smoothing_periods=5, volume_factor=1.2):
+    highs = data['high'].rolling(window=smoothing_periods).mean()
+    lows = data['low'].rolling(window=smoothing_periods).mean()
+    volumes = data['volume']
+    avg_volume = volumes.mean()
+    resistance = pd.Series(np.nan, index=data.index)
+    support = pd.Series(np.nan, index=data.index)
+    resistance_levels, support_levels = [], []
+
+    for i in range(window, len(data) - window):
+        if highs.iloc[i] > highs.iloc[i-window:i].max() and highs.iloc[i] > highs.iloc[i+1:i+window+1].max():
+            if not resistance_levels or abs(highs.iloc[i] - resistance_levels[-1]) / resistance_levels[-1] > deviation_threshold:
+                if volumes.iloc[i] > avg_volume * volume_factor:
+                    resistance_levels.append(highs.iloc[i])
+                    resistance.iloc[i] = highs.iloc[i]
+        if lows.iloc[i] < lows.iloc[i-window:i].min() and lows.iloc[i] < lows.iloc[i+1:i+window+1].min():
+            if not support_levels or abs(lows.iloc[i] - support_levels[-1]) / support_levels[-1] > deviation_threshold:
+                if volumes.iloc[i] > avg_volume * volume_factor:
+                    support_levels.append(lows.iloc[i])
+                    support.iloc[i] = lows.iloc[i]
+
+    return resistance, support
+
+def detect_levels(data):
+    data_manager = DataManager("XBTUSD", "1h", "4h", store=None, hub=None, registry=None)
+    return data_manager._calculate_support_resistance(data.copy())
+
+def test_detection_matches_loop():
+    for seed in range(5):
+        data = make_candles(1000, seed)
+        resistance, support = reference_levels(data)
+        detected = detect_levels(data)
+        assert resistance.notna().any() and support.notna().any()
+        np.testing.assert_array_equal(detected['resistance'].to_numpy(dtype=float), resistance.to_numpy())
+        np.testing.assert_array_equal(detected['support'].to_numpy(dtype=float), support.to_numpy())
+
+def test_detection_of_short_data_matches_loop():
+    for length in (1, 15, 30, 31):
+        data = make_candles(length)
+        resistance, support = reference_levels(data)
+        detected = detect_levels(data)
+        np.testing.assert_array_equal(detected['resistance'].to_numpy(dtype=float), resistance.to_numpy())
+        np.testing.assert_array_equal(detected['support'].to_numpy(dtype=float), support.to_numpy())
+
+def test_nearest_levels_match_scan():
+    data = detect_levels(make_candles(3000))
+    window = 15
+    levels = SupportResistanceLevels(window=window, deviation_threshold=0)
+    levels.update(data)
+
+    # Every detected level with the bar it is confirmed at
+    def detected(column):
+        positions = np.flatnonzero(data[column].notna().to_numpy())
+        return [(data[column].iat[i], data.index[min(i + window, len(data) - 1)]) for i in positions]
+
+    supports, resistances = detected('support'), detected('resistance')
+    rng = np.random.default_rng(1)
+    for price, as_of in zip(rng.uniform(80, 120, 200), rng.choice(data.index, 200)):
+        below = [level for level, confirmed_at in supports if level < price and confirmed_at <= as_of]
+        above = [level for level, confirmed_at in resistances if level > price and confirmed_at <= as_of]
+
+        support = levels.nearest_support(price, as_of=as_of)
+        resistance = levels.nearest_resistance(price, as_of=as_of)
+        assert (support['price'] if support else None) == (max(below) if below else None)
+        assert (resistance['price'] if resistance else None) == (min(above) if above else None)
+
+def test_close_levels_cluster():
+    index = LevelIndex(deviation_threshold=0.01)
+    timestamps = pd.date_range('2024-01-01', periods=4, freq='h', tz='UTC')
+    index.add(100.0, timestamps[0])
+    index.add(100.5, timestamps[1])
+    index.add(110.0, timestamps[2])
+    # Feeding a timestamp again is a no-op
+    index.add(100.5, timestamps[1])
+
+    level = index.nearest_below(105.0)
+    assert (level['price'], level['strength']) == (100.0, 2)
+    assert (level['first_seen'], level['last_seen']) == (timestamps[0], timestamps[1])
+    assert index.nearest_below(105.0, as_of=timestamps[0])['strength'] == 1
+    assert [level['price'] for level in index.within(105.0, 5)] == [100.0, 110.0]
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modules.backtest import max_drawdown
+from modules.data import DataManager
+from modules.trades import TradeLedger
+from strategies.rsi import RSI
+
+# The metrics the strategy computed from its trade history before the ledger
+def reference_metrics(trade_history, balance):
+    closed_trades = [trade for trade in trade_history if trade['action'] == 'close']
+    winning_trades = [trade for trade in closed_trades if trade['result'] == 'win']
+    losing_trades = [trade for trade in closed_trades if trade['result'] == 'loss']
+    total_profit = sum(trade['profit_loss'] for trade in winning_trades)
+    total_loss = abs(sum(trade['profit_loss'] for trade in losing_trades))
+
+    if total_loss == 0:
+        profit_factor = float('inf') if total_profit > 0 else 0
+    else:
+        profit_factor = total_profit / total_loss
+
+    return {
+        'total_trades': len(closed_trades),
+        'win_trades': len(winning_trades),
+        'loss_trades': len(losing_trades),
+        'win_rate': len(winning_trades) / len(closed_trades) if closed_trades else 0,
+        'profit_factor': profit_factor,
+        'total_profit_loss': total_profit - total_loss,
+        'total_profit_loss_percentage': (total_profit - total_loss) / balance * 100,
+        'max_drawdown_percentage': max_drawdown([trade['profit_loss'] for trade in closed_trades], balance)
+    }
+
+def assert_metrics_equal(metrics, expected):
+    assert metrics.keys() >= expected.keys()
+    for name, value in expected.items():
+        assert metrics[name] == pytest.approx(value, rel=1e-9, abs=1e-9), name
+
+def test_ledger_matches_trade_history():
+    rng = np.random.default_rng(0)
+    ledger = TradeLedger(balance=1000)
+    balance = 1000
+    trade_history = []
+    timestamps = pd.date_range('2024-01-01', periods=400, freq='h', tz='UTC')
+
+    for entry, exit in zip(timestamps[::2], timestamps[1::2]):
+        price = rng.uniform(90, 110)
+        ledger.record(entry, "long", price, 1.0)
+        profit_loss = float(rng.normal(0, 20))
+        # Breaking even counts as a loss
+        if rng.random() < 0.05:
+            profit_loss = 0.0
+        balance += profit_loss
+        ledger.record(exit, "close", price + profit_loss, 1.0, profit_loss, profit_loss / price * 100)
+        trade_history.append({'action': 'close', 'profit_loss': profit_loss, 'result': "win" if profit_loss > 0 else "loss"})
+
+        assert_metrics_equal(ledger.get_metrics(), reference_metrics(trade_history, balance))
+
+    statistics = ledger.get_statistics()
+    assert statistics['fills'] == 400
+    assert statistics['final_balance'] == pytest.approx(balance)
+
+def test_ledger_without_losses():
+    ledger = TradeLedger(balance=1000)
+    assert ledger.get_metrics()['profit_factor'] == 0
+    ledger.record(pd.Timestamp('2024-01-01', tz='UTC'), "long", 100, 1.0)
+    ledger.record(pd.Timestamp('2024-01-02', tz='UTC'), "close", 110, 1.0, 10.0, 10.0)
+    assert ledger.get_metrics()['profit_factor'] == float('inf')
+    assert ledger.get_metrics()['max_drawdown_percentage'] == 0
+
+# A strategy with random walk candles loaded
+def load_strategy(length=600, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, length))
+    timestamps = 1700000000 // 86400 * 86400 + np.arange(length) * 4 * 3600
+    rows = [[timestamp, price, price + 1, price - 1, price, price, 10.0, 5] for timestamp, price in zip(timestamps, close)]
+
+    data_manager = DataManager('XBTUSD', '4h', '1d', store=None, hub=None, registry=None)
+    frame = data_manager._rows_to_frame(rows)
+    data_manager.load_data(
+        data_manager._prepare_candles(frame, 'XBTUSD', '4h', length),
+        data_manager._prepare_candles(data_manager._resample_candles(frame, '1d'), 'XBTUSD', '1d', length)
+    )
+    return RSI('XBTUSD', '4h', '1d', data_manager=data_manager)
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_backtest_metrics_match_trade_history(vectorized):
+    strategy = load_strategy()
+    summary = strategy.backtest(500, vectorized=vectorized, update=False, graph=False)
+    expected = reference_metrics(strategy.trade_history, strategy.balance)
+
+    assert expected['total_trades'] > 10
+    assert_metrics_equal(strategy.performance_metrics, expected)
+    assert summary['max_drawdown_percentage'] == pytest.approx(expected['max_drawdown_percentage'])
+    assert len(strategy.ledger) == len(strategy.trade_history)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+from modules.backtest import equity_curve, simulate_signals
+from modules.walkforward import WalkForward
+from strategies.rsi import RSI
+
+# Prices and random signals
+def make_market(length, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, length))
+    entry_signals = rng.choice([-1, 0, 0, 0, 1], length)
+    exit_signals = rng.random(length) < 0.1
+    index = pd.date_range('2024-01-01', periods=length, freq='4h', tz='UTC')
+    return close, entry_signals, exit_signals, index
+
+# Simulate a test window like the walk-forward workers, the open position is closed on its last bar
+def simulate_window(close, entry_signals, exit_signals, start, end, balance):
+    exit_signals = exit_signals[:end].copy()
+    exit_signals[-1] = True
+    trades, _ = simulate_signals(close[:end], entry_signals[:end], exit_signals, balance=balance, start=start)
+    return equity_curve(close, trades, balance, start, end)
+
+def test_stitched_equity_carries_the_balance_over():
+    close, entry_signals, exit_signals, index = make_market(1000)
+    walk_forward = WalkForward(RSI, {'rsi_length': [7]}, "XBTUSD", train=200, test=100, folds=5, balance=1000)
+    folds = walk_forward.get_folds()
+
+    # Every fold simulated from the starting balance, as the workers do
+    tests = [
+        {'equity': simulate_window(close, entry_signals, exit_signals, test_start, test_end, 1000), 'index': index[test_start:test_end]}
+        for _, test_start, test_end in folds
+    ]
+    stitched = walk_forward._stitch_equity(tests)
+
+    # Every fold simulated from the balance the previous one ended with
+    balance, expected = 1000, []
+    for _, test_start, test_end in folds:
+        equity = simulate_window(close, entry_signals, exit_signals, test_start, test_end, balance)
+        expected.append(equity)
+        balance = equity[-1]
+
+    assert stitched.index.equals(index[folds[0][1]:folds[-1][2]])
+    assert stitched.index.is_unique
+    np.testing.assert_allclose(stitched.to_numpy(), np.concatenate(expected), rtol=1e-9)
+
+def test_folds_follow_each_other():
+    walk_forward = WalkForward(RSI, {'rsi_length': [7]}, "XBTUSD", train=200, test=100, folds=4)
+    folds = walk_forward.get_folds()
+    assert all(test_end == next_test_start for (_, _, test_end), (_, next_test_start, _) in zip(folds, folds[1:]))
+    assert all(test_start - train_start == 200 for train_start, test_start, _ in folds)
+
+    anchored = WalkForward(RSI, {'rsi_length': [7]}, "XBTUSD", train=200, test=100, folds=4, anchored=True).get_folds()
+    assert len({train_start for train_start, _, _ in anchored}) == 1
+    assert [fold[1:] for fold in anchored] == [fold[1:] for fold in folds]